@@ -0,0 +1,97 @@
+import os
+import json
+import numpy as np
+from typing import List
+from functools import lru_cache
+from usearch.index import Index
+
+
+class LocalVectorIndex():
+    """
+    A read-only view of the local HNSW index that the ML_Interface keeps in sync with the vector collection.
+
+    The index file is memory-mapped, so several Django workers share the same pages. Search results have the same
+    format as the results of Atlas `$vectorSearch`.
+
+    Attributes:
+    -----------
+    folder : str
+        The folder holding `index.usearch` and `metadata.jsonl`.
+    index : usearch.index.Index
+        The memory-mapped HNSW index.
+    metadata : list
+        The metadata of each key of the index.
+    """
+
+    def __init__(self, folder: str) -> None:
+        """
+        Opens the index files in the given folder.
+
+        Parameters:
+        -----------
+        folder : str
+            The folder holding `index.usearch` and `metadata.jsonl`.
+        """
+        self.folder = folder
+        self.index = Index.restore(os.path.join(folder, "index.usearch"), view=True)
+        with open(os.path.join(folder, "metadata.jsonl"), "r", encoding="utf-8") as f:
+            self.metadata = [json.loads(line) for line in f]
+
+    def search(self, embedding: List[float], limit: int, numCandidates: int) -> list:
+        """
+        Searches the index for the nearest neighbours of an embedding.
+
+        Parameters:
+        -----------
+        embedding : List[float]
+            The embedding vector to use for the query.
+        limit : int
+            Maximum number of results to return.
+        numCandidates : int
+            The size of the candidate list explored during the search.
+
+        Returns:
+        --------
+        list
+            A list of dictionaries with "_id", "Link", "Channel_Name", "Publishing_datetime" and "score",
+            where "score" is projected to MongoDB's vector search score range.
+        """
+        if len(self.index) == 0:
+            return []
+        self.index.expansion_search = max(numCandidates, limit)
+        matches = self.index.search(np.asarray(embedding, dtype=np.float32), limit)
+        results = list()
+        for key, distance in zip(matches.keys, matches.distances):
+            if int(key) >= len(self.metadata) or self.metadata[int(key)] is None:
+                continue # Opened between the replacement of the index and of the metadata.
+            metadata = self.metadata[int(key)]
+            results.append({
+                "_id": metadata["_id"],
+                "Link": metadata["Link"],
+                "Channel_Name": metadata["Channel_Name"],
+                "Publishing_datetime": metadata["Publishing_datetime"],
+                "score": float((2 - distance) / 2),
+            })
+        return results
+
+
+@lru_cache(maxsize=1)
+def _open_local_index(folder: str, modified: float) -> LocalVectorIndex:
+    return LocalVectorIndex(folder=folder)
+
+def get_local_index(folder: str) -> LocalVectorIndex:
+    """
+    Returns the LocalVectorIndex of a folder, shared across requests of the same worker.
+    The index is reopened when the ML_Interface has saved a newer version.
+
+    Parameters:
+    -----------
+    folder : str
+        The folder holding `index.usearch` and `metadata.jsonl`.
+
+    Returns:
+    --------
+    LocalVectorIndex
+        The opened index.
+    """
+    return _open_local_index(folder, os.path.getmtime(os.path.join(folder, "metadata.jsonl")))
@@ -0,0 +1,103 @@
+import heapq
+from itertools import islice
+from typing import Callable, Iterator, List
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import InvalidOperation
+
+
+class Descending:
+    """
+    Wraps a sort key so that heapq, a min-heap, pops the largest key first.
+    """
+    __slots__ = ("key",)
+
+    def __init__(self, key) -> None:
+        self.key = key
+
+    def __lt__(self, other: "Descending") -> bool:
+        return self.key > other.key
+
+    def __eq__(self, other: "Descending") -> bool:
+        return self.key == other.key
+
+
+class MergedCursor:
+    """
+    Merges cursors that are sorted in descending order by the same key into one sorted stream.
+
+    The cursors are read concurrently by a thread pool: the first batch of every cursor is requested at once, so the
+    queries of all collections run in parallel, and while the merge consumes a batch of a cursor, its next batch is
+    already fetched in the background. Batches start small and double up to `max_batch_size` for cursors the merge
+    keeps reading from, so a consumer that stops early (a page, the first documents of a stream) does not read far
+    ahead of what it consumes. The batch size of every fetch is also set as the batch size of the cursor, so MongoDB
+    returns batches of that size instead of up to 16 MB per getMore. pymongo fixes the batch size of a find cursor
+    once its query is sent, so find cursors keep their first batch size, while aggregation cursors grow with every
+    fetch. A heap over the heads of the cursors yields the documents in order without sorting.
+
+    Attributes:
+    -----------
+    cursors : List[pymongo.cursor.Cursor]
+        The sorted cursors.
+    key : Callable
+        Returns the sort key of a document.
+    max_workers : int
+        The maximum number of cursors read at the same time.
+    first_batch_size : int
+        The number of documents of the first batch of every cursor (101, the default first batch of MongoDB).
+    max_batch_size : int
+        The maximum number of documents of a batch.
+    """
+
+    def __init__(self, cursors: List, key: Callable[[dict], tuple], max_workers: int = 16, first_batch_size: int = 101, max_batch_size: int = 1000) -> None:
+        self.cursors = cursors
+        self.key = key
+        self.max_workers = max_workers
+        self.first_batch_size = first_batch_size
+        self.max_batch_size = max_batch_size
+
+    def fetch(self, cursor, batch_size: int) -> list:
+        try:
+            cursor.batch_size(batch_size)
+        except InvalidOperation: # A find cursor whose query has been sent keeps its batch size.
+            pass
+        return list(islice(cursor, batch_size))
+
+    def __iter__(self) -> Iterator[dict]:
+        if not self.cursors:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.cursors)))
+        batch_sizes = [self.first_batch_size] * len(self.cursors)
+        futures = [executor.submit(self.fetch, cursor, self.first_batch_size) for cursor in self.cursors]
+        try:
+            batches, positions, heap = [None] * len(self.cursors), [0] * len(self.cursors), list()
+
+            def load(idx: int) -> None:
+                # Takes the fetched batch of a cursor, requests the next one if the cursor may have more documents,
+                # and pushes the head of the batch onto the heap.
+                batch = futures[idx].result()
+                futures[idx] = None
+                if len(batch) == batch_sizes[idx]:
+                    batch_sizes[idx] = min(2 * batch_sizes[idx], self.max_batch_size)
+                    futures[idx] = executor.submit(self.fetch, self.cursors[idx], batch_sizes[idx])
+                batches[idx], positions[idx] = batch, 0
+                if batch:
+                    heapq.heappush(heap, (Descending(self.key(batch[0])), idx))
+
+            for idx in range(len(self.cursors)):
+                load(idx)
+            while heap:
+                _, idx = heapq.heappop(heap)
+                doc = batches[idx][positions[idx]]
+                positions[idx] += 1
+                if positions[idx] < len(batches[idx]):
+                    heapq.heappush(heap, (Descending(self.key(batches[idx][positions[idx]])), idx))
+                elif futures[idx] is not None:
+                    load(idx)
+                yield doc
+        finally:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+            executor.shutdown(wait=True)
+            for cursor in self.cursors:
+                cursor.close()
@@ -1,13 +1,44 @@
 import os
+import json
+import math
+from itertools import islice
+import base64
+import binascii
 from pathlib import Path
-from tqdm import tqdm
-from typing import Union, List
+from typing import Union, List, Tuple, Iterator
 from datetime import datetime
-from pymongo import MongoClient
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import MongoClient, DESCENDING
 from pymongo.server_api import ServerApi
+from .MergedCursor import MergedCursor
 
 
 PROJECT_DIRECTORY = str(Path(__file__).resolve().parent)
+# The stored fields each field of a parsed document is computed from.
+FIELD_SOURCES = {
+    "Message_ID": ["Message_ID"],
+    "Channel_Name": ["Channel_Name"],
+    "Link": ["Link"],
+    "Publishing_datetime": ["Publishing_datetime"],
+    "Member_count": ["Member_count"],
+    "Views": ["Engagement"],
+    "Forwards": ["Engagement"],
+    "Text": ["Content"],
+    "Topic": ["Topic"],
+    "Narratives": ["Narratives"],
+    "Factual": ["Factual"],
+    "Polarising": ["Polarising"],
+    "Sensationalist": ["Sensationalist"],
+    "Many_Siblings": ["Many_Siblings", "Siblings"],
+    "High_Diffusion": [],
+    "Cluster_ID": ["Cluster_ID"],
+    "Cluster_Size": ["Cluster_Size"],
+    "Siblings": ["Siblings"],
+    "Views_standard": ["Engagement", "Member_count"],
+    "Forwards_standard": ["Engagement", "Member_count"],
+}
+HISTORY_FIELDS = ["Content", "Engagement", "Member_count"] # Arrays with one entry per crawl, of which only the last is used.
 
 class MongoListInterface:
     """
@@ -22,6 +53,8 @@ class MongoListInterface:
         """
         self.client = MongoClient(os.environ['MONGO_DB_URI'], server_api=ServerApi('1'))
         self.db = self.client[os.environ['MONGO_DB_NAME']]
+        self.max_workers = int(os.environ.get('MONGO_LIST_MAX_WORKERS', 16))
+        self.parse_on_server = os.environ.get('MONGO_LIST_PARSER', 'python') == 'server'
         self.label2id = {
             "factual": 1,
             "polarization": 1,
@@ -100,7 +133,7 @@ class MongoListInterface:
         str or None: The value associated with the nested key, or None if it does not exist.
         """
         res = doc.get(key1)
-        if res is None:
+        if not res:
             return None
         else:
             return res[-1].get(key2)
@@ -119,15 +152,22 @@ class MongoListInterface:
     
     def check_if_many_siblings(self, doc: dict, cutoff: int) -> int:
         """
-        Checks if a document has many sibling links.
+        Checks if a document has many sibling links. Uses the Many_Siblings field that the claim cluster maintenance
+        of the ML_Interface stores with every clustered post, and the length of its Siblings array for older posts.
+        The stored field counts all other posts of the claim cluster (posts connected through siblings of siblings),
+        not only the direct siblings, and uses the cutoff configured there.
 
         Parameters:
         doc (dict): The document to check for siblings.
-        cutoff (int): The threshold number of siblings to determine if the document has many siblings.
+        cutoff (int): The threshold number of siblings to determine if the document has many siblings, for
+        documents without a stored Many_Siblings field.
 
         Returns:
         int: 1 if the number of siblings is greater than or equal to the cutoff, otherwise 0.
         """
+        many_siblings = doc.get("Many_Siblings")
+        if isinstance(many_siblings, (float, int)):
+            return int(many_siblings)
         siblings = doc.get("Siblings")
         if siblings is None:
             return 0
@@ -175,8 +215,144 @@ class MongoListInterface:
         """
         documents = sorted(documents, key=lambda x: x['Publishing_datetime'], reverse=True)
         return documents
+
+    def encode_token(self, doc: dict) -> str:
+        """
+        Encodes the position of a document in the (Publishing_datetime, _id) order as an opaque continuation token.
+
+        Parameters:
+        doc (dict): The last raw document of a page.
+
+        Returns:
+        str: A URL-safe token.
+        """
+        position = {"d": doc["Publishing_datetime"].isoformat(), "i": str(doc["_id"])}
+        return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+    def decode_token(self, token: str) -> Tuple[datetime, ObjectId]:
+        """
+        Decodes a continuation token created by `encode_token`.
+
+        Parameters:
+        token (str): The token.
+
+        Returns:
+        Tuple[datetime, ObjectId]: The Publishing_datetime and _id of the last document of the previous page.
+
+        Raises:
+        ValueError: If the token is malformed.
+        """
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+            return datetime.fromisoformat(position["d"]), ObjectId(position["i"])
+        except (binascii.Error, UnicodeError, TypeError, KeyError, InvalidId, ValueError) as error:
+            raise ValueError(f"Invalid continuation token: {token}") from error
+
+    def merge_collections(
+        self, 
+        collection_names: List[str], 
+        start_date: Union[datetime, str], 
+        end_date: Union[datetime, str], 
+        factual: bool,
+        after: Union[Tuple[datetime, ObjectId], None] = None,
+        limit: int = 0,
+        cutoff: int = 5,
+        fields: Union[List[str], None] = None,
+    ) -> MergedCursor:
+        """
+        Queries the collections concurrently, each sorted by (Publishing_datetime, _id) in descending order, and
+        merges the cursors lazily into one sorted stream. With the server parser, the documents are parsed by an
+        aggregation pipeline (`get_parse_pipeline`), otherwise only the stored fields needed for them are returned
+        (`get_projection`). Either way, `finish_document` turns them into parsed documents.
+
+        Parameters:
+        collection_names (List[str]): The names of the collections to query.
+        start_date (Union[datetime, str]): The start date of the range as a datetime object or string.
+        end_date (Union[datetime, str]): The end date of the range as a datetime object or string.
+        factual (bool): Whether to return only factual documents.
+        after (Tuple[datetime, ObjectId] or None): If given, only documents after this position are returned.
+        limit (int): The maximum number of documents per collection. 0 means no limit.
+        cutoff (int): The threshold used to determine if a document has "many siblings."
+        fields (List[str] or None): The fields of the parsed documents, or None for all fields.
+
+        Returns:
+        MergedCursor: The documents of all collections, sorted by their publishing date in descending order.
+        """
+        if self.parse_on_server:
+            query = {"pipeline": self.get_parse_pipeline(cutoff=cutoff, fields=fields)}
+        else:
+            query = {"projection": self.get_projection(fields=fields)}
+        cursors = [self.get_daterange_docs_from_single_collection(collection_name=collection_name, start_date=start_date, end_date=end_date, factual=factual, after=after, limit=limit, sort=True, **query)
+                   for collection_name in collection_names]
+        return MergedCursor(cursors=cursors, key=lambda x: (x['Publishing_datetime'], x['_id']), max_workers=self.max_workers)
+
+    def validate_fields(self, fields: Union[List[str], None]) -> None:
+        """
+        Checks that all requested fields are fields of a parsed document.
+
+        Parameters:
+        fields (List[str] or None): The requested fields, or None for all fields.
+
+        Raises:
+        ValueError: If a field is unknown.
+        """
+        unknown = [field for field in fields or [] if field not in FIELD_SOURCES]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(FIELD_SOURCES)}.")
+
+    def get_projection(self, fields: Union[List[str], None] = None) -> dict:
+        """
+        Builds the MongoDB projection of the stored fields needed for the requested fields of the parsed documents.
+        Only the last entry of the history arrays and only the links of the siblings are returned by the server.
+
+        Parameters:
+        fields (List[str] or None): The requested fields, or None for all fields.
+
+        Returns:
+        dict: The projection. _id and Publishing_datetime are always included, because the documents are sorted by them.
+        """
+        projection = {"_id": 1, "Publishing_datetime": 1}
+        for field in fields or FIELD_SOURCES:
+            for source in FIELD_SOURCES[field]:
+                if source in HISTORY_FIELDS:
+                    projection[source] = {"$slice": -1}
+                elif source == "Siblings":
+                    projection["Siblings.Link"] = 1
+                else:
+                    projection[source] = 1
+        return projection
+
+    def create_indexes(self, collection_names: Union[str, List[str]] = []) -> List[str]:
+        """
+        Creates the index on (Publishing_datetime, _id) in descending order in the channel collections, which the
+        sorted and keyset paginated queries of every collection are served from. Without it, MongoDB sorts every
+        collection in memory.
+
+        Parameters:
+        collection_names (Union[str, List[str]]): The names of the collections. Defaults to all collections if not provided.
+
+        Returns:
+        List[str]: The names of the indexed collections.
+        """
+        collection_names = self.get_collection_names(collection_names=collection_names, remove_russian=False)
+        for collection_name in collection_names:
+            self.db[collection_name].create_index([("Publishing_datetime", DESCENDING), ("_id", DESCENDING)])
+        return collection_names
+
+    def get_collection_names(self, collection_names: Union[str, List[str]], remove_russian: bool) -> List[str]:
+        """
+        Returns the collections to query: the requested ones, or all collections (optionally without the russian
+        language only channels) if none are requested.
+        """
+        if isinstance(collection_names, str):
+            collection_names = [collection_names]
+        if not collection_names:
+            collection_names = self.db.list_collection_names()
+            if remove_russian:
+                collection_names = self.remove_russian_channels(collection_names=collection_names)
+        return collection_names
     
-    def parse_document(self, doc: dict, cutoff: int) -> dict:
+    def parse_document(self, doc: dict, cutoff: int, fields: Union[List[str], None] = None) -> dict:
         """
         Parses a document from the database and extracts relevant fields, performing transformations as necessary.
 
@@ -184,6 +360,7 @@ class MongoListInterface:
         doc (dict): The document to be parsed. This is typically a dictionary representing a record from a MongoDB collection.
         cutoff (int): The threshold used to determine if the document has "many siblings." This is used in the 
         `check_if_many_siblings` method to categorize the document based on the number of sibling links.
+        fields (List[str] or None): The fields to return, or None for all fields.
 
         Returns:
         dict: A dictionary containing the parsed and transformed document.
@@ -207,19 +384,159 @@ class MongoListInterface:
             "Sensationalist": self.get_binary(doc.get("Sensationalist")),
             "Many_Siblings": self.check_if_many_siblings(doc=doc, cutoff=cutoff),
             "High_Diffusion": None,  # To be implemented
-            "Siblings": doc.get("Siblings", [])
+            "Cluster_ID": doc.get("Cluster_ID"),
+            "Cluster_Size": doc.get("Cluster_Size"),
+            "Siblings": doc.get("Siblings") or []
         }
         if len(parsed_doc["Siblings"]) > 0:
             parsed_doc["Siblings"] = list(set([s["Link"] for s in parsed_doc["Siblings"]]))
         parsed_doc = self.standardize_engagement(parsed_doc=parsed_doc)
+        if fields is not None:
+            parsed_doc = {field: parsed_doc[field] for field in fields}
         return parsed_doc
-       
+
+    def get_parse_pipeline(self, cutoff: int, fields: Union[List[str], None] = None) -> List[dict]:
+        """
+        Builds the aggregation stages that perform the transformations of `parse_document` on the server, so the
+        documents are returned in the shape of the parsed documents (plus _id, which the continuation token needs).
+
+        Parameters:
+        cutoff (int): The threshold used to determine if a document has "many siblings."
+        fields (List[str] or None): The fields to return, or None for all fields.
+
+        Returns:
+        List[dict]: A $project stage with the parsed fields, an $addFields stage with the standardized engagement,
+        and, if `fields` is given, a $project stage that keeps only these fields, _id and Publishing_datetime.
+        """
+        def value(field: str) -> dict:
+            # A missing field is returned as None, like doc.get.
+            return {"$ifNull": [f"${field}", None]}
+
+        def last_value(key1: str, key2: str) -> dict:
+            # get_nested_values: the value of key2 in the last entry of the history array key1.
+            return {"$let": {"vars": {"last": {"$arrayElemAt": [f"${key1}", -1]}}, "in": {"$ifNull": [f"$$last.{key2}", None]}}}
+
+        def lookup(field: str, mapping: dict, default) -> dict:
+            return {"$switch": {"branches": [{"case": {"$eq": [f"${field}", key]}, "then": item} for key, item in mapping.items()], "default": default}}
+
+        def ratio(numerator: str) -> dict:
+            return {"$cond": [{"$and": [{"$isNumber": f"${numerator}"}, {"$isNumber": "$Member_count"}]}, {"$divide": [f"${numerator}", "$Member_count"]}, None]}
+
+        text = {"$let": {
+            "vars": {"text": {"$ifNull": [last_value("Content", "Text"), ""]}, "caption": {"$ifNull": [last_value("Content", "Caption"), ""]}},
+            "in": {"$switch": {"branches": [
+                {"case": {"$and": [{"$ne": ["$$text", ""]}, {"$ne": ["$$caption", ""]}]}, "then": {"$concat": ["$$text", " ", "$$caption"]}},
+                {"case": {"$ne": ["$$text", ""]}, "then": "$$text"},
+                {"case": {"$ne": ["$$caption", ""]}, "then": "$$caption"},
+            ], "default": None}},
+        }}
+        many_siblings = {"$switch": {"branches": [
+            {"case": {"$isNumber": "$Many_Siblings"}, "then": {"$toInt": "$Many_Siblings"}},
+            {"case": {"$isArray": "$Siblings"}, "then": {"$cond": [{"$gte": [{"$size": "$Siblings"}, cutoff]}, 1, 0]}},
+        ], "default": 0}}
+        stages = [
+            {"$project": {
+                "Message_ID": value("Message_ID"),
+                "Channel_Name": value("Channel_Name"),
+                "Link": value("Link"),
+                "Publishing_datetime": value("Publishing_datetime"),
+                "Member_count": last_value("Member_count", "Member_count"),
+                "Views": last_value("Engagement", "Views"),
+                "Forwards": last_value("Engagement", "Forwards"),
+                "Text": text,
+                "Topic": lookup("Topic", self.topic_en2de, None),
+                "Narratives": value("Narratives"),
+                "Factual": lookup("Factual", self.label2id, 0),
+                "Polarising": lookup("Polarising", self.label2id, 0),
+                "Sensationalist": lookup("Sensationalist", self.label2id, 0),
+                "Many_Siblings": many_siblings,
+                "High_Diffusion": {"$literal": None},
+                "Cluster_ID": value("Cluster_ID"),
+                "Cluster_Size": value("Cluster_Size"),
+                "Siblings": {"$cond": [{"$isArray": "$Siblings"}, {"$setUnion": ["$Siblings.Link"]}, []]},
+            }},
+            {"$addFields": {"Views_standard": ratio("Views"), "Forwards_standard": ratio("Forwards")}},
+        ]
+        if fields is not None:
+            stages.append({"$project": {field: 1 for field in ["_id", "Publishing_datetime"] + fields}})
+        return stages
+
+    def finish_document(self, doc: dict, cutoff: int, fields: Union[List[str], None] = None) -> dict:
+        """
+        Turns a document returned by `merge_collections` into a parsed document: documents parsed on the server only
+        lose _id and are put in the order of the fields, the others are parsed by `parse_document`.
+
+        Parameters:
+        doc (dict): The document returned by MongoDB.
+        cutoff (int): The threshold used to determine if the document has "many siblings."
+        fields (List[str] or None): The fields to return, or None for all fields.
+
+        Returns:
+        dict: The parsed document.
+        """
+        if not self.parse_on_server:
+            return self.parse_document(doc=doc, cutoff=cutoff, fields=fields)
+        return {field: doc.get(field) for field in fields or FIELD_SOURCES}
+
+    def compare_parsers(
+        self,
+        start_date: Union[datetime, str],
+        end_date: Union[datetime, str],
+        collection_names: Union[str, List[str]] = [],
+        cutoff: int = 5,
+        remove_russian: bool = True,
+        limit: int = 1000,
+    ) -> Tuple[int, List[str]]:
+        """
+        Checks that the aggregation pipeline of the server parser returns the same documents as `parse_document`.
+        Siblings are compared as sets (neither parser keeps their order) and the standardized engagement up to
+        floating point rounding.
+
+        Parameters:
+        start_date (Union[datetime, str]): The start date of the range as a datetime object or string.
+        end_date (Union[datetime, str]): The end date of the range as a datetime object or string.
+        collection_names (Union[str, List[str]]): The names of the collections to check. Defaults to all collections if not provided.
+        cutoff (int): The threshold used to determine if a document has "many siblings."
+        remove_russian (bool): Whether to remove russian language only channels. Defaults to True.
+        limit (int): The maximum number of documents checked per collection. 0 means no limit.
+
+        Returns:
+        Tuple[int, List[str]]: The number of checked documents and a description of every difference.
+        """
+        def same(field: str, python_value, server_value) -> bool:
+            if field == "Siblings":
+                return set(python_value) == set(server_value)
+            if isinstance(python_value, float) and isinstance(server_value, float):
+                return math.isclose(python_value, server_value, rel_tol=1e-12)
+            return python_value == server_value
+
+        checked, differences = 0, list()
+        for collection_name in self.get_collection_names(collection_names=collection_names, remove_russian=remove_russian):
+            documents = self.get_daterange_docs_from_single_collection(collection_name=collection_name, start_date=start_date, end_date=end_date, factual=False, limit=limit, sort=True)
+            parsed = {doc["_id"]: self.parse_document(doc=doc, cutoff=cutoff) for doc in documents}
+            for doc in self.get_daterange_docs_from_single_collection(collection_name=collection_name, start_date=start_date, end_date=end_date, factual=False, limit=limit, sort=True, pipeline=self.get_parse_pipeline(cutoff=cutoff)):
+                python_doc = parsed.pop(doc["_id"], None)
+                if python_doc is None:
+                    differences.append(f"{collection_name} {doc['_id']}: only returned by the server parser")
+                    continue
+                checked += 1
+                for field in FIELD_SOURCES:
+                    if not same(field, python_doc[field], doc.get(field)):
+                        differences.append(f"{collection_name} {doc['_id']} {field}: {python_doc[field]!r} (python) != {doc.get(field)!r} (server)")
+            differences.extend(f"{collection_name} {_id}: not returned by the server parser" for _id in parsed)
+        return checked, differences
+
     def get_daterange_docs_from_single_collection(
         self, 
         collection_name: str, 
         start_date: Union[datetime, str], 
         end_date: Union[datetime, str], 
         factual: bool,
+        after: Union[Tuple[datetime, ObjectId], None] = None,
+        limit: int = 0,
+        sort: bool = False,
+        projection: Union[dict, None] = None,
+        pipeline: Union[List[dict], None] = None,
     ) -> list:
         """
         Retrieves documents from a single collection within a specified date range.
@@ -229,6 +546,14 @@ class MongoListInterface:
         start_date (Union[datetime, str]): The start date of the range as a datetime object or string.
         end_date (Union[datetime, str]): The end date of the range as a datetime object or string.
         factual (bool): Whether to return only factual documents.
+        after (Tuple[datetime, ObjectId] or None): If given, only documents after this (Publishing_datetime, _id)
+        position are returned, sorted by Publishing_datetime and _id in descending order.
+        limit (int): The maximum number of documents to return. 0 means no limit.
+        sort (bool): Whether to sort the documents by Publishing_datetime and _id in descending order. Always done
+        with `after` or `limit`.
+        projection (dict or None): The projection of the returned fields, or None for whole documents.
+        pipeline (List[dict] or None): If given, the documents are queried with an aggregation, and these stages are
+        applied to them after the match, sort and limit stages. `projection` is ignored.
 
         Returns:
         list: A list of documents that match the query.
@@ -250,7 +575,22 @@ class MongoListInterface:
         # Return only factual posts
         if factual:
             query["Factual"] = "factual"
-        return self.db[collection_name].find(query)
+        if after is not None:
+            query["$or"] = [
+                {"Publishing_datetime": {"$lt": after[0]}},
+                {"Publishing_datetime": after[0], "_id": {"$lt": after[1]}},
+            ]
+        sort = sort or after is not None or limit > 0
+        if pipeline is not None:
+            stages = [{"$match": query}]
+            if sort:
+                stages.append({"$sort": {"Publishing_datetime": DESCENDING, "_id": DESCENDING}})
+            if limit > 0:
+                stages.append({"$limit": limit})
+            return self.db[collection_name].aggregate(stages + pipeline)
+        if not sort:
+            return self.db[collection_name].find(query, projection)
+        return self.db[collection_name].find(query, projection).sort([("Publishing_datetime", DESCENDING), ("_id", DESCENDING)]).limit(limit)
     
     def get_daterange_docs(
         self, 
@@ -259,7 +599,8 @@ class MongoListInterface:
         collection_names: Union[str, List[str]] = [],
         factual: bool = False,
         cutoff: int = 5,
-        remove_russian:bool = True
+        remove_russian:bool = True,
+        fields: Union[List[str], None] = None,
     ) -> list:
         """
         Retrieves documents from multiple collections within a specified date range.
@@ -271,22 +612,92 @@ class MongoListInterface:
         factual (bool): Whether to return only factual documents. Defaults to False.
         cutoff (int): The threshold used to determine if a document has "many siblings."
         remove_russian (bool): Whether to remove russian language only channels. Defaults to True.
+        fields (List[str] or None): The fields of the parsed documents to return. Defaults to all fields. Only the
+        stored fields needed for them are read from MongoDB.
         
         Returns:
         list: A list of parsed documents that match the query, sorted by their publishing date.
         """
-        documents = list()
-        if isinstance(collection_names, str):
-            collection_names = [collection_names]
-        if not collection_names:
-            collection_names = self.db.list_collection_names()
-            if remove_russian:
-                collection_names = self.remove_russian_channels(collection_names=collection_names)
-        for collection_name in tqdm(collection_names, total=len(collection_names), desc="Query MongoDB", leave=False):
-            for doc in self.get_daterange_docs_from_single_collection(collection_name=collection_name, start_date=start_date, end_date=end_date, factual=factual):
-                documents.append(self.parse_document(doc=doc, cutoff=cutoff))
-        documents = self.sort_results_by_date(documents=documents)
-        return documents
+        return list(self.iter_daterange_docs(start_date=start_date, end_date=end_date, collection_names=collection_names, factual=factual, cutoff=cutoff, remove_russian=remove_russian, fields=fields))
+
+    def iter_daterange_docs(
+        self, 
+        start_date: Union[datetime, str], 
+        end_date: Union[datetime, str], 
+        collection_names: Union[str, List[str]] = [],
+        factual: bool = False,
+        cutoff: int = 5,
+        remove_russian: bool = True,
+        fields: Union[List[str], None] = None,
+    ) -> Iterator[dict]:
+        """
+        Yields the parsed documents of multiple collections within a specified date range, sorted by their publishing
+        date, as the cursors produce them. The collections are queried concurrently, every collection is sorted on the
+        server and the cursors are merged lazily (`merge_collections`), so the first document is available right away
+        and memory does not grow with the size of the range.
+
+        Parameters:
+        start_date (Union[datetime, str]): The start date of the range as a datetime object or string.
+        end_date (Union[datetime, str]): The end date of the range as a datetime object or string.
+        collection_names (Union[str, List[str]]): The names of the collections to query. Defaults to all collections if not provided.
+        factual (bool): Whether to return only factual documents. Defaults to False.
+        cutoff (int): The threshold used to determine if a document has "many siblings."
+        remove_russian (bool): Whether to remove russian language only channels. Defaults to True.
+        fields (List[str] or None): The fields of the parsed documents to return. Defaults to all fields. Only the
+        stored fields needed for them are read from MongoDB.
+
+        Returns:
+        Iterator[dict]: The parsed documents, sorted by their publishing date in descending order.
+        """
+        self.validate_fields(fields=fields)
+        collection_names = self.get_collection_names(collection_names=collection_names, remove_russian=remove_russian)
+        for doc in self.merge_collections(collection_names=collection_names, start_date=start_date, end_date=end_date, factual=factual, cutoff=cutoff, fields=fields):
+            yield self.finish_document(doc=doc, cutoff=cutoff, fields=fields)
+
+    def get_daterange_page(
+        self, 
+        start_date: Union[datetime, str], 
+        end_date: Union[datetime, str], 
+        collection_names: Union[str, List[str]] = [],
+        factual: bool = False,
+        cutoff: int = 5,
+        remove_russian: bool = True,
+        page_size: int = 3000,
+        token: Union[str, None] = None,
+        fields: Union[List[str], None] = None,
+    ) -> Tuple[list, Union[str, None]]:
+        """
+        Retrieves one page of documents from multiple collections within a specified date range, using keyset
+        pagination on (Publishing_datetime, _id). Every collection returns at most `page_size` documents after the
+        position of the token, sorted on the server, and the merge stops after `page_size` + 1 documents, so a page
+        costs the same wherever it is in the range.
+
+        Parameters:
+        start_date (Union[datetime, str]): The start date of the range as a datetime object or string.
+        end_date (Union[datetime, str]): The end date of the range as a datetime object or string.
+        collection_names (Union[str, List[str]]): The names of the collections to query. Defaults to all collections if not provided.
+        factual (bool): Whether to return only factual documents. Defaults to False.
+        cutoff (int): The threshold used to determine if a document has "many siblings."
+        remove_russian (bool): Whether to remove russian language only channels. Defaults to True.
+        fields (List[str] or None): The fields of the parsed documents to return. Defaults to all fields. Only the
+        stored fields needed for them are read from MongoDB.
+        page_size (int): The number of documents per page. Defaults to 3000.
+        token (str or None): The continuation token returned with the previous page, or None for the first page.
+
+        Returns:
+        Tuple[list, Union[str, None]]: The parsed documents of the page, sorted by their publishing date, and the
+        token of the next page (None on the last page).
+        """
+        after = None if token is None else self.decode_token(token=token)
+        self.validate_fields(fields=fields)
+        collection_names = self.get_collection_names(collection_names=collection_names, remove_russian=remove_russian)
+        merged = iter(self.merge_collections(collection_names=collection_names, start_date=start_date, end_date=end_date, factual=factual, after=after, limit=page_size + 1, cutoff=cutoff, fields=fields))
+        try:
+            documents = list(islice(merged, page_size + 1))
+        finally:
+            merged.close()
+        next_token = self.encode_token(doc=documents[page_size - 1]) if len(documents) > page_size else None
+        return [self.finish_document(doc=doc, cutoff=cutoff, fields=fields) for doc in documents[:page_size]], next_token
     
 if __name__ == "__main__":
     docs = MongoListInterface().get_daterange_docs("2024-07-30", "2024-07-31", ["neuesausrussland"], True)
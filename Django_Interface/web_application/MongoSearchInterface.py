@@ -1,8 +1,28 @@
 import os
+import json
+import socket
 import requests
-from typing import List
+from typing import List, Union
+from http.client import HTTPConnection
+from urllib.parse import urlparse
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
+from bson.binary import Binary, BinaryVectorDtype
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """
+    An HTTP connection over a Unix socket.
+    """
+
+    def __init__(self, socket_path: str, timeout=None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
 
 
 class MongoSearchInterface():
@@ -20,6 +40,12 @@ class MongoSearchInterface():
         The specific MongoDB collection where the vector data is stored.
     cosine_cutoff : float
         The cosine similarity threshold used to filter out less relevant results.
+    vector_dtype : str
+        The encoding of the stored embeddings ("float32" or "int8" BSON binary vectors, or "array").
+    local_index : LocalVectorIndex or None
+        A local replica of the vector collection, used instead of Atlas if `VECTOR_SEARCH_BACKEND` is "local".
+    inference_server_url : str or None
+        The URL of the local inference server of the ML_Interface (`INFERENCE_SERVER_URL`), used instead of RunPod.
     """
 
     def __init__(self, cosine_cutoff: float = .91) -> None:
@@ -36,8 +62,16 @@ class MongoSearchInterface():
         self.client = MongoClient(os.environ['MONGO_DB_URI'], server_api=ServerApi('1'))
         self.collection = self.client[os.environ['MONGO_VECTOR_DB_NAME']][os.environ['MONGO_VECTOR_DB_NAME']]
         self.cosine_cutoff = (1 + cosine_cutoff) / 2
+        self.vector_dtype = os.environ.get('MONGO_VECTOR_DTYPE', 'float32')
+        self.local_index = None
+        if os.environ.get('VECTOR_SEARCH_BACKEND', 'atlas') == 'local':
+            from .LocalVectorIndex import get_local_index
+            self.local_index = get_local_index(folder=os.environ['LOCAL_VECTOR_INDEX_PATH'])
+        self.inference_server_url = os.environ.get('INFERENCE_SERVER_URL')
 
     def embed_query(self, query_text:str):
+        if self.inference_server_url:
+            return self.embed_query_local(query_text=query_text)
         headers = {
         "Authorization": f"Bearer {os.environ['RUNPOD_API_KEY']}",
         "Content-Type": "application/json"
@@ -52,6 +86,37 @@ class MongoSearchInterface():
         response = requests.post(url, headers=headers, json=data)
         return response.json()["output"]["data"][0]["embedding"]
 
+    def embed_query_local(self, query_text: str) -> List[float]:
+        """
+        Generates an embedding for the given query text on the local inference server of the ML_Interface, which keeps
+        the claim-matching embedder loaded and batches concurrent requests.
+
+        Parameters:
+        -----------
+        query_text : str
+            The input text for which the semantic embedding is to be generated.
+
+        Returns:
+        --------
+        List[float]
+            The embedding vector generated for the input text.
+        """
+        parsed = urlparse(self.inference_server_url)
+        if parsed.scheme == "unix":
+            connection = UnixHTTPConnection(socket_path=parsed.path, timeout=30)
+        else:
+            connection = HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+        try:
+            body = json.dumps({"task": "query-embedding", "inputs": [query_text]})
+            connection.request("POST", "/inference", body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            data = json.loads(response.read())
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise RuntimeError(f"Inference server returned {response.status}: {data.get('error')}")
+        return data["outputs"][0]
+
     def embed_query_openai(self, query_text: str):
         """
         Generates an embedding for the given query text using the OpenAI API via RunPod.
@@ -85,6 +150,29 @@ class MongoSearchInterface():
         #return embedding.data[0].embedding
         pass
 
+    def encode_vector(self, embedding: List[float]) -> Union[Binary, List[float]]:
+        """
+        Encodes the query embedding the same way the stored embeddings are encoded.
+
+        Parameters:
+        -----------
+        embedding : List[float]
+            The embedding vector of the query.
+
+        Returns:
+        --------
+        Union[Binary, List[float]]
+            A BSON float32 or int8 binary vector, or the plain list if vectors are stored as arrays.
+        """
+        if self.vector_dtype == "float32":
+            return Binary.from_vector(embedding, BinaryVectorDtype.FLOAT32)
+        elif self.vector_dtype == "int8":
+            # Scaled by the largest absolute value, like the stored vectors, so the codes use the full int8 range.
+            scale = max((abs(x) for x in embedding), default=0) or 1.0
+            quantized = [max(-127, min(127, round(x * 127 / scale))) for x in embedding]
+            return Binary.from_vector(quantized, BinaryVectorDtype.INT8)
+        return embedding
+
     def remove_duplicates(self, query_results: list) -> list:
         """
         Removes duplicate results from the query results based on the `Link` key.
@@ -143,9 +231,31 @@ class MongoSearchInterface():
             A list of dictionaries representing the matching documents, filtered by cosine similarity
             and with duplicates removed.
         """
-        query_results = self.collection.aggregate([
+        if self.local_index is not None:
+            query_results = self.local_index.search(embedding=embedding, limit=50, numCandidates=200)
+        else:
+            query_results = self.aggregate_vector_search(embedding=embedding)
+        query_results = self.remove_by_cos(query_results=query_results)
+        query_results = self.remove_duplicates(query_results=query_results)
+        return query_results
+
+    def aggregate_vector_search(self, embedding: List[float]):
+        """
+        Runs an Atlas `$vectorSearch` aggregation for the provided embedding vector.
+
+        Parameters:
+        -----------
+        embedding : List[float]
+            The embedding vector to use for the query.
+
+        Returns:
+        --------
+        pymongo.command_cursor.CommandCursor
+            A cursor over the matching documents with their vector search score.
+        """
+        return self.collection.aggregate([
             {"$vectorSearch": {
-                "queryVector": embedding,
+                "queryVector": self.encode_vector(embedding=embedding),
                 "path": "text_embedding",
                 "numCandidates": 200,
                 "limit": 50,
@@ -161,9 +271,6 @@ class MongoSearchInterface():
                 }
             }
             ])
-        query_results = self.remove_by_cos(query_results=query_results)
-        query_results = self.remove_duplicates(query_results=query_results)
-        return query_results
 
     def search(self, query_text: str) -> list:
         """
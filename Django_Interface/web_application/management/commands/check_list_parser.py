@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from web_application.MongoListInterface import MongoListInterface
+
+
+class Command(BaseCommand):
+    help = "Checks that the aggregation pipeline of the server parser of list_api (MONGO_LIST_PARSER=server) returns the same posts as the Python parser."
+
+    def add_arguments(self, parser):
+        parser.add_argument("start_date", type=str, help="The start date of the checked range (YYYY-MM-DD).")
+        parser.add_argument("end_date", type=str, help="The end date of the checked range (YYYY-MM-DD).")
+        parser.add_argument("--collections", type=str, nargs="*", default=[], help="The collections to check. Default is all collections.")
+        parser.add_argument("--cutoff", type=int, default=5, help="The sibling cutoff of Many_Siblings. Default is 5.")
+        parser.add_argument("--limit", type=int, default=1000, help="The maximum number of posts checked per collection, 0 for all. Default is 1000.")
+
+    def handle(self, *args, **options):
+        checked, differences = MongoListInterface().compare_parsers(
+            start_date=options["start_date"],
+            end_date=options["end_date"],
+            collection_names=options["collections"],
+            cutoff=options["cutoff"],
+            limit=options["limit"],
+        )
+        for difference in differences:
+            self.stderr.write(difference)
+        if differences:
+            raise CommandError(f"{len(differences)} differences in {checked} posts.")
+        self.stdout.write(self.style.SUCCESS(f"The parsers agree on {checked} posts."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from web_application.MongoListInterface import MongoListInterface
+
+
+class Command(BaseCommand):
+    help = "Creates the index on (Publishing_datetime, _id) that list_api sorts and paginates every channel collection with. Run it again after channel collections were added."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--collections", type=str, nargs="*", default=[], help="The collections to index. Default is all collections.")
+
+    def handle(self, *args, **options):
+        collection_names = MongoListInterface().create_indexes(collection_names=options["collections"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(collection_names)} collections."))
@@ -0,0 +1,202 @@
+import math
+import unittest
+from datetime import datetime
+from unittest import mock
+import mongomock
+import numpy as np
+from pymongo.errors import InvalidOperation
+from . import MongoListInterface as mongo_list_interface
+from . import MongoSearchInterface as mongo_search_interface
+from .MergedCursor import MergedCursor
+from .MongoListInterface import MongoListInterface
+from .MongoSearchInterface import MongoSearchInterface
+
+PUBLISHING_DATETIME = datetime(2024, 7, 30, 12)
+# One document per edge case of parse_document, keyed by a description of the case.
+CASES = {
+    "missing Content": {},
+    "empty Content": {"Content": []},
+    "text only": {"Content": [{"Text": "old", "Caption": "old"}, {"Text": "text", "Caption": None}]},
+    "caption only": {"Content": [{"Text": None, "Caption": "caption"}]},
+    "text and caption": {"Content": [{"Text": "text", "Caption": "caption"}]},
+    "empty text and caption": {"Content": [{"Text": "", "Caption": ""}]},
+    "missing text keys": {"Content": [{}]},
+    "known labels and topic": {"Factual": "factual", "Polarising": "non-polarization", "Sensationalist": "sensational", "Topic": "Health"},
+    "unknown labels and topic": {"Factual": "unknown", "Polarising": None, "Sensationalist": "", "Topic": "Unknown"},
+    "stored Many_Siblings": {"Many_Siblings": 1, "Cluster_Size": 2, "Siblings": [{"Link": "a"}]},
+    "stored Many_Siblings 0": {"Many_Siblings": 0, "Cluster_Size": 9, "Siblings": [{"Link": f"l{i}"} for i in range(9)]},
+    "Siblings fallback above cutoff": {"Cluster_Size": 9, "Siblings": [{"Link": f"l{i}"} for i in range(6)]},
+    "Siblings fallback below cutoff": {"Siblings": [{"Link": "a"}, {"Link": "b"}]},
+    "missing Siblings": {},
+    "null Siblings": {"Siblings": None},
+    "duplicate sibling links": {"Siblings": [{"Link": "a"}, {"Link": "a"}, {"Link": "b"}, {"Link": "a"}]},
+    "engagement": {"Member_count": [{"Member_count": 10}, {"Member_count": 400}], "Engagement": [{"Views": 1, "Forwards": 1}, {"Views": 100, "Forwards": 3}]},
+    "float engagement": {"Member_count": [{"Member_count": 3.0}], "Engagement": [{"Views": 1.5, "Forwards": None}]},
+    "non-numeric Member_count": {"Member_count": [{"Member_count": "n/a"}], "Engagement": [{"Views": 100, "Forwards": 3}]},
+    "missing Member_count": {"Engagement": [{"Views": 100, "Forwards": 3}]},
+    "non-numeric Views": {"Member_count": [{"Member_count": 400}], "Engagement": [{"Views": "many", "Forwards": 3}]},
+}
+
+
+class ParserEquivalenceTest(unittest.TestCase):
+    """
+    Checks that the aggregation pipeline of the server parser (`get_parse_pipeline`) returns the same documents as
+    the Python parser (`parse_document`), on an in-memory MongoDB.
+    """
+
+    def setUp(self) -> None:
+        client = mongomock.MongoClient()
+        patches = [
+            mock.patch.dict("os.environ", {"MONGO_DB_URI": "mongodb://localhost", "MONGO_DB_NAME": "test"}),
+            mock.patch.object(mongo_list_interface, "MongoClient", lambda *args, **kwargs: client),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.interface = MongoListInterface()
+        self.interface.max_workers = 1 # mongomock is not thread-safe.
+        self.ids = dict()
+        for idx, (case, fields) in enumerate(CASES.items()):
+            doc = {"Message_ID": idx, "Channel_Name": "channel", "Link": f"https://t.me/channel/{idx}", "Publishing_datetime": PUBLISHING_DATETIME, **fields}
+            self.ids[case] = self.interface.db["channel"].insert_one(doc).inserted_id
+
+    def parse_both(self, cutoff: int = 5, fields=None) -> tuple:
+        """
+        Returns the documents parsed in Python and on the server, keyed by case.
+        """
+        collection = self.interface.db["channel"]
+        python_docs = {doc["_id"]: self.interface.parse_document(doc=doc, cutoff=cutoff, fields=fields) for doc in collection.find()}
+        self.interface.parse_on_server = True
+        server_docs = {doc["_id"]: self.interface.finish_document(doc=doc, cutoff=cutoff, fields=fields) for doc in collection.aggregate(self.interface.get_parse_pipeline(cutoff=cutoff, fields=fields))}
+        return {case: python_docs[_id] for case, _id in self.ids.items()}, {case: server_docs[_id] for case, _id in self.ids.items()}
+
+    def assertSameDocument(self, python_doc: dict, server_doc: dict) -> None:
+        self.assertEqual(list(python_doc), list(server_doc))
+        for field, value in python_doc.items():
+            if field == "Siblings":
+                self.assertCountEqual(value, server_doc[field], field)
+            elif isinstance(value, float):
+                self.assertTrue(math.isclose(value, server_doc[field]), field)
+            else:
+                self.assertEqual(value, server_doc[field], field)
+
+    def test_all_fields(self) -> None:
+        for cutoff in [1, 5]:
+            python_docs, server_docs = self.parse_both(cutoff=cutoff)
+            for case in CASES:
+                with self.subTest(case=case, cutoff=cutoff):
+                    self.assertSameDocument(python_docs[case], server_docs[case])
+
+    def test_selected_fields(self) -> None:
+        fields = ["Text", "Many_Siblings", "Views_standard"]
+        python_docs, server_docs = self.parse_both(fields=fields)
+        for case in CASES:
+            with self.subTest(case=case):
+                self.assertEqual(list(server_docs[case]), fields)
+                self.assertSameDocument(python_docs[case], server_docs[case])
+
+    def test_expected_values(self) -> None:
+        python_docs, server_docs = self.parse_both()
+        for docs in [python_docs, server_docs]:
+            self.assertIsNone(docs["missing Content"]["Text"])
+            self.assertIsNone(docs["empty Content"]["Text"])
+            self.assertEqual(docs["text only"]["Text"], "text")
+            self.assertEqual(docs["caption only"]["Text"], "caption")
+            self.assertEqual(docs["text and caption"]["Text"], "text caption")
+            self.assertIsNone(docs["empty text and caption"]["Text"])
+            self.assertEqual([docs["known labels and topic"][field] for field in ["Factual", "Polarising", "Sensationalist", "Topic"]], [1, 0, 1, "Gesundheit"])
+            self.assertEqual([docs["unknown labels and topic"][field] for field in ["Factual", "Polarising", "Sensationalist", "Topic"]], [0, 0, 0, None])
+            self.assertEqual(docs["stored Many_Siblings"]["Many_Siblings"], 1)
+            self.assertEqual(docs["stored Many_Siblings 0"]["Many_Siblings"], 0)
+            self.assertEqual(docs["Siblings fallback above cutoff"]["Many_Siblings"], 1)
+            self.assertEqual(docs["Siblings fallback below cutoff"]["Many_Siblings"], 0)
+            self.assertEqual(docs["null Siblings"]["Siblings"], [])
+            self.assertCountEqual(docs["duplicate sibling links"]["Siblings"], ["a", "b"])
+            self.assertEqual([docs["engagement"][field] for field in ["Member_count", "Views", "Views_standard", "Forwards_standard"]], [400, 100, 0.25, 0.0075])
+            self.assertEqual([docs["non-numeric Member_count"][field] for field in ["Views_standard", "Forwards_standard"]], [None, None])
+            self.assertEqual([docs["non-numeric Views"][field] for field in ["Views_standard", "Forwards_standard"]], [None, 3 / 400])
+
+    def test_parse_modes(self) -> None:
+        # The list API returns the same pages and documents with both parsers.
+        results = dict()
+        for parse_on_server in [False, True]:
+            self.interface.parse_on_server = parse_on_server
+            documents = self.interface.get_daterange_docs(start_date="2024-07-30", end_date="2024-07-30", collection_names=["channel"])
+            page, token = self.interface.get_daterange_page(start_date="2024-07-30", end_date="2024-07-30", collection_names=["channel"], page_size=5)
+            results[parse_on_server] = documents, page, token
+        self.assertEqual(results[False][2], results[True][2])
+        for python_doc, server_doc in zip(results[False][0] + results[False][1], results[True][0] + results[True][1]):
+            self.assertSameDocument(python_doc, server_doc)
+        self.assertEqual(len(results[True][0]), len(CASES))
+
+    def test_compare_parsers(self) -> None:
+        checked, differences = self.interface.compare_parsers(start_date="2024-07-30", end_date="2024-07-30", collection_names=["channel"], limit=0)
+        self.assertEqual((checked, differences), (len(CASES), []))
+
+
+class EncodeVectorTest(unittest.TestCase):
+    """
+    Checks that int8 query vectors use the full int8 range and keep the direction of the query embedding.
+    """
+
+    def setUp(self) -> None:
+        patches = [
+            mock.patch.dict("os.environ", {"MONGO_DB_URI": "mongodb://localhost", "MONGO_VECTOR_DB_NAME": "test", "MONGO_VECTOR_DTYPE": "int8"}),
+            mock.patch.object(mongo_search_interface, "MongoClient", lambda *args, **kwargs: mongomock.MongoClient()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.interface = MongoSearchInterface()
+        embeddings = np.random.default_rng(0).standard_normal((50, 1024))
+        self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def test_int8_round_trip(self) -> None:
+        for embedding in self.embeddings:
+            decoded = np.frombuffer(self.interface.encode_vector(embedding=embedding.tolist()), dtype=np.int8, offset=2).astype(np.float64)
+            self.assertEqual(np.max(np.abs(decoded)), 127)
+            self.assertLess(1 - decoded @ embedding / np.linalg.norm(decoded), 1e-3)
+
+    def test_int8_zero_vector(self) -> None:
+        self.assertEqual(self.interface.encode_vector(embedding=[0.0] * 8).as_vector().data, [0] * 8)
+
+
+class RecordingCursor:
+    """
+    A sorted in-memory cursor that records the batch sizes it is given, and like a find cursor of pymongo refuses
+    them once it has been read from if `fixed_after_use` is set.
+    """
+
+    def __init__(self, docs: list, fixed_after_use: bool) -> None:
+        self.docs = iter(docs)
+        self.fixed_after_use = fixed_after_use
+        self.used = False
+        self.batch_sizes = list()
+
+    def batch_size(self, batch_size: int) -> "RecordingCursor":
+        if self.used and self.fixed_after_use:
+            raise InvalidOperation("cannot set options after executing query")
+        self.batch_sizes.append(batch_size)
+        return self
+
+    def __iter__(self) -> "RecordingCursor":
+        return self
+
+    def __next__(self) -> dict:
+        self.used = True
+        return next(self.docs)
+
+    def close(self) -> None:
+        pass
+
+
+class MergedCursorTest(unittest.TestCase):
+
+    def test_merge_and_batch_sizes(self) -> None:
+        values = [list(range(3000, 0, -3)), list(range(6000, 0, -2)), []]
+        cursors = [RecordingCursor(docs=[{"value": value} for value in docs], fixed_after_use=idx == 0) for idx, docs in enumerate(values)]
+        merged = [doc["value"] for doc in MergedCursor(cursors=cursors, key=lambda x: x["value"])]
+        self.assertEqual(merged, sorted(values[0] + values[1], reverse=True))
+        self.assertEqual(cursors[0].batch_sizes, [101])
+        self.assertEqual(cursors[1].batch_sizes, [101, 202, 404, 808, 1000, 1000])
+        self.assertEqual(cursors[2].batch_sizes, [101])
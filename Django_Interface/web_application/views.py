@@ -1,7 +1,10 @@
+import json
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.utils.encoders import JSONEncoder
+from django.http import StreamingHttpResponse
 from datetime import datetime
 from .MongoListInterface import MongoListInterface
 from .MongoSearchInterface import MongoSearchInterface
@@ -29,15 +32,60 @@ def logger(current_time:str, start_date:str, end_date:str, telegram_channels:lis
     with open(make_path("custom_log.txt"), 'a') as file:
         file.write(s)
 
-class CustomPagination(PageNumberPagination):
+class KeysetPagination():
+    """
+    Keyset pagination over (Publishing_datetime, _id). Every page links to the next one with an opaque
+    continuation token in the `cursor` query parameter. Page numbers (the `page` parameter of the former page number
+    pagination), `count` and `previous` are not supported.
+    """
     page_size = 3000  # Number of items per page
     page_size_query_param = 'page_size'
     max_page_size = 30000  # Maximum number of items per page
+    cursor_query_param = 'cursor'
+    removed_query_params = ['page']
+
+    def validate_query_params(self, request) -> None:
+        """
+        Rejects the query parameters of the former page number pagination, so a client looping over page numbers
+        does not receive the first page forever.
+        """
+        removed = [param for param in self.removed_query_params if param in request.query_params]
+        if removed:
+            raise ValueError(f"The query parameter {', '.join(removed)} is not supported. Request the first page without it and follow the `next` link of every page.")
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_token(self, request):
+        return request.query_params.get(self.cursor_query_param) or None
+
+    def get_paginated_response(self, request, data: list, next_token):
+        next_link = None if next_token is None else replace_query_param(request.build_absolute_uri(), self.cursor_query_param, next_token)
+        return Response({"next": next_link, "results": data}, status=status.HTTP_200_OK)
+
+def stream_ndjson(documents, chunk_size: int = 500):
+    """
+    Encodes documents as newline-delimited JSON (one document per line, encoded like the JSON responses) and yields
+    them in chunks of `chunk_size` lines.
+    """
+    lines = list()
+    for doc in documents:
+        lines.append(json.dumps(doc, cls=JSONEncoder, ensure_ascii=False) + "\n")
+        if len(lines) == chunk_size:
+            yield "".join(lines)
+            lines = list()
+    if lines:
+        yield "".join(lines)
 
 class ListDataView(APIView):
     """
     API view to handle requests with start_date, end_date, and optional telegram_channels.
     Returns either a paginated list or the entire list of dictionaries based on the pagination argument.
+    With stream=true, the entire list is streamed as newline-delimited JSON while the documents are read.
     """
 
     def get(self, request):
@@ -48,20 +96,37 @@ class ListDataView(APIView):
         factual = request.query_params.get('factual', 'false').lower() == 'true'
         pagination = request.query_params.get('pagination', 'false').lower() == 'true'
         remove_russian = request.query_params.get('remove_russian', 'true').lower() == 'true'
+        stream = request.query_params.get('stream', 'false').lower() == 'true'
+        fields = request.query_params.get('fields')
+        fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+        interface = MongoListInterface()
+        try:
+            interface.validate_fields(fields=fields)
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if pagination:
+            # Fetch only the requested page if the pagination flag is True
+            paginator = KeysetPagination()
+            try:
+                paginator.validate_query_params(request)
+                data, next_token = interface.get_daterange_page(start_date=start_date, end_date=end_date, collection_names=telegram_channels, factual=factual, remove_russian=remove_russian,
+                                                                page_size=paginator.get_page_size(request), token=paginator.get_token(request), fields=fields)
+            except ValueError as error:
+                return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+            return paginator.get_paginated_response(request, data, next_token)
 
-        data = MongoListInterface().get_daterange_docs(start_date=start_date, end_date=end_date, collection_names=telegram_channels, factual=factual, remove_russian=remove_russian)
+        if stream:
+            documents = interface.iter_daterange_docs(start_date=start_date, end_date=end_date, collection_names=telegram_channels, factual=factual, remove_russian=remove_russian, fields=fields)
+            return StreamingHttpResponse(stream_ndjson(documents), content_type="application/x-ndjson")
+
+        data = interface.get_daterange_docs(start_date=start_date, end_date=end_date, collection_names=telegram_channels, factual=factual, remove_russian=remove_russian, fields=fields)
         
         #response_size = len(data)
         #logger(current_time=current_time, start_date=start_date, end_date=end_date, telegram_channels=telegram_channels, factual=factual, response_size=response_size)
 
-        if pagination:
-            # Apply pagination if the pagination flag is True
-            paginator = CustomPagination()
-            paginated_data = paginator.paginate_queryset(data, request)
-            return paginator.get_paginated_response(paginated_data)
-        else:
-            # Return the entire data if pagination is False
-            return Response(data, status=status.HTTP_200_OK)
+        # Return the entire data if pagination is False
+        return Response(data, status=status.HTTP_200_OK)
 
 class SearchDataView(APIView):
     """
@@ -1,62 +1,74 @@
 import os
-import json
-import pandas as pd
 from tqdm import tqdm
-from Utils import load_config, get_local_database_path, read_txt_as_list_of_strings, add_key_to_json
+from typing import Union
+from Utils import load_config
+from WorkingStore import WorkingStore
 from Inference.Inference import Inference
 
 
 class DataAnnotator(Inference):
-    def __init__(self) -> None:
+    def __init__(self, store: Union[WorkingStore, None] = None) -> None:
         super().__init__()
+        self.store = WorkingStore.most_recent() if store is None else store
         self.load_data()
         self.config = load_config()
+        self.checkpoint_size = self.config["ledger"]["checkpoint_size"]
 
     def load_data(self):
         def replace_short_text(text):
-            if text is not None and len(text.split()) < 7:
+            if not isinstance(text, str) or len(text.split()) < 7: # Missing text is NaN from pandas 3 on.
                 return None
             return text
-        dct_list = list()
-        for path in read_txt_as_list_of_strings(os.path.join(get_local_database_path(), "result_path_list.txt")):
-            with open(path, "r") as f:
-                dct_list.append(json.load(f))
-        df = pd.DataFrame(dct_list)
-        if len(df) == 0:
+        df = self.store.load_posts(columns=["_id", "text"]) if len(self.store) > 0 else None
+        if df is None or len(df) == 0:
             raise ValueError("Download/Annotation/Upload process is aborted because there are no Telegram posts without annotation - System is up to date.")
         df["temp_id"] = df.index
         df["text"] = df["text"].apply(lambda x: replace_short_text(x))
         self.empty_data = df[df["text"].isna()].copy(deep=True).reset_index(drop=True)
         self.data = df[df["text"].notna()].copy(deep=True).reset_index(drop=True)
         
-    def add_tag_to_json(self, task:str):
-        for idx, row in self.data.iterrows():
-            file_path = row["path"]
-            new_key = self.config["key_titles"][task]
-            new_value = row[task]
-            add_key_to_json(file_path=file_path, new_key=new_key, new_value=new_value)
-        for idx, row in self.empty_data.iterrows():
-            file_path = row["path"]
-            new_key = self.config["key_titles"][task]
-            new_value = None
-            add_key_to_json(file_path=file_path, new_key=new_key, new_value=new_value)
+    def iter_pending(self, task:str):
+        """
+        Yields the posts a task is not done for yet in checkpoints of at most `checkpoint_size` posts.
+        """
+        pending = set(self.store.ledger.pending(stage=task, post_ids=self.data["_id"]))
+        data = self.data[self.data["_id"].isin(pending)]
+        for start in range(0, len(data), self.checkpoint_size):
+            yield data.iloc[start:start + self.checkpoint_size]
+        
+    def add_tag_to_store(self, task:str, checkpoint, outputs:list):
+        key = self.config["key_titles"][task]
+        values = self.store.table.column(key).to_pylist() if key in self.store.table.column_names else [None] * len(self.store)
+        for temp_id, value in zip(checkpoint["temp_id"], outputs):
+            values[temp_id] = value
+        self.store.add_column(key=key, values=values)
+        self.store.ledger.mark(stage=task, post_ids=checkpoint["_id"])
             
-    def add_embedding_to_json(self, task:str, outputs:list):
-        for idx, row in self.data.iterrows():
-            file_path = row["path"]
-            new_key = task
-            new_value = outputs[idx]
-            add_key_to_json(file_path=file_path, new_key=new_key, new_value=new_value) 
-        for idx, row in self.empty_data.iterrows():
-            file_path = row["path"]
-            new_key = task
-            new_value = None
-            add_key_to_json(file_path=file_path, new_key=new_key, new_value=new_value) 
+    def add_embedding_to_store(self, task:str, checkpoint, outputs:list):
+        self.store.save_embeddings(task=task, embeddings=outputs, rows=checkpoint["temp_id"].to_list())
+        self.store.ledger.mark(stage=task, post_ids=checkpoint["_id"])
         
+    def run_task(self, local: bool, task:str, add_to_store):
+        """
+        Runs a task on the pending posts with one loaded model and saves every checkpoint as soon as it is done.
+        """
+        checkpoints = list(self.iter_pending(task=task))
+        if not checkpoints:
+            return
+        with self.keep_loaded(local=local, task=task):
+            for checkpoint in checkpoints:
+                outputs = self.inference(local=local, task=task, inputs=checkpoint["text"].to_list())
+                add_to_store(task=task, checkpoint=checkpoint, outputs=outputs)
+
     def tag(self, local: bool, task:str):
-        outputs = self.inference(local=local, task=task, inputs=self.data["text"].to_list())
-        self.data[task] = outputs
-        self.add_tag_to_json(task=task)
+        """
+        Runs a classification task. The label column is added first, with None for posts without a label, so it
+        exists even if no post is pending (e.g. when all posts are too short).
+        """
+        key = self.config["key_titles"][task]
+        if key not in self.store.table.column_names:
+            self.store.add_column(key=key, values=[None] * len(self.store))
+        self.run_task(local=local, task=task, add_to_store=self.add_tag_to_store)
         
     def tag_all(self, local:bool):
         ml_tasks = ['topic-classification', #1496MiB VRAM for local application
@@ -70,14 +82,11 @@ class DataAnnotator(Inference):
             
     def embed(self, local:bool):
         progress_bar = tqdm(total=2, desc="ML Embedding", unit="step", leave=False)
-        task = "document-embedding"
-        outputs = self.inference(local=local, task=task, inputs=self.data["text"].to_list())
-        self.add_embedding_to_json(task=task, outputs=outputs)
-        progress_bar.update(1)
-        task = "query-embedding"
-        outputs = self.inference(local=local, task=task, inputs=self.data["text"].to_list())
-        self.add_embedding_to_json(task=task, outputs=outputs)
-        progress_bar.update(1)
+        for task in ["document-embedding", "query-embedding"]:
+            if not os.path.exists(self.store.embedding_path(task=task)):
+                self.store.save_embeddings(task=task, embeddings=[], rows=[])
+            self.run_task(local=local, task=task, add_to_store=self.add_embedding_to_store)
+            progress_bar.update(1)
     
     def annotate(self, local:bool):
         self.tag_all(local=local)
@@ -0,0 +1,56 @@
+import sys
+import argparse
+import subprocess
+from Utils import make_path
+
+MODULES = ["Driver", "MongoDownloader", "MongoUploader", "Annotator", "Inference.Inference"]
+HEAVY_MODULES = ["torch", "transformers", "sentence_transformers", "huggingface_hub", "usearch", "pandas"]
+
+
+def import_time(module: str) -> dict:
+    """
+    Imports a module in a fresh interpreter with `-X importtime` and parses the report.
+
+    Returns:
+    dict: The cumulative import time in seconds of every imported (top-level) package, and of the module itself as "total".
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, cwd=make_path(""))
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    times = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        times[name.split(".")[0]] = max(times.get(name.split(".")[0], 0), int(cumulative_us) / 1e6)
+        if name == module:
+            times["total"] = int(cumulative_us) / 1e6
+    return times
+
+
+def main(modules: list, repeat: int, top: int, max_seconds: float):
+    failed = False
+    for module in modules:
+        runs = [import_time(module=module) for _ in range(repeat)]
+        best = min(runs, key=lambda times: times["total"])
+        heavy = [name for name in HEAVY_MODULES if name in best]
+        packages = sorted(((seconds, name) for name, seconds in best.items() if name not in ("total", module.split(".")[0])), reverse=True)[:top]
+        print(f"{module}: {best['total']:.3f}s (best of {repeat})")
+        print("  " + ", ".join(f"{name} {seconds:.3f}s" for seconds, name in packages))
+        if heavy:
+            print(f"  heavy imports: {', '.join(heavy)}")
+        if best["total"] > max_seconds or heavy:
+            failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the ML_Interface modules and check that no heavy ML library is imported at startup.")
+    parser.add_argument('--modules', type=str, nargs='+', default=MODULES, help='The modules to import. Default is the entry points of the pipeline.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of fresh interpreters per module. Default is 5.')
+    parser.add_argument('--top', type=int, default=5, help='Number of slowest packages to show per module. Default is 5.')
+    parser.add_argument('--max_seconds', type=float, default=1.0, help='Import time above which the benchmark fails. Default is 1.0.')
+    args = parser.parse_args()
+    main(modules=args.modules, repeat=args.repeat, top=args.top, max_seconds=args.max_seconds)
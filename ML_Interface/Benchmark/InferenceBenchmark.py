@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from Benchmark.TextCleanerBenchmark import make_post
+from MongoDownloader import TextCleaner
+from Utils import make_path
+
+CLASSIFICATION_TASKS = {
+    "topic-classification": 8,
+    "narrative-classification": 12,
+    "factuality-classification": 2,
+    "polarization-classification": 2,
+    "sensationalism-classification": 2,
+}
+EMBEDDING_TASKS = ["document-embedding", "query-embedding"]
+SPECIAL_TOKENS = ["<s>", "<pad>", "</s>", "<unk>", "<mask>"] # Same ids as the XLM-R tokenizer.
+QUERY_PROMPT = "Instruct: Retrieve semantically similar text.\nQuery: "
+MAX_LENGTH = 512
+
+
+def make_posts(n: int, seed: int) -> list:
+    """
+    Generates cleaned synthetic Telegram posts and keeps those the annotator would send to the models (7 words or more).
+    """
+    rng = random.Random(seed)
+    cleaner = TextCleaner()
+    posts = list()
+    while len(posts) < n:
+        text = cleaner.clean(*make_post(rng))
+        if text is not None and len(text.split()) >= 7:
+            posts.append(text)
+    return posts
+
+
+def build_tokenizer(posts: list, folder: str, vocab_size: int):
+    """
+    Trains a small Unigram tokenizer on the posts and saves it with the special tokens and template of XLM-R.
+    """
+    from tokenizers import Tokenizer, models, trainers, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+    tokenizer = Tokenizer(models.Unigram())
+    tokenizer.pre_tokenizer = pre_tokenizers.Metaspace()
+    tokenizer.train_from_iterator(posts, trainer=trainers.UnigramTrainer(vocab_size=vocab_size, special_tokens=SPECIAL_TOKENS, unk_token="<unk>"))
+    tokenizer.post_processor = processors.TemplateProcessing(single="<s> $A </s>", pair="<s> $A </s> </s> $B </s>", special_tokens=[(token, tokenizer.token_to_id(token)) for token in ["<s>", "</s>"]])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>", unk_token="<unk>", pad_token="<pad>", mask_token="<mask>", cls_token="<s>", sep_token="</s>", model_max_length=MAX_LENGTH)
+    tokenizer.save_pretrained(folder)
+    return tokenizer
+
+
+def build_models(posts: list, folder: str, hidden_size: int, layers: int, vocab_size: int) -> dict:
+    """
+    Builds tiny randomly initialized models with the architectures of the real checkpoints: XLM-R sequence
+    classifiers for the classification tasks and an XLM-R sentence transformer with mean pooling (like e5) for the
+    embedding tasks.
+
+    Returns:
+    dict: The folder of the model of each task.
+    """
+    import torch
+    from transformers import XLMRobertaConfig, XLMRobertaForSequenceClassification, XLMRobertaModel
+    from sentence_transformers import SentenceTransformer, models
+    torch.manual_seed(0)
+    tokenizer_folder = os.path.join(folder, "tokenizer")
+    tokenizer = build_tokenizer(posts=posts, folder=tokenizer_folder, vocab_size=vocab_size)
+    config = dict(
+        vocab_size=len(tokenizer), hidden_size=hidden_size, num_hidden_layers=layers, num_attention_heads=max(1, hidden_size // 32),
+        intermediate_size=4 * hidden_size, max_position_embeddings=MAX_LENGTH + 2, pad_token_id=tokenizer.pad_token_id,
+        bos_token_id=tokenizer.bos_token_id, eos_token_id=tokenizer.eos_token_id,
+    )
+    checkpoints = dict()
+    for task, num_labels in CLASSIFICATION_TASKS.items():
+        checkpoints[task] = os.path.join(folder, task)
+        labels = {idx: f"{task.split('-')[0]}-{idx}" for idx in range(num_labels)}
+        model = XLMRobertaForSequenceClassification(XLMRobertaConfig(num_labels=num_labels, id2label=labels, label2id={v: k for k, v in labels.items()}, **config))
+        model.save_pretrained(checkpoints[task])
+        tokenizer.save_pretrained(checkpoints[task])
+    encoder_folder = os.path.join(folder, "encoder")
+    XLMRobertaModel(XLMRobertaConfig(**config), add_pooling_layer=False).save_pretrained(encoder_folder)
+    tokenizer.save_pretrained(encoder_folder)
+    transformer = models.Transformer(encoder_folder, max_seq_length=MAX_LENGTH)
+    sentence_transformer = SentenceTransformer(modules=[transformer, models.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean")])
+    for task in EMBEDDING_TASKS:
+        checkpoints[task] = os.path.join(folder, task)
+        sentence_transformer.save(checkpoints[task])
+    return checkpoints
+
+
+def padding_ratio(lengths: list, batch_size: int, sort: bool) -> float:
+    """
+    Returns the share of padding tokens when the inputs are padded to the longest input of each batch.
+    SentenceTransformer sorts the inputs by length before batching, the classification pipeline does not.
+    """
+    if sort:
+        lengths = sorted(lengths, reverse=True)
+    padded = sum(max(lengths[start:start + batch_size]) * len(lengths[start:start + batch_size]) for start in range(0, len(lengths), batch_size))
+    return 1 - sum(lengths) / padded if padded > 0 else 0.0
+
+
+def run_task(task: str, checkpoint: str, posts: list) -> dict:
+    """
+    Runs the local inference path of a task on the posts against a tiny model, which is loaded once. The load and
+    the inference are timed separately. Runs in its own process, so the peak RSS belongs to the task alone.
+    """
+    from transformers import AutoTokenizer
+    import Inference.Classification as classification
+    import Inference.Embedding as embedding
+    from Inference.Inference import Inference
+    classification.get_model_path = embedding.get_model_path = lambda task: checkpoint # Points the inference path to the tiny model.
+    inference = Inference()
+    inference.server_url = None # Benchmarks the local models, not a running inference server.
+
+    start = time.perf_counter()
+    with inference.keep_loaded(local=True, task=task): # The only load of the model, reused by the inference call.
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        outputs = inference.inference(local=True, task=task, inputs=posts)
+        seconds = time.perf_counter() - start
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    inputs = [QUERY_PROMPT + post for post in posts] if task == "query-embedding" else posts
+    lengths = [len(ids) for ids in AutoTokenizer.from_pretrained(checkpoint)(inputs, truncation=True, max_length=MAX_LENGTH)["input_ids"]]
+    batch_size = embedding.BATCH_SIZE if "embedding" in task else 1 # The classification pipeline runs one input at a time by default.
+    return {
+        "posts": len(posts),
+        "outputs": len(outputs),
+        "tokens": sum(lengths),
+        "load_seconds": load_seconds,
+        "seconds": seconds,
+        "posts_per_second": len(posts) / seconds,
+        "tokens_per_second": sum(lengths) / seconds,
+        "padding_ratio": padding_ratio(lengths=lengths, batch_size=batch_size, sort="embedding" in task),
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=make_path("")).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    """
+    Prints the change of posts/sec and peak RSS per task relative to an earlier results file.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Compared to {baseline.get('commit')} ({baseline_path}):")
+    for task, metrics in results["tasks"].items():
+        if task not in baseline["tasks"]:
+            continue
+        old = baseline["tasks"][task]
+        print(f"  {task}: posts/s x{metrics['posts_per_second'] / old['posts_per_second']:.2f}, peak RSS x{metrics['peak_rss_mb'] / old['peak_rss_mb']:.2f}")
+
+
+def main(n: int, seed: int, tasks: list, hidden_size: int, layers: int, vocab_size: int, output: str, baseline: str = None):
+    posts = make_posts(n=n, seed=seed)
+    results = {
+        "commit": get_commit(),
+        "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "parameters": {"n": n, "seed": seed, "hidden_size": hidden_size, "layers": layers, "vocab_size": vocab_size},
+        "tasks": dict(),
+    }
+    with tempfile.TemporaryDirectory() as folder:
+        checkpoints = build_models(posts=posts, folder=folder, hidden_size=hidden_size, layers=layers, vocab_size=vocab_size)
+        for task in tasks:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                metrics = executor.submit(run_task, task, checkpoints[task], posts).result()
+            results["tasks"][task] = metrics
+            print(f"{task}: {metrics['posts_per_second']:.1f} posts/s, {metrics['tokens_per_second']:.0f} tokens/s, padding {100 * metrics['padding_ratio']:.1f}%, "
+                  f"peak RSS {metrics['peak_rss_mb']:.0f} MB, load {metrics['load_seconds']:.2f}s")
+    os.makedirs(output, exist_ok=True)
+    path = os.path.join(output, f"inference_{results['commit'] or 'unknown'}_{int(time.time())}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"Saved results to {path}")
+    if baseline:
+        compare(results=results, baseline_path=baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the local inference paths against tiny randomly initialized models, without network access.")
+    parser.add_argument('--n', type=int, default=2000, help='Number of synthetic posts. Default is 2000.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed. Default is 0.')
+    parser.add_argument('--tasks', type=str, nargs='+', default=list(CLASSIFICATION_TASKS) + EMBEDDING_TASKS, help='The tasks to benchmark. Default is all tasks.')
+    parser.add_argument('--hidden_size', type=int, default=64, help='Hidden size of the tiny models. Default is 64.')
+    parser.add_argument('--layers', type=int, default=2, help='Number of layers of the tiny models. Default is 2.')
+    parser.add_argument('--vocab_size', type=int, default=2000, help='Vocabulary size of the tiny tokenizer. Default is 2000.')
+    parser.add_argument('--output', type=str, default=make_path("Benchmark/results"), help='Folder for the JSON results. Default is Benchmark/results.')
+    parser.add_argument('--baseline', type=str, default=None, help='A JSON results file of an earlier commit to compare with.')
+    args = parser.parse_args()
+    main(n=args.n, seed=args.seed, tasks=args.tasks, hidden_size=args.hidden_size, layers=args.layers, vocab_size=args.vocab_size, output=args.output, baseline=args.baseline)
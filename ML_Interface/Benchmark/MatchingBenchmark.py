@@ -0,0 +1,165 @@
+import time
+import argparse
+import numpy as np
+from tqdm import tqdm
+from pymongo import MongoClient
+from pymongo.server_api import ServerApi
+from ClaimMatcher import ClaimMatcher
+from WindowMatcher import WindowMatcher
+from LocalVectorIndex import LocalVectorIndex
+from WorkingStore import WorkingStore
+from Utils import load_config, decode_vector
+
+BLOCK_SIZE = 10000 # Documents per block of the brute-force scan.
+
+
+def normalize(embeddings: np.ndarray) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return embeddings / norms
+
+
+def get_collection(config: dict):
+    client = MongoClient(config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
+    return client[config["mongo_db"]["mongo_vector_db_name"]][config["mongo_db"]["mongo_vector_db_name"]]
+
+
+def sample_queries(collection, n: int, seed: int, store: str) -> tuple:
+    """
+    Returns the post_ids and embeddings of the queries: the query embeddings of a working store, or a random sample of
+    the stored document embeddings of the vector collection.
+    """
+    if store:
+        store = WorkingStore(store)
+        embeddings = store.load_embeddings(task="query-embedding")
+        rows = [idx for idx in range(len(store)) if store.get_embedding(embeddings=embeddings, idx=idx) is not None]
+        rows = sorted(np.random.default_rng(seed).choice(rows, size=min(n, len(rows)), replace=False).tolist())
+        post_ids = store.post_ids
+        return [post_ids[idx] for idx in rows], np.asarray(embeddings[rows], dtype=np.float32)
+    docs = list(collection.aggregate([{"$match": {"text_embedding": {"$ne": None}}}, {"$sample": {"size": n}}, {"$project": {"post_id": 1, "text_embedding": 1}}]))
+    return [doc["post_id"] for doc in docs], np.stack([decode_vector(doc["text_embedding"]) for doc in docs])
+
+
+def iter_collection(collection):
+    """
+    Yields the post_ids and embeddings of all documents of the vector collection in blocks of BLOCK_SIZE.
+    """
+    post_ids, embeddings = list(), list()
+    for doc in tqdm(collection.find({"text_embedding": {"$ne": None}}, {"post_id": 1, "text_embedding": 1}), total=collection.estimated_document_count(), desc="Brute force", leave=False):
+        post_ids.append(doc["post_id"])
+        embeddings.append(decode_vector(doc["text_embedding"]))
+        if len(post_ids) == BLOCK_SIZE:
+            yield post_ids, np.stack(embeddings)
+            post_ids, embeddings = list(), list()
+    if post_ids:
+        yield post_ids, np.stack(embeddings)
+
+
+def iter_window(matcher: WindowMatcher):
+    """
+    Yields the post_ids and embeddings of the window of the memory backend in blocks of BLOCK_SIZE.
+    """
+    for start in range(0, matcher.size, BLOCK_SIZE):
+        end = min(start + BLOCK_SIZE, matcher.size)
+        yield list(matcher.metadata["post_id"][start:end]), matcher.matrix[start:end]
+
+
+def ground_truth(blocks, post_ids: list, queries: np.ndarray, cosine_cutoff: float) -> list:
+    """
+    Returns the exact siblings of every query by brute force: the post_ids of all documents with a cosine similarity
+    of at least `cosine_cutoff`, except the query's own post.
+    """
+    queries = normalize(queries)
+    truth = [set() for _ in post_ids]
+    for block_ids, embeddings in blocks:
+        scores = queries @ normalize(embeddings).T
+        for row, col in zip(*np.nonzero(scores >= cosine_cutoff)):
+            truth[row].add(block_ids[col])
+    for siblings, post_id in zip(truth, post_ids):
+        siblings.discard(post_id)
+    return truth
+
+
+def make_search(backend: str, matcher, numCandidates: int, limit: int):
+    """
+    Returns a function that searches the siblings of one query with the configured backend and given parameters,
+    and returns the found post_ids and whether the results were cut off by `limit`.
+    """
+    if backend == "memory":
+        matcher.limit = limit
+        matcher.rerank_candidates = numCandidates
+        def search(post_id, query):
+            siblings = matcher.match_block(queries=matcher.normalize(query[None, :]), post_ids=[post_id])[0]
+            return {sibling["post_id"] for sibling in siblings}, len(siblings) == limit
+        return search
+    matcher.numCandidates = numCandidates
+    matcher.limit = limit
+    def search(post_id, query):
+        results = matcher.vector_search(query_embedding=query)
+        truncated = len(results) == limit and results[-1]["score"] >= matcher.cosine_cutoff
+        return {r["post_id"] for r in matcher.remove_by_cos(query_results=results) if r["post_id"] != post_id}, truncated
+    return search
+
+
+def evaluate(search, post_ids: list, queries: np.ndarray, truth: list) -> dict:
+    latencies, found, truncated = list(), list(), 0
+    for post_id, query in zip(post_ids, queries):
+        start = time.perf_counter()
+        siblings, cut = search(post_id, query)
+        latencies.append(time.perf_counter() - start)
+        found.append(siblings)
+        truncated += cut
+    relevant = sum(len(t) for t in truth)
+    return {
+        "recall": sum(len(f & t) for f, t in zip(found, truth)) / relevant if relevant > 0 else 1.0,
+        "truncation_rate": truncated / len(post_ids),
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p99_ms": 1000 * float(np.percentile(latencies, 99)),
+    }
+
+
+def main(backend: str, n: int, seed: int, store: str, candidates: list, limits: list):
+    config = load_config()
+    cosine_cutoff = config["claim_matching_paramters"]["cosine_cutoff"]
+    collection = get_collection(config=config)
+    if backend == "memory":
+        matcher = WindowMatcher()
+        matcher.sort_by_date = False
+        if store:
+            post_ids, queries = sample_queries(collection=collection, n=n, seed=seed, store=store)
+        else:
+            rows = np.sort(np.random.default_rng(seed).choice(matcher.size, size=min(n, matcher.size), replace=False))
+            post_ids, queries = list(matcher.metadata["post_id"][rows]), np.asarray(matcher.matrix[rows], dtype=np.float32)
+        blocks = iter_window(matcher=matcher)
+    else:
+        matcher = ClaimMatcher(load_data=False)
+        if backend == "atlas":
+            matcher.local_index = None
+        elif matcher.local_index is None:
+            matcher.local_index = LocalVectorIndex(view=True)
+        post_ids, queries = sample_queries(collection=collection, n=n, seed=seed, store=store)
+        blocks = iter_collection(collection=collection)
+    truth = ground_truth(blocks=blocks, post_ids=post_ids, queries=queries, cosine_cutoff=cosine_cutoff)
+    counts = [len(t) for t in truth]
+    print(f"{backend}: {len(post_ids)} queries, siblings at cosine >= {cosine_cutoff}: mean {np.mean(counts):.1f}, p99 {np.percentile(counts, 99):.0f}, max {max(counts)}")
+    print(f"{'numCandidates':>13} {'limit':>6} {'recall':>7} {'truncated':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for numCandidates in candidates:
+        for limit in limits:
+            if limit > numCandidates and backend != "memory":
+                continue # $vectorSearch requires numCandidates >= limit.
+            metrics = evaluate(search=make_search(backend=backend, matcher=matcher, numCandidates=numCandidates, limit=limit), post_ids=post_ids, queries=queries, truth=truth)
+            print(f"{numCandidates:>13} {limit:>6} {metrics['recall']:>7.4f} {metrics['truncation_rate']:>9.3f} {metrics['p50_ms']:>8.2f} {metrics['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parameters = load_config()["claim_matching_paramters"]
+    parser = argparse.ArgumentParser(description="Sweep the claim matching parameters of a backend and measure recall at the cosine cutoff, truncation by the limit and latency against brute force.")
+    parser.add_argument('--backend', type=str, default=parameters.get("backend", "atlas"), choices=["atlas", "local", "memory"], help='The backend to benchmark. Default is the configured backend.')
+    parser.add_argument('--n', type=int, default=200, help='Number of sampled queries. Default is 200.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the sample. Default is 0.')
+    parser.add_argument('--store', type=str, default="", help='A working store folder whose query embeddings are used as queries instead of a sample of stored embeddings.')
+    parser.add_argument('--candidates', type=int, nargs='+', default=[100, parameters["numCandidates"], 500, 1000], help='numCandidates to sweep (rerank_candidates for a quantized memory backend).')
+    parser.add_argument('--limits', type=int, nargs='+', default=[parameters["limit"], 100, 500], help='Limits to sweep.')
+    args = parser.parse_args()
+    main(backend=args.backend, n=args.n, seed=args.seed, store=args.store, candidates=sorted(set(args.candidates)), limits=sorted(set(args.limits)))
@@ -0,0 +1,118 @@
+import time
+import argparse
+import numpy as np
+from Utils import load_config
+from VectorQuantizer import VectorQuantizer
+from WindowMatcher import WindowMatcher, QUERY_BLOCK_SIZE
+from WorkingStore import WorkingStore
+
+DATETIME = "2100-01-01 00:00:00" # Keeps every synthetic document inside the window.
+
+
+def make_embeddings(n: int, dimensions: int, claims: int, seed: int) -> np.ndarray:
+    """
+    Generates normalized synthetic document embeddings: half of the documents are near-duplicates spread around
+    `claims` viral claims with cosine similarities around the cutoff, the rest are unrelated. Claims share topics, so
+    documents of related claims are near misses just below the cutoff.
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((max(1, claims // 10), dimensions)).astype(np.float32) / np.sqrt(dimensions)
+    centers = topics[rng.integers(0, len(topics), claims)] + 0.6 * rng.standard_normal((claims, dimensions)).astype(np.float32) / np.sqrt(dimensions)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    related = n // 2
+    noise = rng.standard_normal((related, dimensions)).astype(np.float32) * rng.uniform(0.1, 0.3, (related, 1)).astype(np.float32) / np.sqrt(dimensions)
+    embeddings = np.concatenate([centers[rng.integers(0, claims, related)] + noise, rng.standard_normal((n - related, dimensions)).astype(np.float32)])
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings[rng.permutation(n)]
+
+
+def load_store_embeddings(folder: str) -> tuple:
+    """
+    Loads the document and query embeddings of the posts of a working store that have embeddings.
+    """
+    store = WorkingStore(folder)
+    documents, queries = store.load_embeddings(task="document-embedding"), store.load_embeddings(task="query-embedding")
+    rows = [idx for idx in range(len(store)) if store.get_embedding(embeddings=queries, idx=idx) is not None]
+    return np.asarray(documents[rows], dtype=np.float32), np.asarray(queries[rows], dtype=np.float32)
+
+
+def ground_truth(documents: np.ndarray, queries: np.ndarray, query_rows: np.ndarray, cosine_cutoff: float) -> list:
+    """
+    Returns the exact siblings (rows of the documents above the cutoff, except the query's own row) of every query
+    by brute force in float32.
+    """
+    documents = documents / np.linalg.norm(documents, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = list()
+    for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+        scores = queries[start:start + QUERY_BLOCK_SIZE] @ documents.T
+        for row, own in zip(scores, query_rows[start:start + QUERY_BLOCK_SIZE]):
+            truth.append(set(np.flatnonzero(row >= cosine_cutoff).tolist()) - {int(own)})
+    return truth
+
+
+def evaluate(documents: np.ndarray, queries: np.ndarray, query_rows: np.ndarray, truth: list, mode: str, dimensions: int, rerank_candidates: int) -> dict:
+    """
+    Matches the queries with the WindowMatcher of the memory backend in one setting and compares the siblings with
+    the ground truth. The limit is lifted, so only the search itself can lose siblings.
+    """
+    matcher = WindowMatcher(load_window=False)
+    matcher.limit = len(documents)
+    matcher.sort_by_date = False
+    matcher.quantizer = None if mode == "none" else VectorQuantizer(mode=mode, dimensions=dimensions)
+    matcher.rerank_candidates = rerank_candidates
+    matcher.add(embeddings=documents, metadata=[{"post_id": str(idx), "Publishing_datetime": DATETIME} for idx in range(len(documents))])
+    found = list()
+    start = time.perf_counter()
+    for block in range(0, len(queries), QUERY_BLOCK_SIZE):
+        queries_block = matcher.normalize(queries[block:block + QUERY_BLOCK_SIZE])
+        post_ids = [str(idx) for idx in query_rows[block:block + QUERY_BLOCK_SIZE]]
+        found.extend({int(sibling["post_id"]) for sibling in siblings} for siblings in matcher.match_block(queries=queries_block, post_ids=post_ids))
+    seconds = time.perf_counter() - start
+    relevant = sum(len(t) for t in truth)
+    retrieved = sum(len(f & t) for f, t in zip(found, truth))
+    bytes_per_vector = documents.shape[1] * matcher.dtype.itemsize if matcher.quantizer is None else matcher.quantizer.bytes_per_vector(documents.shape[1])
+    return {
+        "recall": retrieved / relevant if relevant > 0 else 1.0,
+        "complete_queries": np.mean([t <= f for f, t in zip(found, truth)]),
+        "bytes_per_vector": bytes_per_vector,
+        "memory_mb": bytes_per_vector * len(documents) / 2**20,
+        "ms_per_query": 1000 * seconds / len(queries),
+    }
+
+
+def main(store: str, n: int, n_queries: int, dimensions: int, claims: int, seed: int, modes: list, truncations: list, rerank_candidates: list, min_recall: float):
+    cosine_cutoff = load_config()["claim_matching_paramters"]["cosine_cutoff"]
+    if store:
+        documents, queries = load_store_embeddings(folder=store)
+    else:
+        documents = make_embeddings(n=n, dimensions=dimensions, claims=claims, seed=seed)
+        queries = documents
+    query_rows = np.random.default_rng(seed).choice(len(queries), size=min(n_queries, len(queries)), replace=False)
+    queries = queries[query_rows]
+    truth = ground_truth(documents=documents, queries=queries, query_rows=query_rows, cosine_cutoff=cosine_cutoff)
+    print(f"{len(documents)} documents, {len(queries)} queries, {sum(len(t) for t in truth)} siblings at cosine >= {cosine_cutoff}")
+    print(f"{'mode':>7} {'dims':>5} {'rerank':>6} {'recall':>7} {'complete':>8} {'bytes/vec':>9} {'MB':>8} {'ms/query':>8}")
+    settings = [("none", None, 0)] + [(mode, truncation, candidates) for mode in modes if mode != "none" for truncation in truncations for candidates in rerank_candidates]
+    for mode, truncation, candidates in settings:
+        metrics = evaluate(documents=documents, queries=queries, query_rows=query_rows, truth=truth, mode=mode, dimensions=truncation, rerank_candidates=candidates)
+        flag = "" if metrics["recall"] >= min_recall else "  < min recall"
+        print(f"{mode:>7} {truncation or documents.shape[1]:>5} {candidates or '-':>6} {metrics['recall']:>7.4f} {metrics['complete_queries']:>8.3f} "
+              f"{metrics['bytes_per_vector']:>9.0f} {metrics['memory_mb']:>8.1f} {metrics['ms_per_query']:>8.3f}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the recall at the cosine cutoff of quantized matching settings of the memory backend against brute force.")
+    parser.add_argument('--store', type=str, default="", help='A working store folder whose embeddings are used instead of synthetic embeddings.')
+    parser.add_argument('--n', type=int, default=20000, help='Number of synthetic documents. Default is 20000.')
+    parser.add_argument('--queries', type=int, default=500, help='Number of queries, sampled from the documents. Default is 500.')
+    parser.add_argument('--dimensions', type=int, default=load_config()["index"]["fields"][0]["numDimensions"], help='Dimensions of the synthetic embeddings. Default is numDimensions of the index.')
+    parser.add_argument('--claims', type=int, default=200, help='Number of synthetic viral claims. Default is 200.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed. Default is 0.')
+    parser.add_argument('--modes', type=str, nargs='+', default=["int8", "binary"], help='Quantization modes. Default is int8 and binary.')
+    parser.add_argument('--truncations', type=int, nargs='+', default=[None], help='Matryoshka truncations (leading dimensions kept). Default is no truncation.')
+    parser.add_argument('--rerank_candidates', type=int, nargs='+', default=[50, 200, 1000], help='Candidates reranked exactly per query. Default is 50, 200 and 1000.')
+    parser.add_argument('--min_recall', type=float, default=0.99, help='Settings below this recall are flagged. Default is 0.99.')
+    args = parser.parse_args()
+    main(store=args.store, n=args.n, n_queries=args.queries, dimensions=args.dimensions, claims=args.claims, seed=args.seed, modes=args.modes,
+         truncations=args.truncations, rerank_candidates=args.rerank_candidates, min_recall=args.min_recall)
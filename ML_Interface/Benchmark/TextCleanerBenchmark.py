@@ -0,0 +1,94 @@
+import re
+import time
+import random
+import argparse
+from typing import Union
+from MongoDownloader import TextCleaner
+
+WORDS = ["Regierung", "Impfung", "Ukraine", "Wahrheit", "Medien", "Krieg", "Energie", "die", "der", "und", "nicht",
+         "Россия", "война", "правда", "Öl", "Gas", "Straße", "NATO", "2024", "100%", "WHO", "Klima", "Bürger"]
+NOISE = ["😀", "🇩🇪", "🔥", "⚡", "✅", "❗", "👉", "™", "ⓜ", "\t", "\n", "  ", " ", "#", "@", "www.", "http://", "https://",
+         "#Wahrheit", "@channel", "https://t.me/channel/123", "www.example.org/a?b=c#d", "#foowww.x", "#http://x.y", "@https://z"]
+
+
+def reference_clean(text: Union[str, None], caption: Union[str, None]):
+    """
+    The text cleaning as it was implemented before the single-pass cleaner: seven separate passes with a
+    strip after each of them. Used as ground truth for the equivalence check.
+    """
+    text = ' '.join(filter(None, [text, caption]))
+    if text == '':
+        return None
+    emoji_pattern = re.compile(
+        "["
+        "\U0001F600-\U0001F64F"
+        "\U0001F300-\U0001F5FF"
+        "\U0001F680-\U0001F6FF"
+        "\U0001F1E0-\U0001F1FF"
+        "\U00002702-\U000027B0"
+        "\U000024C2-\U0001F251"
+        "\U0001F900-\U0001F9FF"
+        "\U0001F018-\U0001F270"
+        "\U0001F780-\U0001F7F0"
+        "\U0001F000-\U0001F02F"
+        "]+", flags=re.UNICODE
+    )
+    text = emoji_pattern.sub(r'', text).strip()
+    text = re.compile(r'http[s]?://\S+|www\.\S+').sub("<URL>", text).strip()
+    text = re.compile(r'#\w+').sub('', text).strip()
+    text = re.compile(r'@\w+').sub('', text).strip()
+    text = re.sub(r'\s+', ' ', text).strip()
+    text = re.sub(r'\t+', ' ', text).strip()
+    return text.replace("\n", " ")
+
+
+def make_post(rng: random.Random):
+    """
+    Generates a synthetic Telegram post as (text, caption) with a long-tailed length distribution and noise tokens
+    (emojis, URLs, hashtags, mentions, odd whitespace) glued to words or standing alone.
+    """
+    def make_text():
+        length = int(rng.lognormvariate(3.5, 1.0))
+        tokens = list()
+        for _ in range(length):
+            token = rng.choice(WORDS) if rng.random() < 0.8 else rng.choice(NOISE)
+            if rng.random() < 0.15:
+                token += rng.choice(NOISE)
+            tokens.append(token)
+        separator = rng.choice([" ", " ", " ", "", "\n", "\t"])
+        return separator.join(tokens)
+    text = make_text() if rng.random() < 0.9 else None
+    caption = make_text() if rng.random() < 0.3 else None
+    return text, caption
+
+
+def main(n: int, seed: int):
+    rng = random.Random(seed)
+    pairs = [make_post(rng) for _ in range(n)]
+    cleaner = TextCleaner()
+
+    start = time.perf_counter()
+    expected = [reference_clean(text, caption) for text, caption in pairs]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [cleaner.clean(text=text, caption=caption) for text, caption in pairs]
+    single_pass_time = time.perf_counter() - start
+
+    mismatches = [(pair, e, a) for pair, e, a in zip(pairs, expected, actual) if e != a]
+    print(f"Posts: {n}")
+    print(f"Reference cleaner:   {reference_time:.3f}s ({n / reference_time:.0f} posts/s)")
+    print(f"Single-pass cleaner: {single_pass_time:.3f}s ({n / single_pass_time:.0f} posts/s)")
+    print(f"Mismatches: {len(mismatches)}")
+    for pair, e, a in mismatches[:5]:
+        print(repr(pair), repr(e), repr(a), sep="\n  ")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the TextCleaner and check that it matches the reference implementation.")
+    parser.add_argument('--n', type=int, default=100000, help='Number of synthetic posts. Default is 100000.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed. Default is 0.')
+    args = parser.parse_args()
+    main(n=args.n, seed=args.seed)
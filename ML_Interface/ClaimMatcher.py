@@ -1,11 +1,15 @@
-import os
-import json
+import numpy as np
+from time import sleep
 from tqdm import tqdm
-from typing import List, Union
+from typing import Union
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
-from Utils import load_config, get_local_database_path, read_txt_as_list_of_strings
+from pymongo.errors import AutoReconnect, NetworkTimeout, ExecutionTimeout
+from Utils import load_config, encode_vector
+from WorkingStore import WorkingStore
+from LocalVectorIndex import LocalVectorIndex
 
 
 class ClaimMatcher():
@@ -32,37 +36,57 @@ class ClaimMatcher():
         The specific database within MongoDB to perform vector search.
     collection : pymongo.collection.Collection
         The collection within the MongoDB database where vector data is stored.
-    dct_list : list
-        A list of dictionaries loaded from JSON files containing claim data.
+    vector_dtype : str
+        The encoding of query vectors, matching the encoding of the stored embeddings.
+    store : WorkingStore
+        The working store holding the claim data of the current run.
+    max_workers : int
+        Maximum number of vector searches in flight at the same time.
+    max_retries : int
+        Number of retries of a vector search after a transient error.
+    local_index : LocalVectorIndex or None
+        The local vector index, if it is the configured backend instead of Atlas.
     """
     
-    def __init__(self) -> None:
+    def __init__(self, store: Union[WorkingStore, None] = None, load_data: bool = True) -> None:
         """
         Initializes the ClaimMatcher with configuration data, loads the claim data, 
         and connects to MongoDB.
-        """
-        self.load_data()
+
+        Parameters:
+        ----------
+        store : WorkingStore, optional
+            The working store of the current run (default is the most recent store).
+        load_data : bool, optional
+            Whether to open the query embeddings of the store (default is True). Without data, only `query`
+            and `vector_search` can be used, e.g. for benchmarks.
+        """
+        self.store = store
+        if load_data:
+            self.store = WorkingStore.most_recent() if store is None else store
+            self.load_data()
         self.config = load_config()
         self.numCandidates = self.config["claim_matching_paramters"]["numCandidates"]
         self.limit = self.config["claim_matching_paramters"]["limit"]
         self.cosine_cutoff = self.project_cos_to_mongo(self.config["claim_matching_paramters"]["cosine_cutoff"])
         self.index = self.config["claim_matching_paramters"]["atlas_index_name"]
         self.sort_by_date = self.config["claim_matching_paramters"]["sort_by_date"]
-        self.client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
+        self.max_workers = self.config["claim_matching_paramters"].get("max_workers", 16)
+        self.max_retries = self.config["claim_matching_paramters"].get("max_retries", 3)
+        self.client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'), maxPoolSize=max(100, self.max_workers))
         self.db = self.client[self.config["mongo_db"]["mongo_vector_db_name"]]
         self.collection = self.db[self.config["mongo_db"]["mongo_vector_db_name"]]
+        self.vector_dtype = self.config["mongo_db"].get("vector_dtype", "float32")
+        self.local_index = LocalVectorIndex(view=True) if self.config["claim_matching_paramters"].get("backend") == "local" else None
 
     def load_data(self) -> None:
         """
-        Loads claim data from JSON files specified in a text file and stores them in a list.
-        Raises a ValueError if no data is loaded.
+        Opens the query embeddings of the working store as a memory-mapped matrix.
+        Raises a ValueError if the store is empty.
         """
-        self.dct_list = list()
-        for path in read_txt_as_list_of_strings(os.path.join(get_local_database_path(), "result_path_list.txt")):
-            with open(path, "r") as f:
-                self.dct_list.append(json.load(f))
-        if len(self.dct_list) == 0:
+        if len(self.store) == 0:
             raise ValueError("Download/Annotation/Upload process is aborted because there are no Telegram posts without annotation - System is up to date.")
+        self.query_embeddings = self.store.load_embeddings(task="query-embedding")
         
     def project_cos_to_mongo(self, cosine_cutoff: float = 0.91) -> float:
         """
@@ -114,13 +138,13 @@ class ClaimMatcher():
         query_results = sorted(query_results, key=lambda x: datetime.strptime(x['Publishing_datetime'], "%Y-%m-%d %H:%M:%S"), reverse=True)
         return query_results
     
-    def vector_search(self, query_embedding: List[float]) -> list:
+    def vector_search(self, query_embedding: np.ndarray) -> list:
         """
         Performs a vector search in the MongoDB collection using the provided query embedding.
         
         Parameters:
         ----------
-        query_embedding : List[float]
+        query_embedding : np.ndarray
             The embedding vector used for the search query.
         
         Returns:
@@ -128,9 +152,11 @@ class ClaimMatcher():
         list
             A list of query results containing matches for the provided embedding.
         """
+        if self.local_index is not None:
+            return self.local_index.search(query_embedding=query_embedding, limit=self.limit, numCandidates=self.numCandidates)
         query_results = self.collection.aggregate([
         {"$vectorSearch": {
-            "queryVector": query_embedding,
+            "queryVector": encode_vector(embedding=query_embedding, dtype=self.vector_dtype),
             "path": "text_embedding",
             "numCandidates": self.numCandidates,
             "limit": self.limit,
@@ -147,10 +173,10 @@ class ClaimMatcher():
             }
         }
         ])
-        return query_results
+        return list(query_results)
     
     def query(self, 
-              query_embedding: List[float], 
+              query_embedding: np.ndarray, 
               _id: Union[str, None] = None
               ) -> list:
         """
@@ -159,7 +185,7 @@ class ClaimMatcher():
         
         Parameters:
         ----------
-        query_embedding : List[float]
+        query_embedding : np.ndarray
             The embedding vector used for the search query.
         _id : Union[str, None], optional
             The ID to exclude from the query results (default is None).
@@ -176,24 +202,53 @@ class ClaimMatcher():
         for r in query_results:
             r["_id"] = str(r["_id"])
         if _id is not None:
-            query_results = [r for r in query_results if not r["_id"] == _id]
+            query_results = [r for r in query_results if not r.get("post_id", r["_id"]) == _id]
         if self.sort_by_date:
             query_results = self.sort_results_by_date(query_results=query_results)
         return query_results
     
+    def query_with_retry(self, 
+                         query_embedding: np.ndarray, 
+                         _id: Union[str, None] = None
+                         ) -> list:
+        """
+        Runs `query` and retries it with exponential backoff after transient network errors.
+        
+        Parameters:
+        ----------
+        query_embedding : np.ndarray
+            The embedding vector used for the search query.
+        _id : Union[str, None], optional
+            The ID to exclude from the query results (default is None).
+        
+        Returns:
+        -------
+        list
+            A list of query results after filtering and sorting.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.query(query_embedding=query_embedding, _id=_id)
+            except (AutoReconnect, NetworkTimeout, ExecutionTimeout):
+                if attempt == self.max_retries:
+                    raise
+                sleep(2 ** attempt)
+    
     def match_claims(self) -> None:
         """
-        Matches claims based on their embeddings and updates the corresponding JSON files with the results.
-        """
-        for dct in tqdm(self.dct_list, total=len(self.dct_list), desc="Claim matching", leave=False):
-            query_embedding = dct["query-embedding"]
-            _id = dct["_id"]
-            if query_embedding is None:
-                dct["Siblings"] = []
-            else:
-                dct["Siblings"] = self.query(query_embedding=query_embedding, _id=_id)
-            with open(dct["path"], 'w') as json_file:
-                json.dump(dct, json_file, indent=4)
+        Matches claims based on their embeddings and adds the results as the "Siblings" column of the working store.
+        Up to `max_workers` vector searches run concurrently; the results are collected and written in one batch.
+        """
+        siblings = [[] for _ in range(len(self.store))]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = dict()
+            for idx, row in self.store.iter_posts(columns=["_id"]):
+                query_embedding = self.store.get_embedding(embeddings=self.query_embeddings, idx=idx)
+                if query_embedding is not None:
+                    futures[executor.submit(self.query_with_retry, query_embedding=query_embedding, _id=row["_id"])] = idx
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Claim matching", leave=False):
+                siblings[futures[future]] = future.result()
+        self.store.add_column(key="Siblings", values=siblings)
                 
 if __name__ == "__main__":
     ClaimMatcher().match_claims()
@@ -0,0 +1,225 @@
+from tqdm import tqdm
+from typing import Union
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from pymongo.server_api import ServerApi
+from pymongo.write_concern import WriteConcern
+from bson.objectid import ObjectId
+from Utils import load_config, write_in_batches
+from WorkingStore import WorkingStore
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class UnionFind():
+    """
+    A disjoint-set forest with path compression and union by size.
+    """
+
+    def __init__(self) -> None:
+        self.parent = dict()
+        self.size = dict()
+
+    def find(self, node: str) -> str:
+        if node not in self.parent:
+            self.parent[node] = node
+            self.size[node] = 1
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, node_a: str, node_b: str) -> None:
+        root_a, root_b = self.find(node_a), self.find(node_b)
+        if root_a == root_b:
+            return
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+
+    def groups(self) -> dict:
+        groups = dict()
+        for node in self.parent:
+            groups.setdefault(self.find(node), list()).append(node)
+        return groups
+
+
+class ClusterMaintainer():
+    """
+    A class to maintain claim clusters incrementally: posts connected by sibling matches above the cosine cutoff
+    form one cluster (union-find over the matches).
+
+    The membership of every post that belongs to a cluster with at least two posts is kept in a cluster collection
+    next to the vector collection. Every member post gets "Cluster_ID", "Cluster_Size", "Cluster_First_Seen" and
+    "Many_Siblings" written to its channel collection, so older posts learn about newer siblings.
+
+    Attributes:
+    ----------
+    config : dict
+        Configuration data loaded from an external source.
+    store : WorkingStore
+        The working store holding the matched posts of the current run.
+    many_siblings_cutoff : int
+        The number of siblings from which a post has "Many_Siblings".
+    batch_size : int
+        The maximum number of operations per bulk write.
+    client : pymongo.MongoClient
+        MongoDB client for interacting with the database.
+    db : pymongo.database.Database
+        The database with one collection per channel.
+    cluster_collection : pymongo.collection.Collection
+        The collection holding the cluster membership of each post.
+    """
+
+    def __init__(self, store: Union[WorkingStore, None] = None) -> None:
+        """
+        Initializes the ClusterMaintainer with configuration data and connects to MongoDB.
+
+        Parameters:
+        ----------
+        store : WorkingStore, optional
+            The working store of the current run (default is the most recent store).
+        """
+        self.config = load_config()
+        self.store = WorkingStore.most_recent() if store is None else store
+        self.many_siblings_cutoff = self.config["clustering"]["many_siblings_cutoff"]
+        self.batch_size = self.config["upload"]["batch_size"]
+        write_concern = WriteConcern(**self.config["upload"]["write_concern"])
+        self.client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
+        self.db = self.client.get_database(self.config["mongo_db"]["mongo_db_name"], write_concern=write_concern)
+        self.cluster_collection = self.client.get_database(self.config["mongo_db"]["mongo_vector_db_name"], write_concern=write_concern)[self.config["mongo_db"]["mongo_cluster_collection_name"]]
+
+    def to_datetime(self, value: Union[str, datetime]) -> datetime:
+        if isinstance(value, str):
+            return datetime.strptime(value, DATETIME_FORMAT)
+        return value
+
+    def collect_matches(self, members: dict, union_find: UnionFind) -> None:
+        """
+        Adds the posts of the working store and their siblings to the union-find structure.
+
+        Parameters:
+        ----------
+        members : dict
+            Filled with the collection and publishing datetime of every post, keyed by post_id.
+        union_find : UnionFind
+            The union-find structure.
+        """
+        for idx, row in self.store.iter_posts(columns=["_id", "collection", "datetime", "Siblings"]):
+            members[row["_id"]] = {"collection": row["collection"], "datetime": self.to_datetime(row["datetime"])}
+            union_find.find(row["_id"])
+            for sibling in row["Siblings"] or []:
+                post_id = sibling.get("post_id")
+                if post_id is None:
+                    continue
+                members.setdefault(post_id, {"collection": sibling.get("Channel_Name"), "datetime": self.to_datetime(sibling.get("Publishing_datetime"))})
+                union_find.union(row["_id"], post_id)
+
+    def collect_existing_clusters(self, members: dict, union_find: UnionFind) -> dict:
+        """
+        Loads the existing clusters of all involved posts, adds their members and unites them.
+
+        Parameters:
+        ----------
+        members : dict
+            The collection and publishing datetime of every post, keyed by post_id. Existing members are added.
+        union_find : UnionFind
+            The union-find structure.
+
+        Returns:
+        -------
+        dict
+            A mapping from post_id to the existing cluster_id of the post.
+        """
+        existing = {doc["_id"]: doc["cluster_id"] for doc in self.cluster_collection.find({"_id": {"$in": list(members)}}, {"cluster_id": 1})}
+        cluster_ids = list(set(existing.values()))
+        first_members = dict()
+        for doc in self.cluster_collection.find({"cluster_id": {"$in": cluster_ids}}):
+            existing[doc["_id"]] = doc["cluster_id"]
+            members.setdefault(doc["_id"], {"collection": doc["collection"], "datetime": doc["datetime"]})
+            first_member = first_members.setdefault(doc["cluster_id"], doc["_id"])
+            union_find.union(first_member, doc["_id"])
+        return existing
+
+    def choose_cluster_id(self, group: list, members: dict, existing: dict) -> str:
+        """
+        Chooses the id of a cluster: the id of the largest existing cluster among its members (so the fewest posts
+        change their id), or the post_id of the earliest member for a new cluster.
+        """
+        counts = dict()
+        for post_id in group:
+            if post_id in existing:
+                counts[existing[post_id]] = counts.get(existing[post_id], 0) + 1
+        if counts:
+            return sorted(counts.items(), key=lambda x: (-x[1], x[0]))[0][0]
+        return min(group, key=lambda post_id: (members[post_id]["datetime"], post_id))
+
+    def update(self, deferred: bool = False) -> dict:
+        """
+        Updates the clusters with the sibling matches of the working store and writes the cluster fields of every
+        member post and the cluster membership with bulk writes.
+
+        Parameters:
+        ----------
+        deferred : bool, optional
+            Whether to return the cluster fields of the posts of the working store instead of writing them, so they can
+            be written together with the other fields of the posts (default is False).
+
+        Returns:
+        -------
+        dict
+            The cluster fields of the posts of the working store keyed by post_id, if `deferred`, otherwise empty.
+        """
+        store_ids = set(self.store.table.column("_id").to_pylist()) if deferred else set()
+        deferred_fields = dict()
+        members, union_find = dict(), UnionFind()
+        self.collect_matches(members=members, union_find=union_find)
+        existing = self.collect_existing_clusters(members=members, union_find=union_find)
+        membership_requests, post_requests = list(), dict()
+        for group in union_find.groups().values():
+            cluster_id = self.choose_cluster_id(group=group, members=members, existing=existing)
+            first_seen = min(members[post_id]["datetime"] for post_id in group)
+            fields = {
+                "Cluster_ID": cluster_id,
+                "Cluster_Size": len(group),
+                "Cluster_First_Seen": first_seen,
+                self.config["key_titles"]["many-siblings"]: int(len(group) - 1 >= self.many_siblings_cutoff),
+            }
+            for post_id in group:
+                requests = post_requests.setdefault(members[post_id]["collection"], list())
+                if post_id in store_ids:
+                    deferred_fields[post_id] = fields
+                else:
+                    requests.append(UpdateOne({"_id": ObjectId(post_id)}, {"$set": fields}))
+                if len(group) > 1:
+                    membership_requests.append(UpdateOne(
+                        {"_id": post_id},
+                        {"$set": {"cluster_id": cluster_id, "collection": members[post_id]["collection"], "datetime": members[post_id]["datetime"]}},
+                        upsert=True
+                    ))
+        write_in_batches(collection=self.cluster_collection, requests=membership_requests, batch_size=self.batch_size)
+        for collection_name, requests in tqdm(post_requests.items(), total=len(post_requests), desc="Upload clusters", leave=False):
+            write_in_batches(collection=self.db[collection_name], requests=requests, batch_size=self.batch_size)
+        return deferred_fields
+
+    def get_cluster(self, cluster_id: str) -> list:
+        """
+        Returns the members of a claim cluster.
+
+        Parameters:
+        ----------
+        cluster_id : str
+            The id of the cluster.
+
+        Returns:
+        -------
+        list
+            A list of dictionaries with the post_id, collection and publishing datetime of each member.
+        """
+        return [{"post_id": doc["_id"], "collection": doc["collection"], "datetime": doc["datetime"]} for doc in self.cluster_collection.find({"cluster_id": cluster_id})]
+
+if __name__ == "__main__":
+    ClusterMaintainer().update()
@@ -0,0 +1,55 @@
+from typing import Union
+from MongoUploader import MongoUploader
+from ClusterMaintainer import ClusterMaintainer
+from WorkingStore import WorkingStore
+
+class CommitUploader(MongoUploader):
+    """
+    A class to commit the results of a run to MongoDB with a single write per post.
+
+    Labels, Siblings and cluster fields of a post are written with one update, its vector data is upserted in the same
+    upload. This requires that claim matching does not search the uploaded vectors, i.e. the in-memory window backend.
+    Inherits from the MongoUploader class to use its parsing, bulk writes and watermark updates.
+
+    Attributes:
+    ----------
+    cluster_fields : dict
+        The cluster fields of the posts of the working store, keyed by post_id.
+    """
+
+    def __init__(self, store: Union[WorkingStore, None] = None) -> None:
+        """
+        Initializes the CommitUploader with configuration data and connects to MongoDB.
+        """
+        super().__init__(store=store)
+        self.cluster_fields = dict()
+
+    def tag_parser(self, tagged_doc: dict) -> tuple:
+        """
+        Parses the tagged document to extract the ID, the annotation fields, the siblings and the cluster fields.
+
+        Parameters:
+        ----------
+        tagged_doc : dict
+            The dictionary representing the tagged document to be parsed.
+
+        Returns:
+        -------
+        tuple
+            A tuple containing the document ID and the new data to update in the MongoDB collection.
+        """
+        _id, new_data = super().tag_parser(tagged_doc=tagged_doc)
+        new_data["$set"]["Siblings"] = tagged_doc["Siblings"]
+        new_data["$set"].update(self.cluster_fields.get(_id, dict()))
+        return _id, new_data
+
+    def upload(self) -> None:
+        """
+        Updates the claim clusters, which writes the cluster fields of older posts and the cluster membership,
+        then uploads all fields and the vector data of the posts of the working store.
+        """
+        self.cluster_fields = ClusterMaintainer(store=self.store).update(deferred=True)
+        super().upload()
+
+if __name__ == "__main__":
+    CommitUploader().upload()
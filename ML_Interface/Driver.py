@@ -1,26 +1,128 @@
 import argparse
-from time import sleep
+from time import sleep, monotonic
 from typing import Union
 from MongoDownloader import MongoDownloader
 from Annotator import DataAnnotator
 from MongoUploader import MongoUploader
 from ClaimMatcher import ClaimMatcher
 from MatchUploader import MatchUploader
+from CommitUploader import CommitUploader
+from ClusterMaintainer import ClusterMaintainer
+from WindowMatcher import WindowMatcher
+from LocalVectorIndex import LocalVectorIndex
+from MongoSetup import MongoSetup
+from WorkingStore import WorkingStore
+from RunLedger import RunLedger
+from Pipeline import Pipeline, Stage
+from Utils import load_config
+
+INDEX_WAIT_SECONDS = 60 * 2 # Time MongoDB gets to index newly uploaded vectors.
 
 class Interface():
     def __init__(self) -> None:
-        pass
+        self.config = load_config()
+        self.backend = self.config["claim_matching_paramters"].get("backend", "atlas")
+        self.window_matcher = None
+        self.local_index = None
+        self.upload_times = dict()
     
-    def main(self, local: Union[bool, int], key_title: str = "Topic"):
+    def main(self, local: Union[bool, int], key_title: str = "Topic", chunk_size: Union[int, None] = None, full_scan: bool = False):
         if isinstance(local, int):
             local = bool(local)
+        MongoSetup().require()
+        if self.backend == "memory":
+            self.window_matcher = WindowMatcher() # Loaded before the commit, so new vectors only enter the window once.
+        if self.backend == "local":
+            self.local_index = LocalVectorIndex(must_exist=True) # Loaded once and updated by all uploads of the run.
+        self.resume(local=local)
+        if chunk_size:
+            return self.stream(local=local, key_title=key_title, chunk_size=chunk_size, full_scan=full_scan)
         
-        MongoDownloader().download(key_title=key_title)
-        DataAnnotator().annotate(local=local)
-        MongoUploader().upload()
-        sleep(60 * 2) # Give MongoDB 2 minutes to index the new documents.
-        ClaimMatcher.match_claims()
-        MatchUploader.upload()
+        store = MongoDownloader(full_scan=full_scan).download(key_title=key_title)
+        self.run(store=store, local=local)
+
+    def resume(self, local: bool):
+        """
+        Completes the stores of interrupted runs before anything new is downloaded. The work recorded in the ledger
+        of a store (classifiers, embeddings, matching and uploads per post) is skipped.
+        """
+        for store in WorkingStore.unfinished():
+            self.run(store=store, local=local)
+
+    def run(self, store: WorkingStore, local: bool):
+        DataAnnotator(store=store).annotate(local=local)
+        if self.window_matcher is not None:
+            return self.commit(store=store)
+        MongoUploader(store=store, local_index=self.local_index).upload()
+        if not store.ledger.is_done(stage="matched", post_ids=store.post_ids):
+            self.wait_for_index()
+        self.match(store=store)
+
+    def wait_for_index(self, uploaded_at: Union[float, None] = None):
+        """
+        Gives MongoDB time to index the new documents, counted from the upload if its time is known.
+        """
+        if self.backend == "atlas":
+            elapsed = 0 if uploaded_at is None else monotonic() - uploaded_at
+            sleep(max(0, INDEX_WAIT_SECONDS - elapsed))
+
+    def match_claims(self, store: WorkingStore):
+        if store.ledger.is_done(stage="matched", post_ids=store.post_ids):
+            return
+        if self.window_matcher is None:
+            ClaimMatcher(store=store).match_claims()
+        else:
+            self.window_matcher.match_claims(store=store)
+        store.ledger.mark(stage="matched", post_ids=store.post_ids)
+
+    def match(self, store: WorkingStore):
+        self.match_claims(store=store)
+        MatchUploader(store=store).upload()
+        ClusterMaintainer(store=store).update()
+        store.ledger.mark(stage=RunLedger.COMPLETED, post_ids=store.post_ids)
+
+    def commit(self, store: WorkingStore):
+        """
+        Matches the posts against the in-memory window and writes labels, Siblings and cluster fields in one update
+        per post, together with the vector data.
+        """
+        self.match_claims(store=store)
+        CommitUploader(store=store).upload()
+        store.ledger.mark(stage=RunLedger.COMPLETED, post_ids=store.post_ids)
+
+    def stream(self, local: bool, key_title: str, chunk_size: int, full_scan: bool = False):
+        """
+        Runs the pipeline chunk by chunk, so that only a few chunks of `chunk_size` posts are held in memory at once.
+        Download (including text cleaning), inference, upload and matching run as concurrent stages connected by
+        bounded queues, see `Pipeline`. With the Atlas backend, a chunk is matched once MongoDB had time to index its
+        vectors, while the next chunks are already being annotated. With the in-memory backend every chunk is matched
+        and then committed in a single write per post.
+        """
+        parameters = self.config["pipeline"]
+        inference = Stage(name="inference", function=lambda store: DataAnnotator(store=store).annotate(local=local), workers=parameters["inference_workers"], queue_size=parameters["queue_size"])
+        if self.window_matcher is not None:
+            stages = [
+                inference,
+                Stage(name="matching", function=self.match_claims, queue_size=parameters["queue_size"]), # The window is not thread-safe.
+                Stage(name="commit", function=self.commit, queue_size=parameters["queue_size"]), # Clusters are updated by one worker.
+            ]
+        else:
+            stages = [
+                inference,
+                Stage(name="upload", function=self.upload, workers=1 if self.backend == "local" else parameters["upload_workers"], queue_size=parameters["queue_size"]),
+                Stage(name="matching", function=self.wait_and_match, queue_size=parameters["queue_size"]),
+            ]
+        downloader = MongoDownloader(full_scan=full_scan)
+        Pipeline(stages=stages, queue_size=parameters["queue_size"]).run(stores=downloader.download_chunks(chunk_size=chunk_size, key_title=key_title))
+
+    def upload(self, store: WorkingStore):
+        MongoUploader(store=store, local_index=self.local_index).upload()
+        self.upload_times[store.folder] = monotonic()
+
+    def wait_and_match(self, store: WorkingStore):
+        if not store.ledger.is_done(stage="matched", post_ids=store.post_ids):
+            self.wait_for_index(uploaded_at=self.upload_times.pop(store.folder, None))
+        self.match(store=store)
 
 def parse_arguments():
     """
@@ -43,10 +145,22 @@ def parse_arguments():
         default='Topic', 
         help='The key to use for downloading documents. All documents without that key will be downloaded. Default is "Topic".'
     )
+    parser.add_argument(
+        '--chunk_size', 
+        type=int, 
+        default=None, 
+        help='If set, posts are processed in chunks of this size from download to sibling upload, which keeps memory usage flat. Default is to process all posts at once.'
+    )
+    parser.add_argument(
+        '--full_scan', 
+        type=int, 
+        default=0, 
+        help='1 to ignore the download watermarks and scan all documents of every collection for the key, e.g. after adding a new key. Default is 0.'
+    )
     
     # Parse arguments
     return parser.parse_args()
 
 if __name__ == "__main__":
     args = parse_arguments()
-    Interface().main(local=args.local, key_title=args.key_title)
+    Interface().main(local=args.local, key_title=args.key_title, chunk_size=args.chunk_size, full_scan=bool(args.full_scan))
@@ -1,29 +1,33 @@
 import os
-import torch
 from typing import Union, List
-from transformers import pipeline
-from .Utils import get_checkpoint, get_endpoint, clear_gpu_memory
+from .Utils import get_endpoint, get_device, clear_gpu_memory
+from .ModelStore import get_model_path, MODEL_KWARGS
 os.environ['TOKENIZERS_PARALLELISM'] = "TRUE"
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-
 
 class LocalClassification():
     def __init__(self) -> None:
         pass
     
     def local_load_classifier(self, task:str):
+        import torch
+        from transformers import pipeline
+        device = get_device()
         tokenizer_kwargs = {'padding':True,'truncation':True,'max_length':512}
-        checkpoint = get_checkpoint(task)
+        checkpoint = get_model_path(task)
         classifier = pipeline("text-classification", 
                                 model = checkpoint, 
                                 tokenizer=checkpoint,
-                                torch_dtype=torch.float16 if DEVICE == "cuda" else torch.float32,
+                                torch_dtype=torch.float16 if device == "cuda" else torch.float32,
+                                model_kwargs=MODEL_KWARGS,
                                 **tokenizer_kwargs, 
-                                device=DEVICE)
+                                device=device)
         return classifier
     
     def local_classification(self, task:str, inputs: Union[str, List[str]]):
+        classifier = getattr(self, "loaded_models", dict()).get(task)
+        if classifier is not None: # Kept loaded by Inference.keep_loaded.
+            return [out["label"] for out in classifier(inputs)]
         classifier = self.local_load_classifier(task=task)
         outputs = classifier(inputs)
         del classifier
@@ -1,12 +1,10 @@
-import torch
+import numpy as np
 from typing import Union, List
-from huggingface_hub import InferenceClient
-from sentence_transformers import SentenceTransformer
-from .Utils import get_checkpoint, get_endpoint, load_config, clear_gpu_memory
+from .Utils import get_checkpoint, get_endpoint, get_device, load_config, clear_gpu_memory
+from .ModelStore import get_model_path, MODEL_KWARGS
 
 
 BATCH_SIZE = 128
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
 class LocalEmbedding():
     """
@@ -20,6 +18,9 @@ class LocalEmbedding():
     embed_documents(inputs: Union[str, List[str]], model):
         Embeds a document or a list of documents using the provided model.
         
+    local_load_embedder(task: str):
+        Loads the SentenceTransformer model of the task.
+
     local_embedding(task: str, inputs: Union[str, List[str]]):
         Handles the embedding process locally based on the task (query or document embedding).
     """
@@ -34,7 +35,7 @@ class LocalEmbedding():
                     show_progress_bar=False,
                     normalize_embeddings=False,
                     convert_to_numpy=True,
-                    device=DEVICE)
+                    device=get_device())
         
     def embed_documents(self, inputs: Union[str, List[str]], model):
         return model.encode(sentences=inputs, 
@@ -42,15 +43,22 @@ class LocalEmbedding():
                     show_progress_bar=False,
                     normalize_embeddings=False,
                     convert_to_numpy=True,
-                    device=DEVICE)
+                    device=get_device())
+
+    def local_load_embedder(self, task:str):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(get_model_path(task), model_kwargs=MODEL_KWARGS)
 
     def local_embedding(self, task:str, inputs: Union[str, List[str]]):
-        model = SentenceTransformer(get_checkpoint(task))
         embed = self.embed_query if task == "query-embedding" else self.embed_documents
+        model = getattr(self, "loaded_models", dict()).get(task)
+        if model is not None: # Kept loaded by Inference.keep_loaded.
+            return embed(inputs=inputs, model=model).astype(np.float32)
+        model = self.local_load_embedder(task=task)
         embeddings = embed(inputs=inputs, model=model)
         del model
         clear_gpu_memory()
-        return [e.tolist() for e in embeddings]
+        return embeddings.astype(np.float32)
     
 class APIEmbedding():
     """
@@ -76,9 +84,10 @@ class APIEmbedding():
             inputs = self.add_prompt(inputs=inputs)
         endpoint = get_endpoint(task=task)
         hf_token = load_config()["hf_token"]
+        from huggingface_hub import InferenceClient
         client = InferenceClient(endpoint, token=hf_token)
         embeddings = client.feature_extraction(text=inputs, normalize=False, truncate=True)
-        return embeddings.tolist()
+        return np.asarray(embeddings, dtype=np.float32)
 
     
 class Embedding(APIEmbedding, LocalEmbedding):
@@ -1,6 +1,8 @@
 from typing import Union, List
+from contextlib import contextmanager
 from .Classification import Classification
 from .Embedding import Embedding
+from .Utils import load_config, post_to_server, decode_array, clear_gpu_memory
 
 class Inference(Classification, Embedding):
     """
@@ -15,10 +17,40 @@ class Inference(Classification, Embedding):
     inference(local: bool, task: str, inputs: Union[str, List[str]]):
         Determines whether to perform an embedding or classification task based on the provided task string.
         Calls the appropriate method based on the task.
+    server_inference(task: str, inputs: Union[str, List[str]]):
+        Sends the task to the local inference server, which keeps the models loaded.
+    keep_loaded(local: bool, task: str):
+        A context in which local inference of the task reuses one loaded model instead of loading it per call.
     """
     
     def __init__(self) -> None:
         super().__init__()
+        self.server_url = load_config().get("inference_server", dict()).get("url")
+        self.loaded_models = dict()
+
+    @contextmanager
+    def keep_loaded(self, local: bool, task: str):
+        """
+        Loads the local model of a task once for all `inference` calls of the task inside the context and frees it
+        afterwards. Does nothing for API inference or the inference server, which keeps its models loaded itself.
+
+        Parameters
+        ----------
+        local : bool
+            Indicates whether to use local processing or API-based processing.
+
+        task : str
+            The task whose model is kept loaded.
+        """
+        if not local or self.server_url or task in self.loaded_models:
+            yield
+            return
+        self.loaded_models[task] = self.local_load_embedder(task=task) if "embedding" in task else self.local_load_classifier(task=task)
+        try:
+            yield
+        finally:
+            del self.loaded_models[task]
+            clear_gpu_memory()
         
     def inference(self, local: bool, task: str, inputs: Union[str, List[str]]):
         """
@@ -40,8 +72,33 @@ class Inference(Classification, Embedding):
         -------
         List
             The result of the embedding or classification task, returned as a list of results.
+            Local inference uses the inference server if `inference_server.url` is configured.
         """
+        if local and self.server_url:
+            return self.server_inference(task=task, inputs=inputs)
         if "embedding" in task:
             return self.embedding(local=local, task=task, inputs=inputs)
         else:
-            return self.classification(local=local, task=task, inputs=inputs)
\ No newline at end of file
+            return self.classification(local=local, task=task, inputs=inputs)
+
+    def server_inference(self, task: str, inputs: Union[str, List[str]]):
+        """
+        Perform inference on the local inference server (see `InferenceServer`).
+
+        Parameters
+        ----------
+        task : str
+            The type of task to perform.
+
+        inputs : Union[str, List[str]]
+            The input data to process, which can be a single string or a list of strings.
+
+        Returns
+        -------
+        List or np.ndarray
+            The labels of a classification task or the float32 embeddings of an embedding task.
+        """
+        response = post_to_server(url=self.server_url, path="/inference", payload={"task": task, "inputs": inputs, "encoding": "base64"})
+        if "embedding" in task:
+            return decode_array(data=response["outputs"], shape=response["shape"])
+        return response["outputs"]
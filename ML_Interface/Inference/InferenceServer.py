@@ -0,0 +1,236 @@
+import os
+import json
+import argparse
+import numpy as np
+from time import monotonic
+from queue import Queue, Empty
+from threading import Thread, Lock
+from concurrent.futures import Future
+from socketserver import ThreadingMixIn, UnixStreamServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+from .Inference import Inference
+from .Utils import load_config, encode_array
+
+
+class MicroBatcher():
+    """
+    Coalesces concurrent requests for one task into micro-batches.
+
+    Every input is queued with a future. A worker thread takes the first waiting input, collects more inputs until
+    `max_batch_size` inputs are collected or `max_wait` seconds have passed, runs the model once on the batch and
+    resolves the futures. Large requests fill whole batches right away, single-text requests wait at most `max_wait`.
+
+    Attributes:
+    ----------
+    function : Callable
+        Runs the model on a list of inputs and returns one output per input.
+    max_batch_size : int
+        The maximum number of inputs per batch.
+    max_wait : float
+        The maximum time in seconds the first input of a batch waits for more inputs.
+    queue : Queue
+        The waiting inputs and their futures.
+    """
+
+    def __init__(self, function: Callable[[List[str]], list], max_batch_size: int, max_wait: float) -> None:
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = Queue()
+        Thread(target=self.run, daemon=True).start()
+
+    def submit(self, inputs: List[str]) -> list:
+        """
+        Queues inputs and waits for their outputs.
+
+        Parameters:
+        ----------
+        inputs : List[str]
+            The input texts.
+
+        Returns:
+        -------
+        list
+            One output per input.
+        """
+        futures = list()
+        for text in inputs:
+            future = Future()
+            self.queue.put((text, future))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def collect(self) -> list:
+        batch = [self.queue.get()]
+        deadline = monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except Empty:
+                pass
+            timeout = deadline - monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except Empty:
+                break
+        return batch
+
+    def run(self) -> None:
+        while True:
+            batch = self.collect()
+            try:
+                outputs = self.function([text for text, future in batch])
+                for (text, future), output in zip(batch, outputs):
+                    future.set_result(output)
+            except Exception as error:
+                for text, future in batch:
+                    future.set_exception(error)
+
+
+class InferenceServer(Inference):
+    """
+    A long-lived local inference daemon that keeps the embedders and classifiers resident in memory.
+
+    Models are loaded once per task (on startup for the preloaded tasks, otherwise on the first request) and every
+    task has its own MicroBatcher. The server speaks JSON over HTTP, on a TCP port or on a Unix socket:
+
+    - `POST /inference` with `{"task": ..., "inputs": [...], "encoding": "json" | "base64"}` returns `{"outputs": ...}`.
+      Embeddings are nested lists, or with "base64" a base64 encoded float32 array with its shape.
+    - `GET /health` returns the loaded tasks.
+
+    Attributes:
+    ----------
+    max_batch_size : int
+        The maximum number of inputs per model call.
+    max_wait : float
+        The maximum time in seconds a request waits for other requests to join its batch.
+    batchers : dict
+        The MicroBatcher of each loaded task.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait: float) -> None:
+        super().__init__()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batchers = dict()
+        self.lock = Lock()
+
+    def load(self, task: str) -> MicroBatcher:
+        """
+        Returns the MicroBatcher of a task and loads the model of the task if it is not loaded yet.
+        """
+        with self.lock:
+            if task not in self.batchers:
+                if "embedding" in task:
+                    model = self.local_load_embedder(task=task)
+                    embed = self.embed_query if task == "query-embedding" else self.embed_documents
+                    function = lambda inputs: list(np.asarray(embed(inputs=inputs, model=model), dtype=np.float32))
+                else:
+                    classifier = self.local_load_classifier(task=task)
+                    function = lambda inputs: [out["label"] for out in classifier(inputs)]
+                self.batchers[task] = MicroBatcher(function=function, max_batch_size=self.max_batch_size, max_wait=self.max_wait)
+            return self.batchers[task]
+
+    def handle(self, request: dict) -> dict:
+        """
+        Runs the inference of a request.
+
+        Parameters:
+        ----------
+        request : dict
+            The task, the inputs and optionally the encoding of embeddings.
+
+        Returns:
+        -------
+        dict
+            The response with the outputs.
+        """
+        task, inputs = request["task"], request["inputs"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        outputs = self.load(task=task).submit(inputs=inputs)
+        if "embedding" not in task:
+            return {"outputs": outputs}
+        outputs = np.stack(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+        if request.get("encoding") == "base64":
+            return {"outputs": encode_array(outputs), "shape": list(outputs.shape)}
+        return {"outputs": outputs.tolist()}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "ClaimspottingInference"
+
+    def send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self.send_json(404, {"error": "not found"})
+        self.send_json(200, {"tasks": sorted(self.server.inference.batchers)})
+
+    def do_POST(self):
+        if self.path != "/inference":
+            return self.send_json(404, {"error": "not found"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            response = self.server.inference.handle(request=request)
+        except (KeyError, ValueError) as error:
+            return self.send_json(400, {"error": str(error)})
+        except Exception as error:
+            return self.send_json(500, {"error": str(error)})
+        self.send_json(200, response)
+
+    def address_string(self) -> str:
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(host: str, port: int, socket_path: str, tasks: List[str], max_batch_size: int, max_wait_ms: float) -> None:
+    """
+    Starts the inference server, preloads the models of `tasks` and serves until interrupted.
+    If `socket_path` is set, the server listens on that Unix socket instead of the TCP port.
+    """
+    inference = InferenceServer(max_batch_size=max_batch_size, max_wait=max_wait_ms / 1000)
+    for task in tasks:
+        inference.load(task=task)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, RequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.inference = inference
+    print(f"Serving {', '.join(tasks) or 'no preloaded tasks'} on {socket_path or f'{host}:{port}'}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+if __name__ == "__main__":
+    parameters = load_config()["inference_server"]
+    parser = argparse.ArgumentParser(description="Run the local inference server with resident models and request micro-batching.")
+    parser.add_argument('--host', type=str, default=parameters["host"], help='The host to listen on.')
+    parser.add_argument('--port', type=int, default=parameters["port"], help='The port to listen on.')
+    parser.add_argument('--socket', type=str, default=parameters["socket"], help='A Unix socket path to listen on instead of the TCP port.')
+    parser.add_argument('--tasks', type=str, nargs='*', default=parameters["preload"], help='The tasks whose models are loaded on startup.')
+    parser.add_argument('--max_batch_size', type=int, default=parameters["max_batch_size"], help='The maximum number of inputs per model call.')
+    parser.add_argument('--max_wait_ms', type=float, default=parameters["max_wait_ms"], help='The maximum time a request waits for other requests to join its batch.')
+    args = parser.parse_args()
+    serve(host=args.host, port=args.port, socket_path=args.socket, tasks=args.tasks, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
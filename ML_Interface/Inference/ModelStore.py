@@ -0,0 +1,140 @@
+import os
+import json
+import argparse
+import shutil
+from tqdm import tqdm
+from typing import Union
+from .Utils import get_checkpoint, load_config, make_path
+
+MODEL_KWARGS = {"low_cpu_mem_usage": True} # Assigns the memory-mapped safetensors weights instead of copying them into initialized weights.
+
+
+class ModelStore():
+    """
+    A local store of the configured checkpoints in a layout that loads without deserialization.
+
+    Every checkpoint is converted once into a folder (tasks with the same checkpoint share it) with the weights as a single safetensors file, the model config
+    and the fast tokenizer (`tokenizer.json`), so neither the Hugging Face cache nor a slow tokenizer conversion is
+    involved when a model is loaded. Loading with `low_cpu_mem_usage` memory-maps the safetensors file instead of
+    copying it: CPU weights are read-only pages of the page cache, which all worker processes share.
+    A manifest records the checkpoint each folder was converted from, so a changed checkpoint is converted again.
+
+    Attributes:
+    ----------
+    folder : str
+        The folder of the store.
+    manifest : dict
+        A mapping from the folder of every converted checkpoint to the checkpoint.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self) -> None:
+        """
+        Initializes the ModelStore and loads its manifest, if it exists.
+        """
+        self.folder = make_path(load_config()["model_store"]["path"])
+        self.manifest = dict()
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.folder, self.MANIFEST_FILE)
+
+    def model_path(self, checkpoint: str) -> str:
+        return os.path.join(self.folder, checkpoint.replace("/", "--"))
+
+    def get(self, task: str) -> Union[str, None]:
+        """
+        Returns the folder of a task, if it holds the currently configured checkpoint.
+
+        Parameters:
+        ----------
+        task : str
+            The task, e.g. "topic-classification".
+
+        Returns:
+        -------
+        str or None
+            The folder of the converted model, or None if the task has not been converted.
+        """
+        checkpoint = get_checkpoint(task)
+        if checkpoint is None:
+            return None
+        path = self.model_path(checkpoint)
+        if self.manifest.get(os.path.basename(path)) != checkpoint or not os.path.isdir(path):
+            return None
+        return path
+
+    def prepare(self, task: str, force: bool = False) -> str:
+        """
+        Converts the checkpoint of a task into the store.
+
+        Parameters:
+        ----------
+        task : str
+            The task, e.g. "topic-classification".
+        force : bool, optional
+            Whether to convert the checkpoint again even if it is in the store (default is False).
+
+        Returns:
+        -------
+        str
+            The folder of the converted model.
+        """
+        if not force and self.get(task) is not None:
+            return self.get(task)
+        checkpoint = get_checkpoint(task)
+        path = self.model_path(checkpoint)
+        if os.path.exists(path):
+            self.manifest.pop(os.path.basename(path), None)
+            self.save_manifest()
+            shutil.rmtree(path)
+        if "embedding" in task:
+            from sentence_transformers import SentenceTransformer
+            SentenceTransformer(checkpoint).save(path, safe_serialization=True)
+        else:
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+            AutoModelForSequenceClassification.from_pretrained(checkpoint).save_pretrained(path, safe_serialization=True, max_shard_size="100GB")
+            AutoTokenizer.from_pretrained(checkpoint).save_pretrained(path)
+        self.manifest[os.path.basename(path)] = checkpoint # Written last, so an interrupted conversion is not used.
+        self.save_manifest()
+        return path
+
+    def save_manifest(self) -> None:
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self.manifest_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=4)
+
+    def prepare_all(self, force: bool = False) -> None:
+        """
+        Converts the checkpoints of all configured tasks. Tasks whose checkpoint cannot be loaded (e.g. not
+        configured yet) are skipped.
+        """
+        converted = set()
+        for task, checkpoint in tqdm(load_config()["checkpoints"].items(), desc="Prepare model store", leave=False):
+            try:
+                self.prepare(task=task, force=force and checkpoint not in converted)
+                converted.add(checkpoint)
+            except OSError as error:
+                tqdm.write(f"Skipped {task}: {error}")
+
+def get_model_path(task: str) -> str:
+    """
+    Returns the folder of the converted model of a task, or the checkpoint if the task is not in the model store.
+
+    Parameters:
+    task (str): The task, e.g. "topic-classification".
+
+    Returns:
+    str: A local folder or a Hugging Face checkpoint.
+    """
+    return ModelStore().get(task) or get_checkpoint(task)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the configured checkpoints into the local model store.")
+    parser.add_argument('--force', type=int, default=0, help='1 to convert checkpoints that are already in the store again. Default is 0.')
+    args = parser.parse_args()
+    ModelStore().prepare_all(force=bool(args.force))
@@ -1,7 +1,12 @@
 import gc
 import json
-import torch
+import base64
+import socket
+import numpy as np
 from pathlib import Path
+from functools import lru_cache
+from http.client import HTTPConnection
+from urllib.parse import urlparse
 
 def clear_gpu_memory():
     """
@@ -11,9 +16,11 @@ def clear_gpu_memory():
     This function is useful for freeing up GPU resources that are no longer in use, 
     which can help prevent memory leaks and optimize resource utilization.
     """
-    torch.cuda.empty_cache()
-    torch.cuda.ipc_collect()
-    torch.cuda.synchronize()
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+        torch.cuda.ipc_collect()
+        torch.cuda.synchronize()
     gc.collect()
     
 def make_path(extension: str) -> str:
@@ -29,9 +36,21 @@ def make_path(extension: str) -> str:
     project_path = Path(Path(__file__).resolve().parent.parent)
     return str(project_path / extension)
 
+def get_device() -> str:
+    """
+    Returns the device for local inference. Imports torch on the first call, so importing the Inference package stays cheap.
+
+    Returns:
+    str: "cuda" if a GPU is available, otherwise "cpu".
+    """
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+@lru_cache(maxsize=None)
 def load_config() -> dict:
     """
     Loads the configuration settings from a JSON file located in the project's root directory.
+    The file is read once per process; the returned dictionary is shared and must not be modified.
 
     Returns:
     dict: The configuration settings as a dictionary.
@@ -63,3 +82,72 @@ def get_endpoint(task: str) -> str:
     str: The URL of the API endpoint for the specified task.
     """
     return load_config()["endpoints"].get(task)
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """
+    An HTTP connection over a Unix socket.
+    """
+
+    def __init__(self, socket_path: str, timeout=None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def encode_array(array: np.ndarray) -> str:
+    """
+    Encodes a float32 array as base64 string.
+
+    Parameters:
+    array (np.ndarray): The array to encode.
+
+    Returns:
+    str: The base64 encoded little-endian float32 bytes of the array.
+    """
+    return base64.b64encode(np.ascontiguousarray(array, dtype="<f4").tobytes()).decode("ascii")
+
+def decode_array(data: str, shape: list) -> np.ndarray:
+    """
+    Decodes a base64 string created by `encode_array`.
+
+    Parameters:
+    data (str): The base64 encoded array.
+    shape (list): The shape of the array.
+
+    Returns:
+    np.ndarray: The float32 array.
+    """
+    return np.frombuffer(base64.b64decode(data), dtype="<f4").reshape(shape).astype(np.float32)
+
+def post_to_server(url: str, path: str, payload: dict, timeout=None) -> dict:
+    """
+    Sends a JSON request to the inference server and returns its JSON response.
+
+    Parameters:
+    url (str): The URL of the server, e.g. "http://127.0.0.1:8765" or "unix:///tmp/inference.sock".
+    path (str): The path of the request, e.g. "/inference".
+    payload (dict): The request body.
+    timeout (float or None): The timeout of the connection in seconds (default is no timeout).
+
+    Returns:
+    dict: The response body.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        connection = UnixHTTPConnection(socket_path=parsed.path, timeout=timeout)
+    else:
+        connection = HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+    try:
+        body = json.dumps(payload).encode("utf-8")
+        connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        data = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"Inference server returned {response.status}: {data.get('error')}")
+    return data
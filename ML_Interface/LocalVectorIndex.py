@@ -0,0 +1,196 @@
+import os
+import json
+import numpy as np
+from tqdm import tqdm
+from typing import List, Union
+from pymongo import MongoClient
+from pymongo.server_api import ServerApi
+from Utils import load_config, make_path, make_folder, decode_vector
+
+METADATA_KEYS = ["_id", "post_id", "Link", "Channel_Name", "Publishing_datetime"]
+
+
+class LocalVectorIndex():
+    """
+    A local HNSW index replicating the vector collection in MongoDB.
+
+    The HNSW graph and the vectors are kept in a usearch index file, which can be opened as a read-only memory-mapped
+    view. The metadata of each vector is kept in a JSON lines file, where line `i` belongs to key `i`
+    of the index (replaced entries are null). Search results have the same format as the results of Atlas `$vectorSearch`.
+
+    Attributes:
+    ----------
+    config : dict
+        Configuration data loaded from an external source.
+    folder : str
+        The folder holding the index files.
+    index : usearch.index.Index
+        The HNSW index.
+    metadata : List[dict]
+        The metadata of each key of the index.
+    post_keys : dict
+        A mapping from post_id to the key of the most recent vector of the post.
+    """
+
+    INDEX_FILE = "index.usearch"
+    METADATA_FILE = "metadata.jsonl"
+
+    def __init__(self, view: bool = False, must_exist: bool = False) -> None:
+        """
+        Initializes the LocalVectorIndex and opens the index files if they exist.
+
+        Parameters:
+        ----------
+        view : bool, optional
+            Whether to open the index as a read-only memory-mapped view (default is False).
+        must_exist : bool, optional
+            Whether to raise an error if the index has not been built yet, instead of starting from an empty index
+            (default is False).
+        """
+        from usearch.index import Index # Imported here, so only the local backend pays for it.
+        self.config = load_config()
+        parameters = self.config["local_index"]
+        self.folder = make_path(parameters["path"])
+        make_folder(self.folder)
+        self.index = Index(
+            ndim=self.config["index"]["fields"][0]["numDimensions"],
+            metric="cos",
+            dtype=parameters.get("dtype", "f16"),
+            connectivity=parameters.get("connectivity", 16),
+            expansion_add=parameters.get("expansion_add", 128),
+            expansion_search=parameters.get("expansion_search", 64),
+        )
+        self.metadata = list()
+        self.post_keys = dict()
+        if must_exist and not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"The local vector index {self.index_path} does not exist. Build it from the vector collection with `python LocalVectorIndex.py` first.")
+        self.open(view=view)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.folder, self.INDEX_FILE)
+
+    @property
+    def metadata_path(self) -> str:
+        return os.path.join(self.folder, self.METADATA_FILE)
+
+    def open(self, view: bool) -> None:
+        """
+        Opens the index files, if they exist.
+
+        Parameters:
+        ----------
+        view : bool
+            Whether to memory-map the index read-only instead of loading it into memory.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        if view:
+            self.index.view(self.index_path)
+        else:
+            self.index.load(self.index_path)
+        with open(self.metadata_path, "r", encoding="utf-8") as f:
+            self.metadata = [json.loads(line) for line in f]
+        self.post_keys = {m["post_id"]: key for key, m in enumerate(self.metadata) if m is not None}
+
+    def add(self, vector_docs: List[dict]) -> None:
+        """
+        Adds documents of the vector collection to the index. A post that is already indexed is replaced.
+
+        Parameters:
+        ----------
+        vector_docs : List[dict]
+            Documents in the format of the vector collection, including "_id" and "text_embedding".
+        """
+        vector_docs = [doc for doc in vector_docs if doc.get("text_embedding") is not None]
+        if len(vector_docs) == 0:
+            return
+        for doc in vector_docs:
+            key = self.post_keys.get(doc.get("post_id"))
+            if key is not None:
+                self.index.remove(key)
+                self.metadata[key] = None
+        keys = np.arange(len(self.metadata), len(self.metadata) + len(vector_docs), dtype=np.uint64)
+        vectors = np.stack([decode_vector(doc["text_embedding"]) for doc in vector_docs])
+        self.index.add(keys, vectors)
+        for key, doc in zip(keys, vector_docs):
+            metadata = {k: str(doc.get(k)) if k == "_id" else doc.get(k) for k in METADATA_KEYS}
+            self.metadata.append(metadata)
+            self.post_keys[metadata["post_id"]] = int(key)
+
+    def save(self) -> None:
+        """
+        Saves the index and the metadata file.
+        Replaced entries are stored as null lines, so line numbers keep matching the keys.
+
+        Both files are written to temporary files and then renamed over the old ones, the index first and the
+        metadata last. Readers that memory-map the old index keep their (unlinked) file, and readers that reopen
+        the index when the metadata changes (the Django search workers) see both new files.
+        """
+        index_path, metadata_path = self.index_path + ".tmp", self.metadata_path + ".tmp"
+        self.index.save(index_path)
+        with open(metadata_path, "w", encoding="utf-8") as f:
+            for metadata in self.metadata:
+                f.write(json.dumps(metadata, ensure_ascii=False) + "\n")
+        os.replace(index_path, self.index_path)
+        os.replace(metadata_path, self.metadata_path)
+
+    def build(self, batch_size: int = 10000) -> None:
+        """
+        Builds the index from scratch from all documents of the vector collection in MongoDB.
+
+        Parameters:
+        ----------
+        batch_size : int, optional
+            The number of documents added to the index at once (default is 10000).
+        """
+        self.index.reset()
+        self.metadata = list()
+        self.post_keys = dict()
+        client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
+        collection = client[self.config["mongo_db"]["mongo_vector_db_name"]][self.config["mongo_db"]["mongo_vector_db_name"]]
+        batch = list()
+        for doc in tqdm(collection.find({"text_embedding": {"$ne": None}}), total=collection.estimated_document_count(), desc="Build local vector index", leave=False):
+            batch.append(doc)
+            if len(batch) == batch_size:
+                self.add(vector_docs=batch)
+                batch = list()
+        self.add(vector_docs=batch)
+        client.close()
+        self.save()
+
+    def search(self, query_embedding: np.ndarray, limit: int, numCandidates: Union[int, None] = None) -> list:
+        """
+        Searches the index for the nearest neighbours of a query embedding.
+
+        Parameters:
+        ----------
+        query_embedding : np.ndarray
+            The embedding vector used for the search query.
+        limit : int
+            Maximum number of results to return.
+        numCandidates : int, optional
+            The size of the candidate list explored during the search, like `numCandidates` of `$vectorSearch`.
+
+        Returns:
+        -------
+        list
+            A list of results with "_id", "post_id", "Link", "Channel_Name", "Publishing_datetime" and "score",
+            where "score" is projected to MongoDB's vector search score range.
+        """
+        if len(self.index) == 0:
+            return []
+        if numCandidates is not None:
+            self.index.expansion_search = max(numCandidates, limit)
+        matches = self.index.search(np.asarray(query_embedding, dtype=np.float32), limit)
+        results = list()
+        for key, distance in zip(matches.keys, matches.distances):
+            if int(key) >= len(self.metadata) or self.metadata[int(key)] is None:
+                continue # Opened between the replacement of the index and of the metadata.
+            result = dict(self.metadata[int(key)])
+            result["score"] = float((2 - distance) / 2)
+            results.append(result)
+        return results
+
+if __name__ == "__main__":
+    LocalVectorIndex().build()
@@ -1,36 +1,42 @@
-import os
-import json
-from glob import glob
 from tqdm import tqdm
-from pymongo import MongoClient
+from typing import Union
+from pymongo import MongoClient, UpdateOne
 from pymongo.server_api import ServerApi
+from pymongo.write_concern import WriteConcern
 from bson.objectid import ObjectId
-from Utils import load_config, get_most_recent_subfolders
+from Utils import load_config, write_in_batches
+from WorkingStore import WorkingStore
 
 class MatchUploader():
     """
     A class to handle the uploading of sibling match data to a MongoDB database.
+    Collections are recorded as the stage `STAGE` in the ledger of the working store once uploaded, and skipped by a resumed run.
     
     Attributes:
     ----------
     config : dict
         Configuration data loaded from an external source.
+    batch_size : int
+        The maximum number of operations per bulk write.
     client : pymongo.MongoClient
         MongoDB client for interacting with the database.
     db : pymongo.database.Database
         The specific database within MongoDB to store the documents.
-    folder_dct : dict
-        A dictionary of the most recent subfolders, presumably containing the data to upload.
+    store : WorkingStore
+        The working store holding the data to upload.
     """
+
+    STAGE = "siblings-uploaded"
     
-    def __init__(self) -> None:
+    def __init__(self, store: Union[WorkingStore, None] = None) -> None:
         """
         Initializes the MatchUploader with configuration data and connects to MongoDB.
         """
         self.config = load_config()
+        self.batch_size = self.config["upload"]["batch_size"]
         self.client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
-        self.db = self.client[self.config["mongo_db"]["mongo_db_name"]]
-        self.folder_dct = get_most_recent_subfolders()
+        self.db = self.client.get_database(self.config["mongo_db"]["mongo_db_name"], write_concern=WriteConcern(**self.config["upload"]["write_concern"]))
+        self.store = WorkingStore.most_recent() if store is None else store
     
     def tag_parser(self, tagged_doc: dict) -> tuple:
         """
@@ -54,51 +60,65 @@ class MatchUploader():
         }
         return _id, new_data
     
-    def tag_loader(self, collection_name: str, collection_path: str):
+    def group_by_collection(self) -> dict:
+        """
+        Groups the rows of the working store by the MongoDB collection they were downloaded from.
+        
+        Returns:
+        -------
+        dict
+            A dictionary where the keys are collection names and the values are lists of tagged documents.
+        """
+        collection_dct = dict()
+        for idx, tagged_doc in self.store.iter_posts(columns=["_id", "collection", "Siblings"]):
+            collection_dct.setdefault(tagged_doc["collection"], list()).append(tagged_doc)
+        return collection_dct
+    
+    def tag_loader(self, collection_name: str, tagged_docs: list):
         """
-        Loads JSON files from the specified collection path, parses each tagged document, and yields the necessary data.
+        Parses each tagged document of a collection and yields the necessary data.
         
         Parameters:
         ----------
         collection_name : str
             The name of the MongoDB collection where the data will be uploaded.
-        collection_path : str
-            The path to the directory containing the JSON files to be loaded.
+        tagged_docs : list
+            A list of tagged documents from the working store.
         
         Yields:
         ------
         tuple
             A tuple containing the document ID and the new sibling data to update in the MongoDB collection.
         """
-        path_list = glob(os.path.join(collection_path, "*.json"))
-        for path in tqdm(path_list, total=len(path_list), desc=collection_name, leave=False):
-            with open(path, "r") as f:
-                tagged_doc = json.load(f)
+        for tagged_doc in tqdm(tagged_docs, total=len(tagged_docs), desc=collection_name, leave=False):
             _id, new_data = self.tag_parser(tagged_doc=tagged_doc)
             yield _id, new_data
     
-    def upload_collection(self, collection_name: str, collection_path: str) -> None:
+    def upload_collection(self, collection_name: str, tagged_docs: list) -> None:
         """
-        Updates a MongoDB collection with sibling match data parsed from JSON files in the specified directory.
+        Updates a MongoDB collection with sibling match data from the working store with unordered bulk writes.
         
         Parameters:
         ----------
         collection_name : str
             The name of the MongoDB collection to update.
-        collection_path : str
-            The path to the directory containing the JSON files to be uploaded.
+        tagged_docs : list
+            A list of tagged documents from the working store.
         """
-        collection = self.db[collection_name]
-        for _id, new_data in self.tag_loader(collection_name=collection_name, collection_path=collection_path):
-            query = {"_id": ObjectId(_id)}
-            collection.update_one(query, new_data)
+        requests = [UpdateOne({"_id": ObjectId(_id)}, new_data) for _id, new_data in self.tag_loader(collection_name=collection_name, tagged_docs=tagged_docs)]
+        write_in_batches(collection=self.db[collection_name], requests=requests, batch_size=self.batch_size)
+        self.store.ledger.mark(stage=self.STAGE, post_ids=[tagged_doc["_id"] for tagged_doc in tagged_docs])
     
     def upload(self) -> None:
         """
-        Iterates through all collections and uploads the corresponding sibling data from the most recent subfolders.
+        Iterates through all collections and uploads the corresponding sibling data from the working store.
+        Posts that were already uploaded by an interrupted run are skipped.
         """
-        for collection_name, collection_path in tqdm(self.folder_dct.items(), total=len(self.folder_dct), desc="Upload siblings", leave=False):
-            self.upload_collection(collection_name=collection_name, collection_path=collection_path)
+        collection_dct = self.group_by_collection()
+        for collection_name, tagged_docs in tqdm(collection_dct.items(), total=len(collection_dct), desc="Upload siblings", leave=False):
+            pending = set(self.store.ledger.pending(stage=self.STAGE, post_ids=[tagged_doc["_id"] for tagged_doc in tagged_docs]))
+            if pending:
+                self.upload_collection(collection_name=collection_name, tagged_docs=[tagged_doc for tagged_doc in tagged_docs if tagged_doc["_id"] in pending])
 
 if __name__ == "__main__":
     MatchUploader().upload()
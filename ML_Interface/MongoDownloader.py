@@ -1,16 +1,52 @@
 import os
 import re
-import json
+from queue import Queue, Full
+from threading import Event
 from tqdm import tqdm
 from typing import Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
-from Utils import load_config, get_local_database_path, clear_database, get_timestamp, make_folder, save_list_as_txt
+from Utils import load_config, clear_database, get_local_database_path, get_timestamp
+from WorkingStore import WorkingStore
+
+EMOJI_PATTERN = re.compile(
+    "["                     
+    "\U0001F600-\U0001F64F" 
+    "\U0001F300-\U0001F5FF" 
+    "\U0001F680-\U0001F6FF" 
+    "\U0001F1E0-\U0001F1FF" 
+    "\U00002702-\U000027B0" 
+    "\U000024C2-\U0001F251" 
+    "\U0001F900-\U0001F9FF" 
+    "\U0001F018-\U0001F270" 
+    "\U0001F780-\U0001F7F0" 
+    "\U0001F000-\U0001F02F" 
+    "]+", flags=re.UNICODE
+)
+URL_REGEX = r'http[s]?://\S+|www\.\S+'
+URL_PATTERN = re.compile(URL_REGEX)
+HASHTAG_PATTERN = re.compile(r'#\w+')
+AT_PATTERN = re.compile(r'@\w+')
+MULTIPLE_SPACES_PATTERN = re.compile(r'\s+')
+MULTIPLE_TABS_PATTERN = re.compile(r'\t+')
+# URLs, hashtags and mentions in one alternation. Every alternative starts with one of [hw#@], which lets the regex
+# engine skip all other positions quickly. A hashtag or mention stops where a URL starts, which gives the same result
+# as replacing URLs first and removing hashtags and mentions afterwards.
+TOKEN_PATTERN = re.compile(r'[hw#@](?:(?<=h)(ttp[s]?://\S+)|(?<=w)(ww\.\S+)|(?<=[#@])(?:[^\Whw]+|(?!' + URL_REGEX + r')[hw])+)')
+
+
+def _replace_token(match: re.Match) -> str:
+    return "" if match.lastindex is None else "<URL>"
+
 
 class TextCleaner():
     """
     A class to perform various text cleaning operations such as removing emojis, URLs, hashtags, and more.
     Provides methods to concatenate strings and clean text using a series of cleaning functions.
+    The patterns are compiled once at import time. `clean` combines the cleaning functions into two regex passes and a
+    whitespace split, with the same result as applying them one by one. Emojis are removed in a pass of their own
+    before URLs, hashtags and mentions, because removing them can join a token (e.g. "#foo😀bar" is one hashtag).
     """
 
     def __init__(self) -> None:
@@ -42,21 +78,7 @@ class TextCleaner():
         Returns:
         str: The input string without emojis.
         """
-        emoji_pattern = re.compile(
-            "["                     
-            "\U0001F600-\U0001F64F" 
-            "\U0001F300-\U0001F5FF" 
-            "\U0001F680-\U0001F6FF" 
-            "\U0001F1E0-\U0001F1FF" 
-            "\U00002702-\U000027B0" 
-            "\U000024C2-\U0001F251" 
-            "\U0001F900-\U0001F9FF" 
-            "\U0001F018-\U0001F270" 
-            "\U0001F780-\U0001F7F0" 
-            "\U0001F000-\U0001F02F" 
-            "]+", flags=re.UNICODE
-        )
-        return emoji_pattern.sub(r'', input_string).strip()
+        return EMOJI_PATTERN.sub(r'', input_string).strip()
     
     def replace_urls(self, input_string:str):
         """
@@ -68,9 +90,7 @@ class TextCleaner():
         Returns:
         str: The input string with URLs replaced by "<URL>".
         """
-        url_pattern = re.compile(r'http[s]?://\S+|www\.\S+')
-        text_without_urls = url_pattern.sub("<URL>", input_string)
-        return text_without_urls.strip()
+        return URL_PATTERN.sub("<URL>", input_string).strip()
 
     def remove_hashtags(self, input_string:str):
         """
@@ -82,8 +102,7 @@ class TextCleaner():
         Returns:
         str: The input string without hashtags.
         """
-        hashtag_pattern = re.compile(r'#\w+')
-        return hashtag_pattern.sub('', input_string).strip()
+        return HASHTAG_PATTERN.sub('', input_string).strip()
 
     def remove_at(self, input_string:str):
         """
@@ -95,8 +114,7 @@ class TextCleaner():
         Returns:
         str: The input string without mentions.
         """
-        hashtag_pattern = re.compile(r'@\w+')
-        return hashtag_pattern.sub('', input_string).strip()
+        return AT_PATTERN.sub('', input_string).strip()
 
     def remove_multiple_spaces(self, input_string:str):
         """
@@ -108,7 +126,7 @@ class TextCleaner():
         Returns:
         str: The input string with multiple spaces replaced by a single space.
         """
-        return re.sub(r'\s+', ' ', input_string).strip()
+        return MULTIPLE_SPACES_PATTERN.sub(' ', input_string).strip()
 
     def remove_multiple_tabs(self, input_string:str):
         """
@@ -120,7 +138,7 @@ class TextCleaner():
         Returns:
         str: The input string with multiple tabs replaced by a single space.
         """
-        return re.sub(r'\t+', ' ', input_string).strip()
+        return MULTIPLE_TABS_PATTERN.sub(' ', input_string).strip()
     
     def remove_newlines(self, input_string:str):
         """
@@ -148,47 +166,45 @@ class TextCleaner():
         text = self.concatenate_strings(text=text, caption=caption)
         if text is None:
             return text
-        text = self.remove_emojis(input_string=text)
-        text = self.replace_urls(input_string=text)
-        text = self.remove_hashtags(input_string=text)
-        text = self.remove_at(input_string=text)
-        text = self.remove_multiple_spaces(input_string=text)
-        text = self.remove_multiple_tabs(input_string=text)
-        text = self.remove_newlines(input_string=text)
-        return text
+        text = EMOJI_PATTERN.sub('', text)
+        text = TOKEN_PATTERN.sub(_replace_token, text)
+        # str.split() splits on the same Unicode whitespace as \s, which also covers tabs and newlines.
+        return ' '.join(text.split())
     
 class MongoDownloader(TextCleaner):
     """
-    A class to interact with a MongoDB database, download documents, clean text, and save the results as JSON files.
+    A class to interact with a MongoDB database, download documents, clean text, and save the results in a WorkingStore.
     Inherits from the TextCleaner class to use its text cleaning methods.
     """
 
-    def __init__(self) -> None:
-        """Initializes the MongoDownloader class with MongoDB client and configuration settings."""
+    PROJECTION = {"_id": 1, "Channel_Name": 1, "Publishing_datetime": 1, "Link": 1, "Content": {"$slice": -1}}
+
+    def __init__(self, full_scan: bool = False) -> None:
+        """
+        Initializes the MongoDownloader class with MongoDB client and configuration settings.
+
+        Parameters:
+        full_scan (bool): Whether to ignore the per-collection watermarks and scan every collection completely (default is False).
+        """
         super().__init__()
         self.config = load_config()
         self.client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
         self.db = self.client[self.config["mongo_db"]["mongo_db_name"]]
+        self.watermark_collection = self.client[self.config["mongo_db"]["mongo_vector_db_name"]][self.config["mongo_db"]["mongo_watermark_collection_name"]]
         self.collection_names = self.db.list_collection_names()
-        self.json_path_list = list()
-        
-    def save_result_path(self):
-        """
-        Saves the list of JSON file paths to a text file.
-        """
-        result_path = os.path.join(get_local_database_path(), "result_path_list.txt")
-        save_list_as_txt(file_path=result_path, data=self.json_path_list)
-        
-    def create_database_folder(self):
+        self.watermarks = dict() if full_scan else self.load_watermarks()
+        self.max_workers = self.config["download"]["max_workers"]
+        self.posts = list()
+
+    def load_watermarks(self) -> dict:
         """
-        Creates a folder to store the downloaded documents, named with the current timestamp.
+        Loads the watermark of every collection: the largest _id up to which all documents have been annotated and uploaded.
+        Documents are inserted with increasing ObjectIds, so only documents above the watermark can be new.
 
         Returns:
-        str: The path to the created database folder.
+        dict: A dictionary where the keys are collection names and the values are the watermark ObjectIds.
         """
-        database_folder = os.path.join(get_local_database_path(), get_timestamp())
-        make_folder(database_folder)
-        return database_folder
+        return {doc["_id"]: doc["watermark"] for doc in self.watermark_collection.find()}
     
     def get_collection(self, collection_name:str):
         """
@@ -213,57 +229,190 @@ class MongoDownloader(TextCleaner):
         Returns:
         Cursor: A cursor to the documents that do not have the specified key.
         """
+        return self.get_collection(collection_name=collection_name).find(self.build_query(collection_name=collection_name, key_title=key_title), self.PROJECTION)
+    
+    def build_query(self, collection_name:str, key_title:str, last_id=None) -> dict:
+        """
+        Builds the query for documents without a specific key. Only documents above the watermark of the collection
+        (and above `last_id`, if given) are queried, which is answered by the _id index.
+
+        Parameters:
+        collection_name (str): The name of the collection to query.
+        key_title (str): The key to check for existence.
+        last_id (ObjectId or None): The _id of the last document already fetched.
+
+        Returns:
+        dict: The query.
+        """
         query = {key_title: {"$exists": False}}
-        return self.get_collection(collection_name=collection_name).find(query)
+        lower_bound = max(filter(None, [self.watermarks.get(collection_name), last_id]), default=None)
+        if lower_bound is not None:
+            query["_id"] = {"$gt": lower_bound}
+        return query
+    
+    def iter_docs_without_key(self, collection_name:str, key_title:str, batch_size:int):
+        """
+        Iterates over the documents of a MongoDB collection that do not have a specific key, page by page.
+        Pages are fetched with a fresh query ordered by _id, so no cursor is kept open while the consumer is busy.
+
+        Parameters:
+        collection_name (str): The name of the collection to query.
+        key_title (str): The key to check for existence.
+        batch_size (int): The number of documents fetched per page.
+
+        Yields:
+        dict: The documents that do not have the specified key.
+        """
+        collection = self.get_collection(collection_name=collection_name)
+        last_id = None
+        while True:
+            query = self.build_query(collection_name=collection_name, key_title=key_title, last_id=last_id)
+            docs = list(collection.find(query, self.PROJECTION).sort("_id", 1).limit(batch_size))
+            if len(docs) == 0:
+                return
+            yield from docs
+            last_id = docs[-1]["_id"]
     
-    def parse_doc(self, doc:dict, json_path:str):
+    def parse_doc(self, doc:dict, collection_name:str):
         """
         Parses a document and cleans its text content.
 
         Parameters:
         doc (dict): The document to parse.
-        json_path (str): The path where the parsed document will be saved.
+        collection_name (str): The name of the collection the document belongs to.
 
         Returns:
         dict: The parsed and cleaned document.
         """
         return {
             "_id":str(doc["_id"]),
+            "collection": collection_name,
             "channel": doc["Channel_Name"],
             "datetime":doc["Publishing_datetime"].strftime('%Y-%m-%d %H:%M:%S'),
             "link":doc["Link"],
-            "path":json_path,
             "text": self.clean(text=doc["Content"][-1]["Text"], caption=doc["Content"][-1]["Caption"])
         }
     
-    def save_collection(self, database_folder:str, collection_name:str, key_title:str):
+    def download_collection(self, collection_name:str, key_title:str) -> list:
         """
-        Saves documents from a MongoDB collection as JSON files in a specified folder.
+        Downloads and parses the documents of a MongoDB collection.
 
         Parameters:
-        database_folder (str): The folder where the JSON files will be saved.
         collection_name (str): The name of the collection to download.
         key_title (str): The key to filter documents by (documents without this key will be downloaded).
+
+        Returns:
+        list: The parsed documents.
         """
-        collection_folder = os.path.join(database_folder, collection_name)
-        make_folder(collection_folder)
-        for idx, doc in enumerate(self.get_docs_without_key(collection_name=collection_name, key_title=key_title)):
-            json_path = os.path.join(collection_folder, f"{idx}.json")
-            doc = self.parse_doc(doc=doc, json_path=json_path)
-            with open(json_path, 'w', encoding='utf-8') as json_file:
-                json.dump(doc, json_file, ensure_ascii=False, indent=4)
-            self.json_path_list.append(json_path)
+        return [self.parse_doc(doc=doc, collection_name=collection_name) for doc in self.get_docs_without_key(collection_name=collection_name, key_title=key_title)]
 
-    def download(self, key_title:str = "Topic"):
+    def download(self, key_title:str = "Topic") -> WorkingStore:
         """
-        Downloads documents from all MongoDB collections, cleans their text, and saves them as JSON files.
+        Downloads documents from all MongoDB collections, cleans their text, and saves them in a new WorkingStore.
+        Up to `max_workers` collections are downloaded concurrently over the shared client; the parsed documents
+        are collected as the collections complete.
 
         Parameters:
         key_title (str): The key to filter documents by (default is "Topic").
+
+        Returns:
+        WorkingStore: The store holding the downloaded documents.
+        """
+        store = WorkingStore.create()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.download_collection, collection_name=collection_name, key_title=key_title) for collection_name in self.collection_names]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Download unlabeled documents", leave=False):
+                self.posts.extend(future.result())
+        store.write_posts(posts=self.posts)
+        store.ledger.mark(stage="downloaded", post_ids=store.post_ids)
+        clear_database()
+        self.client.close()
+        return store
+
+    def download_chunks(self, chunk_size:int, key_title:str = "Topic"):
+        """
+        Downloads documents from all MongoDB collections in chunks of at most `chunk_size` posts.
+        Each chunk is saved in its own WorkingStore inside a folder named with the current timestamp.
+        Up to `max_workers` collections are paged through concurrently. The parsed documents pass through a queue of
+        at most `chunk_size` entries, so the producers pause while a chunk is being processed. Every collection
+        is still consumed in _id order, which keeps the download watermarks valid.
+
+        Parameters:
+        chunk_size (int): The maximum number of posts per chunk.
+        key_title (str): The key to filter documents by (default is "Topic").
+
+        Yields:
+        WorkingStore: The store holding the downloaded documents of one chunk.
         """
-        database_folder = self.create_database_folder()
-        for idx, collection_name in tqdm(enumerate(self.collection_names), total=len(self.collection_names), desc="Download unlabeled documents", leave=False):
-            self.save_collection(database_folder=database_folder, collection_name=collection_name, key_title=key_title)
+        database_folder = os.path.join(get_local_database_path(), get_timestamp())
+        chunk_idx = 0
+        post_queue, stop_event = Queue(maxsize=chunk_size), Event()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = [executor.submit(self.produce_collection, collection_name=collection_name, key_title=key_title, batch_size=chunk_size, post_queue=post_queue, stop_event=stop_event) for collection_name in self.collection_names]
+        try:
+            finished = 0
+            progress_bar = tqdm(total=len(futures), desc="Download unlabeled documents", leave=False)
+            while finished < len(futures):
+                post = post_queue.get()
+                if isinstance(post, str):
+                    finished += 1
+                    progress_bar.update(1)
+                    continue
+                self.posts.append(post)
+                if len(self.posts) == chunk_size:
+                    yield self.save_chunk(database_folder=database_folder, chunk_idx=chunk_idx)
+                    chunk_idx += 1
+            progress_bar.close()
+            for future in futures:
+                future.result()
+            if len(self.posts) > 0:
+                yield self.save_chunk(database_folder=database_folder, chunk_idx=chunk_idx)
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=True)
         clear_database()
-        self.save_result_path()
         self.client.close()
+
+    def produce_collection(self, collection_name:str, key_title:str, batch_size:int, post_queue:Queue, stop_event:Event) -> None:
+        """
+        Pages through a collection and puts the parsed documents into a queue, followed by the collection name once
+        the collection is exhausted (or has failed; the error is raised by the future).
+
+        Parameters:
+        collection_name (str): The name of the collection to download.
+        key_title (str): The key to filter documents by (documents without this key will be downloaded).
+        batch_size (int): The number of documents fetched per page.
+        post_queue (Queue): The queue shared with the consumer.
+        stop_event (Event): Set by the consumer to make the producers stop early.
+        """
+        def put(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    post_queue.put(item, timeout=1)
+                    return True
+                except Full:
+                    continue
+            return False
+        try:
+            for doc in self.iter_docs_without_key(collection_name=collection_name, key_title=key_title, batch_size=batch_size):
+                if not put(self.parse_doc(doc=doc, collection_name=collection_name)):
+                    return
+        finally:
+            put(collection_name)
+
+    def save_chunk(self, database_folder:str, chunk_idx:int) -> WorkingStore:
+        """
+        Writes the collected posts to the WorkingStore of a chunk and starts a new chunk.
+
+        Parameters:
+        database_folder (str): The folder of the current run.
+        chunk_idx (int): The number of the chunk.
+
+        Returns:
+        WorkingStore: The store holding the posts of the chunk.
+        """
+        store = WorkingStore(folder=os.path.join(database_folder, f"chunk_{chunk_idx:05d}"))
+        store.write_posts(posts=self.posts)
+        store.ledger.mark(stage="downloaded", post_ids=store.post_ids)
+        self.posts = list()
+        return store
@@ -0,0 +1,133 @@
+import argparse
+from tqdm import tqdm
+from pymongo import MongoClient, DeleteMany, ASCENDING
+from pymongo.server_api import ServerApi
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from Utils import load_config, write_in_batches
+
+
+class MongoSetup():
+    """
+    A one-off setup of the indexes the pipeline relies on, run once after deployment (and again after the
+    configuration changed) instead of on every run.
+
+    The vector collection needs a unique index on post_id, so upserting vector data on post_id cannot create
+    duplicates. Earlier versions inserted duplicates on retries, which keep the unique index from being created, so
+    the setup first removes them: the oldest document of every post_id is kept.
+    Claim clusters are looked up by cluster_id in the cluster collection, and by Cluster_ID and Many_Siblings in the
+    channel collections.
+
+    Attributes:
+    ----------
+    config : dict
+        Configuration data loaded from an external source.
+    client : pymongo.MongoClient
+        MongoDB client for interacting with the database.
+    db : pymongo.database.Database
+        The database with one collection per channel.
+    vector_db : pymongo.collection.Collection
+        The collection within the MongoDB database where vector data is stored.
+    cluster_collection : pymongo.collection.Collection
+        The collection holding the cluster membership of each post.
+    batch_size : int
+        The maximum number of operations per bulk write.
+    """
+
+    POST_ID_INDEX = [("post_id", ASCENDING)]
+
+    def __init__(self) -> None:
+        """
+        Initializes the MongoSetup with configuration data and connects to MongoDB.
+        """
+        self.config = load_config()
+        self.batch_size = self.config["upload"]["batch_size"]
+        self.client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
+        self.db = self.client[self.config["mongo_db"]["mongo_db_name"]]
+        self.vector_db = self.client[self.config["mongo_db"]["mongo_vector_db_name"]][self.config["mongo_db"]["mongo_vector_db_name"]]
+        self.cluster_collection = self.vector_db.database[self.config["mongo_db"]["mongo_cluster_collection_name"]]
+
+    def find_duplicates(self) -> list:
+        """
+        Returns the _ids of the documents of the vector collection that duplicate the post_id of an older document.
+        """
+        duplicates = list()
+        pipeline = [
+            {"$group": {"_id": "$post_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}},
+        ]
+        for group in tqdm(self.vector_db.aggregate(pipeline, allowDiskUse=True), desc="Find duplicate vectors", leave=False):
+            duplicates.extend(sorted(group["ids"])[1:])
+        return duplicates
+
+    def deduplicate_vectors(self, dry_run: bool = False) -> int:
+        """
+        Deletes the duplicates of post_ids in the vector collection.
+
+        Parameters:
+        ----------
+        dry_run : bool, optional
+            Whether to only count the duplicates (default is False).
+
+        Returns:
+        -------
+        int
+            The number of duplicates.
+        """
+        duplicates = self.find_duplicates()
+        if not dry_run:
+            requests = [DeleteMany({"_id": {"$in": duplicates[start:start + self.batch_size]}}) for start in range(0, len(duplicates), self.batch_size)]
+            write_in_batches(collection=self.vector_db, requests=requests, batch_size=self.batch_size)
+        return len(duplicates)
+
+    def has_post_id_index(self) -> bool:
+        """
+        Returns whether the vector collection has the unique index on post_id.
+        """
+        try:
+            indexes = self.vector_db.index_information().values()
+        except OperationFailure: # The collection does not exist yet.
+            return False
+        return any(index["key"] == self.POST_ID_INDEX and index.get("unique", False) for index in indexes)
+
+    def create_indexes(self) -> None:
+        """
+        Creates the indexes of the pipeline. Channel collections added later get their cluster indexes by running
+        the setup again.
+
+        Raises:
+        ------
+        RuntimeError
+            If the vector collection still holds duplicate post_ids.
+        """
+        try:
+            self.vector_db.create_index(self.POST_ID_INDEX, unique=True)
+        except DuplicateKeyError as error:
+            raise RuntimeError("The vector collection holds duplicate post_ids. Remove them with `python MongoSetup.py --deduplicate 1` first.") from error
+        self.cluster_collection.create_index([("cluster_id", ASCENDING)])
+        for collection_name in tqdm(self.db.list_collection_names(), desc="Create cluster indexes", leave=False):
+            self.db[collection_name].create_index([("Cluster_ID", ASCENDING)])
+            self.db[collection_name].create_index([(self.config["key_titles"]["many-siblings"], ASCENDING)])
+
+    def require(self) -> None:
+        """
+        Checks that the setup has been run.
+
+        Raises:
+        ------
+        RuntimeError
+            If the unique index on post_id of the vector collection is missing.
+        """
+        if not self.has_post_id_index():
+            raise RuntimeError("The vector collection has no unique index on post_id, so uploads could duplicate vectors. Run `python MongoSetup.py --deduplicate 1` once first.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the MongoDB indexes of the pipeline, after removing duplicate vectors left by earlier versions.")
+    parser.add_argument('--deduplicate', type=int, default=0, help='1 to delete duplicate post_ids in the vector collection (the oldest document is kept) before creating the indexes. Default is 0.')
+    parser.add_argument('--dry_run', type=int, default=0, help='1 to only count the duplicate post_ids. Default is 0.')
+    args = parser.parse_args()
+    setup = MongoSetup()
+    if args.deduplicate or args.dry_run:
+        count = setup.deduplicate_vectors(dry_run=bool(args.dry_run))
+        print(f"{count} duplicate vectors {'found' if args.dry_run else 'deleted'}.")
+    if not args.dry_run:
+        setup.create_indexes()
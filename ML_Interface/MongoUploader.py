@@ -1,15 +1,18 @@
-import os
-import json
-from glob import glob
 from tqdm import tqdm
-from pymongo import MongoClient
+from datetime import datetime, timedelta, timezone
+from typing import Union
+from pymongo import MongoClient, UpdateOne
 from pymongo.server_api import ServerApi
+from pymongo.write_concern import WriteConcern
 from bson.objectid import ObjectId
-from Utils import load_config, get_most_recent_subfolders
+from Utils import load_config, encode_vector, write_in_batches
+from WorkingStore import WorkingStore
+from LocalVectorIndex import LocalVectorIndex
 
 class MongoUploader():
     """
     A class to handle the uploading of annotated data to a MongoDB database.
+    Collections are recorded as the stage `STAGE` in the ledger of the working store once uploaded, and skipped by a resumed run.
     
     Attributes:
     ----------
@@ -19,39 +22,68 @@ class MongoUploader():
         MongoDB client for interacting with the database.
     db : pymongo.database.Database
         The specific database within MongoDB to store the documents.
+    write_concern : pymongo.write_concern.WriteConcern
+        The write concern of all uploads.
+    batch_size : int
+        The maximum number of operations per bulk write.
     vector_db : pymongo.collection.Collection
-        The collection within the MongoDB database where vector data is stored.
-    folder_dct : dict
-        A dictionary of the most recent subfolders, presumably containing the data to upload.
+        The collection within the MongoDB database where vector data is stored, with a unique index on post_id.
+    vector_dtype : str
+        The encoding of stored embeddings ("float32" or "int8" BSON binary vectors, or "array").
+    watermark_collection : pymongo.collection.Collection
+        The collection holding the download watermark of every channel collection.
+    local_index : LocalVectorIndex or None
+        The local vector index that is kept up to date with the vector collection, if it is the configured backend.
+    store : WorkingStore
+        The working store holding the data to upload.
     """
+
+    STAGE = "uploaded"
     
-    def __init__(self) -> None:
+    def __init__(self, store: Union[WorkingStore, None] = None, local_index: Union[LocalVectorIndex, None] = None) -> None:
         """
         Initializes the MongoUploader with configuration data and connects to MongoDB.
+        With the local backend, the given local index is updated (one index shared by all uploads of a run), or the
+        built index is loaded. Uploading fails if the local index has not been built.
+        The unique index on post_id is created once by `MongoSetup.py`.
         """
         self.config = load_config()
+        self.write_concern = WriteConcern(**self.config["upload"]["write_concern"])
+        self.batch_size = self.config["upload"]["batch_size"]
         self.client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
-        self.db = self.client[self.config["mongo_db"]["mongo_db_name"]]
-        self.vector_db = self.client[self.config["mongo_db"]["mongo_vector_db_name"]][self.config["mongo_db"]["mongo_vector_db_name"]]
-        self.folder_dct = get_most_recent_subfolders()
+        self.db = self.client.get_database(self.config["mongo_db"]["mongo_db_name"], write_concern=self.write_concern)
+        self.vector_db = self.client.get_database(self.config["mongo_db"]["mongo_vector_db_name"], write_concern=self.write_concern)[self.config["mongo_db"]["mongo_vector_db_name"]]
+        self.vector_dtype = self.config["mongo_db"].get("vector_dtype", "float32")
+        self.watermark_collection = self.vector_db.database[self.config["mongo_db"]["mongo_watermark_collection_name"]]
+        self.local_index = None
+        if self.config["claim_matching_paramters"].get("backend") == "local":
+            self.local_index = LocalVectorIndex(must_exist=True) if local_index is None else local_index
+        self.store = WorkingStore.most_recent() if store is None else store
     
-    def insert_vector_data(self, tagged_doc: dict) -> None:
+    def vector_parser(self, tagged_doc: dict, embedding) -> dict:
         """
-        Inserts vector data derived from a tagged document into the vector database.
+        Parses the tagged document to the vector data stored in the vector database.
         
         Parameters:
         ----------
         tagged_doc : dict
-            The dictionary representing the tagged document from which vector data will be extracted and inserted.
+            The dictionary representing the tagged document from which vector data will be extracted.
+        embedding : np.ndarray or None
+            The document embedding of the tagged document.
+        
+        Returns:
+        -------
+        dict
+            The vector data of the tagged document.
         """
         vector_data =  {
             "post_id": tagged_doc.get("_id"),
             "Channel_Name": tagged_doc.get("channel"),
             "Publishing_datetime": tagged_doc.get("datetime"),
             "Link": tagged_doc.get("link"),
-            "text_embedding": tagged_doc.get("document-embedding")
+            "text_embedding": None if embedding is None else encode_vector(embedding=embedding, dtype=self.vector_dtype)
         }
-        self.vector_db.insert_one(vector_data)
+        return vector_data
         
     def tag_parser(self, tagged_doc: dict) -> tuple:
         """
@@ -80,50 +112,93 @@ class MongoUploader():
         }
         return _id, new_data
     
-    def tag_loader(self, collection_name: str, collection_path: str):
+    def group_by_collection(self) -> dict:
+        """
+        Groups the rows of the working store by the MongoDB collection they were downloaded from.
+        
+        Returns:
+        -------
+        dict
+            A dictionary where the keys are collection names and the values are lists of (row number, tagged document) tuples.
+        """
+        collection_dct = dict()
+        for idx, tagged_doc in self.store.iter_posts():
+            collection_dct.setdefault(tagged_doc["collection"], list()).append((idx, tagged_doc))
+        return collection_dct
+    
+    def tag_loader(self, collection_name: str, tagged_rows: list):
         """
-        Loads JSON files from the specified collection path, parses each tagged document, and yields the necessary data.
+        Parses each tagged document of a collection and yields the necessary data.
         
         Parameters:
         ----------
         collection_name : str
             The name of the MongoDB collection where the data will be uploaded.
-        collection_path : str
-            The path to the directory containing the JSON files to be loaded.
+        tagged_rows : list
+            A list of (row number, tagged document) tuples from the working store.
         
         Yields:
         ------
         tuple
-            A tuple containing the document ID and the new data to update in the MongoDB collection.
+            A tuple containing the document ID, the new data to update in the MongoDB collection and the vector data.
         """
-        path_list = glob(os.path.join(collection_path, "*.json"))
-        for path in tqdm(path_list, total=len(path_list), desc=collection_name, leave=False):
-            with open(path, "r") as f:
-                tagged_doc = json.load(f)
+        embeddings = self.store.load_embeddings(task="document-embedding")
+        for idx, tagged_doc in tqdm(tagged_rows, total=len(tagged_rows), desc=collection_name, leave=False):
             _id, new_data = self.tag_parser(tagged_doc=tagged_doc)
-            self.insert_vector_data(tagged_doc=tagged_doc)
-            yield _id, new_data
+            vector_data = self.vector_parser(tagged_doc=tagged_doc, embedding=self.store.get_embedding(embeddings=embeddings, idx=idx))
+            yield _id, new_data, vector_data
     
-    def upload_collection(self, collection_name: str, collection_path: str) -> None:
+    def upload_collection(self, collection_name: str, tagged_rows: list) -> None:
         """
-        Updates a MongoDB collection with data parsed from JSON files in the specified directory.
+        Updates a MongoDB collection with data parsed from the working store and upserts the vector data of its posts
+        on post_id, both with unordered bulk writes, so a rerun overwrites instead of duplicating vector data.
         
         Parameters:
         ----------
         collection_name : str
             The name of the MongoDB collection to update.
-        collection_path : str
-            The path to the directory containing the JSON files to be uploaded.
+        tagged_rows : list
+            A list of (row number, tagged document) tuples from the working store.
         """
-        collection = self.db[collection_name]
-        for _id, new_data in self.tag_loader(collection_name=collection_name, collection_path=collection_path):
-            query = {"_id": ObjectId(_id)}
-            collection.update_one(query, new_data)
+        requests, vector_requests, vector_docs = list(), list(), list()
+        for _id, new_data, vector_data in self.tag_loader(collection_name=collection_name, tagged_rows=tagged_rows):
+            requests.append(UpdateOne({"_id": ObjectId(_id)}, new_data))
+            vector_requests.append(UpdateOne({"post_id": vector_data["post_id"]}, {"$set": vector_data}, upsert=True))
+            vector_docs.append(vector_data)
+        write_in_batches(collection=self.db[collection_name], requests=requests, batch_size=self.batch_size)
+        write_in_batches(collection=self.vector_db, requests=vector_requests, batch_size=self.batch_size)
+        if self.local_index is not None:
+            vector_ids = {doc["post_id"]: doc["_id"] for doc in self.vector_db.find({"post_id": {"$in": [vector_data["post_id"] for vector_data in vector_docs]}}, {"_id": 1, "post_id": 1})}
+            for vector_data in vector_docs:
+                vector_data["_id"] = vector_ids.get(vector_data["post_id"])
+            self.local_index.add(vector_docs=vector_docs)
+        self.store.ledger.mark(stage=self.STAGE, post_ids=[tagged_doc["_id"] for idx, tagged_doc in tagged_rows])
     
     def upload(self) -> None:
         """
-        Iterates through all collections and uploads the corresponding data from the most recent subfolders.
+        Iterates through all collections and uploads the corresponding data from the working store.
+        Posts that were already uploaded by an interrupted run are skipped.
         """
-        for collection_name, collection_path in tqdm(self.folder_dct.items(), total=len(self.folder_dct), desc="Upload annotations", leave=False):
-            self.upload_collection(collection_name=collection_name, collection_path=collection_path)
-
+        collection_dct = self.group_by_collection()
+        for collection_name, tagged_rows in tqdm(collection_dct.items(), total=len(collection_dct), desc="Upload annotations", leave=False):
+            pending = set(self.store.ledger.pending(stage=self.STAGE, post_ids=[tagged_doc["_id"] for idx, tagged_doc in tagged_rows]))
+            if pending:
+                self.upload_collection(collection_name=collection_name, tagged_rows=[(idx, tagged_doc) for idx, tagged_doc in tagged_rows if tagged_doc["_id"] in pending])
+        if self.local_index is not None:
+            self.local_index.save()
+        self.update_watermarks(collection_dct=collection_dct)
+    
+    def update_watermarks(self, collection_dct: dict) -> None:
+        """
+        Raises the download watermark of every uploaded collection to the largest uploaded _id. The watermark stays
+        an hour behind the current time, so posts inserted concurrently with an older ObjectId are not skipped.
+        
+        Parameters:
+        ----------
+        collection_dct : dict
+            A dictionary where the keys are collection names and the values are lists of (row number, tagged document) tuples.
+        """
+        latest_watermark = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(hours=1))
+        for collection_name, tagged_rows in collection_dct.items():
+            watermark = min(latest_watermark, max(ObjectId(tagged_doc["_id"]) for idx, tagged_doc in tagged_rows))
+            self.watermark_collection.update_one({"_id": collection_name}, {"$max": {"watermark": watermark}}, upsert=True)
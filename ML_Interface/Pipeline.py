@@ -0,0 +1,208 @@
+import time
+from queue import Queue, Empty, Full
+from threading import Thread, Event, Lock
+from typing import Callable, Iterable, List
+from tqdm import tqdm
+from WorkingStore import WorkingStore
+
+STOP = None # Put into a queue after the last store.
+
+
+class Stage():
+    """
+    A stage of the pipeline: `workers` threads take stores from the input queue, process them and pass them on
+    through a bounded output queue, so a stage blocks (backpressure) while the next stage is busy.
+
+    Attributes:
+    ----------
+    name : str
+        The name of the stage, used in the throughput report.
+    function : Callable
+        Processes one store.
+    workers : int
+        The number of worker threads of the stage.
+    output : Queue
+        The bounded queue to the next stage.
+    stores : int
+        The number of stores processed.
+    posts : int
+        The number of posts processed.
+    busy : float
+        The time in seconds the workers of the stage spent processing stores (summed over workers).
+    """
+
+    def __init__(self, name: str, function: Callable[[WorkingStore], None], workers: int = 1, queue_size: int = 2) -> None:
+        """
+        Initializes the Stage.
+
+        Parameters:
+        ----------
+        name : str
+            The name of the stage.
+        function : Callable
+            Processes one store.
+        workers : int, optional
+            The number of worker threads (default is 1).
+        queue_size : int, optional
+            The maximum number of processed stores waiting for the next stage (default is 2).
+        """
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.output = Queue(maxsize=queue_size)
+        self.stores = 0
+        self.posts = 0
+        self.busy = 0.0
+        self.lock = Lock()
+        self.running = workers
+
+    def record(self, store: WorkingStore, seconds: float) -> None:
+        with self.lock:
+            self.stores += 1
+            self.posts += len(store)
+            self.busy += seconds
+
+    def report(self, wall_time: float) -> str:
+        """
+        Returns the throughput of the stage: posts per second of processing time and the share of the wall time
+        the stage was busy (per worker).
+        """
+        posts_per_second = self.posts / self.busy if self.busy > 0 else 0.0
+        utilization = self.busy / (self.workers * wall_time) if wall_time > 0 else 0.0
+        return f"{self.name}: {self.stores} chunks, {self.posts} posts, {posts_per_second:.1f} posts/s, busy {100 * utilization:.0f}%"
+
+
+class Pipeline():
+    """
+    A pipeline executor that runs the stages of a run concurrently on a stream of WorkingStores.
+
+    The source (e.g. the chunked download) runs in its own thread, every stage runs in its own worker threads, and
+    consecutive stages are connected by bounded queues. Network-bound stages (download, upload, Atlas queries) wait on
+    I/O, and inference releases the GIL in the model kernels, so the wall time approaches that of the slowest stage.
+    The first error of any stage stops the pipeline and is raised by `run`.
+
+    Attributes:
+    ----------
+    stages : List[Stage]
+        The stages in processing order.
+    source : Stage
+        The stage feeding the stores of the source into the pipeline.
+    stop_event : threading.Event
+        Set when a stage has failed.
+    errors : list
+        The errors raised by the stages.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 2) -> None:
+        """
+        Initializes the Pipeline.
+
+        Parameters:
+        ----------
+        stages : List[Stage]
+            The stages in processing order.
+        queue_size : int, optional
+            The maximum number of downloaded stores waiting for the first stage (default is 2).
+        """
+        self.stages = stages
+        self.source = Stage(name="download", function=None, queue_size=queue_size)
+        self.stop_event = Event()
+        self.errors = list()
+
+    def put(self, queue: Queue, item) -> bool:
+        while not self.stop_event.is_set():
+            try:
+                queue.put(item, timeout=1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def get(self, queue: Queue):
+        while not self.stop_event.is_set():
+            try:
+                return queue.get(timeout=1)
+            except Empty:
+                continue
+        return STOP
+
+    def fail(self, error: Exception) -> None:
+        self.errors.append(error)
+        self.stop_event.set()
+
+    def feed(self, stores: Iterable[WorkingStore]) -> None:
+        """
+        Puts the stores of the source into the queue of the first stage.
+        """
+        iterator = iter(stores)
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                store = next(iterator, STOP)
+                if store is STOP:
+                    break
+                self.source.record(store=store, seconds=time.perf_counter() - start)
+                if not self.put(self.source.output, store):
+                    break
+        except Exception as error:
+            self.fail(error=error)
+        finally:
+            if hasattr(iterator, "close"):
+                iterator.close() # Stops the download threads of a generator source.
+            self.put(self.source.output, STOP)
+
+    def work(self, stage: Stage, inputs: Queue) -> None:
+        """
+        Processes stores of the input queue until the end of the stream. The last worker of a stage to finish
+        passes the end of the stream on to the next stage.
+        """
+        try:
+            while not self.stop_event.is_set():
+                store = self.get(inputs)
+                if store is STOP:
+                    self.put(inputs, STOP) # Lets the other workers of the stage finish, too.
+                    break
+                start = time.perf_counter()
+                stage.function(store)
+                stage.record(store=store, seconds=time.perf_counter() - start)
+                if not self.put(stage.output, store):
+                    break
+        except Exception as error:
+            self.fail(error=error)
+        finally:
+            with stage.lock:
+                stage.running -= 1
+                last = stage.running == 0
+            if last:
+                self.put(stage.output, STOP)
+
+    def drain(self, queue: Queue) -> None:
+        while self.get(queue) is not STOP:
+            continue
+
+    def run(self, stores: Iterable[WorkingStore]) -> None:
+        """
+        Runs all stages on the stores of a source and reports the throughput of every stage.
+
+        Parameters:
+        ----------
+        stores : Iterable[WorkingStore]
+            The source of the pipeline, e.g. the chunks of `MongoDownloader.download_chunks`.
+        """
+        start = time.perf_counter()
+        threads = [Thread(target=self.feed, args=(stores,), name="download", daemon=True)]
+        inputs = self.source.output
+        for stage in self.stages:
+            threads.extend(Thread(target=self.work, args=(stage, inputs), name=f"{stage.name}-{idx}", daemon=True) for idx in range(stage.workers))
+            inputs = stage.output
+        for thread in threads:
+            thread.start()
+        self.drain(inputs)
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+        for stage in [self.source] + self.stages:
+            tqdm.write(stage.report(wall_time=wall_time))
+        tqdm.write(f"pipeline: {wall_time:.1f}s wall time")
+        if self.errors:
+            raise self.errors[0]
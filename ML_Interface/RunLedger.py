@@ -0,0 +1,89 @@
+import os
+import json
+from typing import Iterable, List
+
+
+class RunLedger():
+    """
+    A ledger recording which stages of a run are done for which posts.
+
+    The ledger is an append-only JSON lines file in the folder of a WorkingStore. Every line records one stage
+    (e.g. "downloaded", "topic-classification", "document-embedding", "uploaded") for a list of post_ids, and is
+    appended only after the results of the stage have been saved. A resumed run skips the posts a stage is done
+    for. A truncated last line, left by a crash while writing, is ignored.
+
+    Attributes:
+    ----------
+    path : str
+        The path to the ledger file.
+    stages : dict
+        A mapping from stage to the set of post_ids the stage is done for.
+    """
+
+    LEDGER_FILE = "ledger.jsonl"
+    COMPLETED = "completed"
+
+    def __init__(self, folder: str) -> None:
+        """
+        Initializes the RunLedger and loads the ledger file of a folder, if it exists.
+
+        Parameters:
+        ----------
+        folder : str
+            The folder of the WorkingStore.
+        """
+        self.path = os.path.join(folder, self.LEDGER_FILE)
+        self.stages = dict()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.stages.setdefault(entry["stage"], set()).update(entry["post_ids"])
+
+    def mark(self, stage: str, post_ids: Iterable[str]) -> None:
+        """
+        Records a stage as done for posts.
+
+        Parameters:
+        ----------
+        stage : str
+            The name of the stage.
+        post_ids : Iterable[str]
+            The post_ids the stage is done for.
+        """
+        post_ids = [str(post_id) for post_id in post_ids]
+        if len(post_ids) == 0:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"stage": stage, "post_ids": post_ids}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.stages.setdefault(stage, set()).update(post_ids)
+
+    def pending(self, stage: str, post_ids: Iterable[str]) -> List[str]:
+        """
+        Returns the posts a stage is not done for yet.
+
+        Parameters:
+        ----------
+        stage : str
+            The name of the stage.
+        post_ids : Iterable[str]
+            The post_ids to check.
+
+        Returns:
+        -------
+        List[str]
+            The post_ids the stage is not done for, in the given order.
+        """
+        done = self.stages.get(stage, set())
+        return [post_id for post_id in post_ids if post_id not in done]
+
+    def is_done(self, stage: str, post_ids: Iterable[str]) -> bool:
+        """
+        Returns whether a stage is done for all given posts.
+        """
+        return len(self.pending(stage=stage, post_ids=post_ids)) == 0
@@ -1,9 +1,12 @@
 import os
 import json
 import shutil
+import numpy as np
 from glob import glob
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+from bson.binary import Binary, BinaryVectorDtype
 
 def get_timestamp() -> str:
     """
@@ -27,9 +30,11 @@ def make_path(extension: str) -> str:
     project_path = Path(Path(__file__).resolve().parent)
     return str(project_path / extension)
 
+@lru_cache(maxsize=None)
 def load_config() -> dict:
     """
     Loads the configuration settings from a JSON file.
+    The file is read once per process; the returned dictionary is shared and must not be modified.
 
     Returns:
     dict: The dictionary containing configuration settings from the 'config.json' file.
@@ -126,33 +131,59 @@ def read_txt_as_list_of_strings(file_path: str) -> list:
     
     return lines
 
-def add_key_to_json(file_path: str, new_key: str, new_value) -> None:
+def encode_vector(embedding, dtype: str = "float32"):
     """
-    Reads a JSON file, adds a new key-value pair, and writes the modified JSON back to the file.
+    Encodes an embedding for storage in and vector search against MongoDB.
 
     Parameters:
-    file_path (str): The path to the JSON file.
-    new_key (str): The key to add to the JSON object.
-    new_value: The value associated with the new key.
+    embedding (array-like): The embedding vector.
+    dtype (str): "float32" for a BSON float32 binary vector, "int8" for a scalar quantized BSON int8 binary vector
+    (the vector is scaled so that its largest absolute value is 127, which keeps its direction and so its cosine
+    similarities), or "array" for a plain BSON array of doubles.
+
+    Returns:
+    Binary or list: The encoded embedding.
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        data = json.load(file)
-    
-    data[new_key] = new_value
-    
-    with open(file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+    embedding = np.asarray(embedding, dtype=np.float32)
+    if dtype == "float32":
+        return Binary.from_vector(embedding, BinaryVectorDtype.FLOAT32)
+    elif dtype == "int8":
+        scale = np.max(np.abs(embedding), initial=0)
+        if scale > 0:
+            embedding = embedding * (127 / scale)
+        quantized = np.clip(np.rint(embedding), -127, 127).astype(np.int8)
+        return Binary.from_vector(quantized, BinaryVectorDtype.INT8)
+    elif dtype == "array":
+        return embedding.tolist()
+    raise ValueError(f"Unknown vector dtype '{dtype}'. Use 'float32', 'int8' or 'array'.")
 
-def get_most_recent_subfolders() -> dict:
+def decode_vector(vector) -> np.ndarray:
     """
-    Finds the most recent subfolders in the local database folder and returns a dictionary of subfolder names and their absolute paths.
+    Decodes an embedding stored in MongoDB into a float32 numpy array.
+
+    Parameters:
+    vector (Binary or list): A BSON float32 or int8 binary vector, or a plain BSON array.
 
     Returns:
-    dict: A dictionary where the keys are subfolder names and the values are their absolute paths.
+    np.ndarray: The embedding as float32 array (int8 vectors keep their quantized scale).
     """
-    folder_path = get_local_database_path()
-    subfolders = [f for f in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
-    subfolders.sort(reverse=True)
-    folder_path = os.path.join(folder_path, subfolders[0])
-    subfolders = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
-    return {path.split("/")[-1]: path for path in subfolders}
+    if isinstance(vector, Binary):
+        dtype = vector[0]
+        if dtype == BinaryVectorDtype.FLOAT32.value[0]:
+            return np.frombuffer(vector, dtype="<f4", offset=2).astype(np.float32)
+        elif dtype == BinaryVectorDtype.INT8.value[0]:
+            return np.frombuffer(vector, dtype=np.int8, offset=2).astype(np.float32)
+        return np.asarray(vector.as_vector().data, dtype=np.float32)
+    return np.asarray(vector, dtype=np.float32)
+
+def write_in_batches(collection, requests: list, batch_size: int) -> None:
+    """
+    Sends write operations to a MongoDB collection as unordered bulk writes of at most `batch_size` operations.
+
+    Parameters:
+    collection (pymongo.collection.Collection): The collection to write to.
+    requests (list): A list of write operations, e.g. UpdateOne.
+    batch_size (int): The maximum number of operations per bulk write.
+    """
+    for start in range(0, len(requests), batch_size):
+        collection.bulk_write(requests[start:start + batch_size], ordered=False)
@@ -0,0 +1,122 @@
+import numpy as np
+from typing import Union
+
+MODES = ["int8", "binary"]
+
+
+class VectorQuantizer():
+    """
+    A compressed representation of embeddings for a first search pass, whose candidates are reranked exactly.
+
+    Embeddings are optionally truncated to their first `dimensions` dimensions and renormalized (Matryoshka-style;
+    only meaningful for models trained for it) and then quantized:
+    - "int8": every dimension is scaled by its largest absolute value (fitted on the first encoded embeddings) to
+      [-127, 127]. 1 byte per dimension, 4x smaller than float32.
+    - "binary": only the sign of every dimension is kept, packed into bits. 1 bit per dimension, 32x smaller.
+    Queries are not quantized, so the approximate scores are asymmetric dot products against the codes.
+
+    Attributes:
+    ----------
+    mode : str
+        "int8" or "binary".
+    dimensions : int or None
+        The number of leading dimensions kept, or None to keep all.
+    scale : np.ndarray or None
+        The per-dimension scale of int8 codes, None until fitted.
+    """
+
+    def __init__(self, mode: str, dimensions: Union[int, None] = None) -> None:
+        """
+        Initializes the VectorQuantizer.
+
+        Parameters:
+        ----------
+        mode : str
+            "int8" or "binary".
+        dimensions : int, optional
+            The number of leading dimensions kept (default is None, all dimensions).
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}'. Use one of {MODES}.")
+        self.mode = mode
+        self.dimensions = dimensions
+        self.scale = None
+
+    @classmethod
+    def from_config(cls, parameters: Union[dict, None]) -> Union["VectorQuantizer", None]:
+        """
+        Creates the VectorQuantizer configured in `claim_matching_paramters.quantization`, or None if quantization is off.
+        """
+        if not parameters or not parameters.get("mode"):
+            return None
+        return cls(mode=parameters["mode"], dimensions=parameters.get("dimensions"))
+
+    def bytes_per_vector(self, dimensions: int) -> float:
+        """
+        Returns the size of the code of one embedding with `dimensions` dimensions.
+        """
+        dimensions = min(dimensions, self.dimensions or dimensions)
+        return dimensions if self.mode == "int8" else int(np.ceil(dimensions / 8))
+
+    def truncate(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Keeps the first `dimensions` dimensions of a matrix of embeddings and L2-normalizes the rows.
+
+        Parameters:
+        ----------
+        embeddings : np.ndarray
+            A matrix of embeddings.
+
+        Returns:
+        -------
+        np.ndarray
+            The truncated, normalized float32 matrix.
+        """
+        embeddings = np.asarray(embeddings[:, :self.dimensions], dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Encodes a matrix of embeddings. The int8 scale is fitted on the first call.
+
+        Parameters:
+        ----------
+        embeddings : np.ndarray
+            A matrix of embeddings.
+
+        Returns:
+        -------
+        np.ndarray
+            An int8 matrix with one byte per dimension, or a uint8 matrix with one bit per dimension.
+        """
+        embeddings = self.truncate(embeddings)
+        if self.mode == "binary":
+            return np.packbits(embeddings > 0, axis=1)
+        if self.scale is None:
+            self.scale = np.abs(embeddings).max(axis=0) if len(embeddings) > 0 else np.ones(embeddings.shape[1], dtype=np.float32)
+            self.scale[self.scale == 0] = 1
+        return np.clip(np.rint(embeddings / self.scale * 127), -127, 127).astype(np.int8)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """
+        Computes approximate similarities between queries and codes, only meant for ranking candidates.
+
+        Parameters:
+        ----------
+        queries : np.ndarray
+            A matrix of query embeddings.
+        codes : np.ndarray
+            A matrix of codes returned by `encode`.
+
+        Returns:
+        -------
+        np.ndarray
+            A float32 matrix with one row per query and one column per code.
+        """
+        queries = self.truncate(queries)
+        if self.mode == "binary":
+            signs = np.unpackbits(codes, axis=1, count=queries.shape[1]).astype(np.float32) * 2 - 1
+            return queries @ signs.T
+        return (queries * (self.scale / 127)) @ codes.astype(np.float32).T
@@ -0,0 +1,316 @@
+import tempfile
+import numpy as np
+from tqdm import tqdm
+from typing import List
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+from pymongo.server_api import ServerApi
+from Utils import load_config, decode_vector
+from WorkingStore import WorkingStore
+from VectorQuantizer import VectorQuantizer
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+QUERY_BLOCK_SIZE = 256 # Bounds the score matrix held in memory to QUERY_BLOCK_SIZE x window size.
+
+
+class WindowMatcher():
+    """
+    A class to match claims exactly against an in-memory sliding window of recent document embeddings.
+
+    The document embeddings of the last `window_days` days are kept as one contiguous, L2-normalized matrix.
+    Siblings of a new batch are computed with blocked matrix multiplication against the window and against
+    the batch itself, so matches do not depend on MongoDB having indexed the new vectors.
+
+    With quantization, the first pass runs over compressed codes of the window held in memory, and the best
+    `rerank_candidates` candidates of every query are reranked with exact similarities. The exact window matrix is
+    then kept in a memory-mapped temporary file, of which only the candidate rows are read.
+
+    Attributes:
+    ----------
+    config : dict
+        Configuration data loaded from an external source.
+    limit : int
+        Maximum number of siblings per post.
+    cosine_cutoff : float
+        Cosine similarity cutoff value.
+    sort_by_date : bool
+        Whether to sort the results by their publishing date.
+    window_days : int
+        The number of days of document embeddings kept in memory.
+    dtype : np.dtype
+        The dtype of the window matrix (float32 or float16).
+    block_size : int
+        The number of window rows per block in the blocked matrix multiplication.
+    matrix : np.ndarray
+        The window matrix. Only the first `size` rows are in use.
+    size : int
+        The number of embeddings in the window.
+    metadata : dict
+        The post_id, Link, Channel_Name and Publishing_datetime of each row of the window.
+    quantizer : VectorQuantizer or None
+        The quantizer of the first search pass, or None to search the exact window matrix.
+    rerank_candidates : int
+        The number of candidates per query reranked exactly, if quantization is on.
+    codes : np.ndarray
+        The codes of the window rows, if quantization is on. Only the first `size` rows are in use.
+    """
+
+    def __init__(self, load_window: bool = True) -> None:
+        """
+        Initializes the WindowMatcher with configuration data and fills the window from the vector collection.
+
+        Parameters:
+        ----------
+        load_window : bool, optional
+            Whether to load the recent document embeddings from MongoDB (default is True).
+        """
+        self.config = load_config()
+        parameters = self.config["claim_matching_paramters"]
+        self.limit = parameters["limit"]
+        self.cosine_cutoff = parameters["cosine_cutoff"]
+        self.sort_by_date = parameters["sort_by_date"]
+        self.window_days = parameters.get("window_days", 14)
+        self.dtype = np.dtype(parameters.get("window_dtype", "float32"))
+        self.block_size = parameters.get("block_size", 8192)
+        self.quantizer = VectorQuantizer.from_config(parameters.get("quantization"))
+        self.rerank_candidates = parameters.get("quantization", {}).get("rerank_candidates", parameters["numCandidates"])
+        self.matrix = np.zeros((0, 0), dtype=self.dtype)
+        self.codes = None
+        self.size = 0
+        self.metadata = {key: np.empty(0, dtype=object) for key in ["post_id", "Link", "Channel_Name", "Publishing_datetime"]}
+        if load_window:
+            self.load_window()
+
+    def get_window_start(self) -> str:
+        """
+        Returns the oldest publishing datetime kept in the window.
+
+        Returns:
+        -------
+        str
+            The datetime as string in the format used by the vector collection.
+        """
+        return (datetime.now() - timedelta(days=self.window_days)).strftime(DATETIME_FORMAT)
+
+    def normalize(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        L2-normalizes the rows of a matrix, so that the dot product equals the cosine similarity.
+
+        Parameters:
+        ----------
+        embeddings : np.ndarray
+            A matrix of embeddings.
+
+        Returns:
+        -------
+        np.ndarray
+            The normalized float32 matrix.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+    def load_window(self) -> None:
+        """
+        Loads the document embeddings of the last `window_days` days from the vector collection.
+        """
+        client = MongoClient(self.config["mongo_db"]["remote_mongo_dp_uri"], server_api=ServerApi('1'))
+        collection = client[self.config["mongo_db"]["mongo_vector_db_name"]][self.config["mongo_db"]["mongo_vector_db_name"]]
+        query = {"Publishing_datetime": {"$gte": self.get_window_start()}, "text_embedding": {"$ne": None}}
+        projection = {"_id": 0, "post_id": 1, "Link": 1, "Channel_Name": 1, "Publishing_datetime": 1, "text_embedding": 1}
+        embeddings, metadata = list(), list()
+        for doc in tqdm(collection.find(query, projection), desc="Load matching window", leave=False):
+            embeddings.append(decode_vector(doc.pop("text_embedding")))
+            metadata.append(doc)
+        client.close()
+        if len(embeddings) > 0:
+            self.add(embeddings=np.stack(embeddings), metadata=metadata)
+            self.evict()
+
+    def allocate(self, rows: int, columns: int) -> np.ndarray:
+        """
+        Allocates a window matrix: in memory, or with quantization in an anonymous memory-mapped temporary file.
+        """
+        if self.quantizer is None or rows == 0:
+            return np.zeros((rows, columns), dtype=self.dtype)
+        return np.memmap(tempfile.TemporaryFile(), dtype=self.dtype, mode="w+", shape=(rows, columns))
+
+    def add(self, embeddings: np.ndarray, metadata: List[dict]) -> None:
+        """
+        Appends document embeddings to the window.
+        The window matrix grows by doubling its capacity, so appending is amortized constant time per row.
+
+        Parameters:
+        ----------
+        embeddings : np.ndarray
+            A matrix of document embeddings.
+        metadata : List[dict]
+            The post_id, Link, Channel_Name and Publishing_datetime of each embedding.
+        """
+        embeddings = self.normalize(embeddings).astype(self.dtype)
+        if self.matrix.shape[1] != embeddings.shape[1]:
+            self.matrix = np.zeros((0, embeddings.shape[1]), dtype=self.dtype)
+        required = self.size + len(embeddings)
+        if required > len(self.matrix):
+            matrix = self.allocate(rows=max(required, 2 * len(self.matrix)), columns=embeddings.shape[1])
+            matrix[:self.size] = self.matrix[:self.size]
+            self.matrix = matrix
+        self.matrix[self.size:required] = embeddings
+        if self.quantizer is not None:
+            codes = self.quantizer.encode(embeddings)
+            if self.codes is None or len(self.codes) < len(self.matrix):
+                grown = np.zeros((len(self.matrix), codes.shape[1]), dtype=codes.dtype)
+                if self.codes is not None:
+                    grown[:self.size] = self.codes[:self.size]
+                self.codes = grown
+            self.codes[self.size:required] = codes
+        for key in self.metadata:
+            values = np.empty(len(metadata), dtype=object)
+            values[:] = [m.get(key) for m in metadata]
+            self.metadata[key] = np.concatenate([self.metadata[key], values])
+        self.size = required
+
+    def evict(self) -> None:
+        """
+        Removes embeddings older than `window_days` from the window.
+        """
+        keep = (self.metadata["Publishing_datetime"] >= self.get_window_start()).astype(bool)
+        if keep.all():
+            return
+        kept = int(keep.sum())
+        self.matrix[:kept] = self.matrix[:self.size][keep]
+        if self.codes is not None:
+            self.codes[:kept] = self.codes[:self.size][keep]
+        for key in self.metadata:
+            self.metadata[key] = self.metadata[key][keep]
+        self.size = kept
+
+    def similarities(self, queries: np.ndarray, documents: np.ndarray) -> np.ndarray:
+        """
+        Computes the cosine similarities between normalized queries and documents block by block,
+        converting each block of documents to float32 before the multiplication.
+
+        Parameters:
+        ----------
+        queries : np.ndarray
+            A normalized float32 matrix of query embeddings.
+        documents : np.ndarray
+            A normalized matrix of document embeddings.
+
+        Returns:
+        -------
+        np.ndarray
+            A float32 matrix with one row per query and one column per document.
+        """
+        scores = np.empty((len(queries), len(documents)), dtype=np.float32)
+        for start in range(0, len(documents), self.block_size):
+            block = np.asarray(documents[start:start + self.block_size], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores
+
+    def candidates(self, queries: np.ndarray):
+        """
+        Yields the candidate rows of the window and their exact cosine similarities for each query.
+        Without quantization, all rows are candidates. With quantization, the `rerank_candidates` rows with the
+        highest approximate scores are reranked with the exact window matrix.
+
+        Parameters:
+        ----------
+        queries : np.ndarray
+            A normalized float32 matrix of query embeddings.
+
+        Yields:
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            The candidate rows and their cosine similarities.
+        """
+        if self.quantizer is None:
+            for row in self.similarities(queries=queries, documents=self.matrix[:self.size]):
+                yield np.arange(self.size), row
+            return
+        approximate = np.empty((len(queries), self.size), dtype=np.float32)
+        for start in range(0, self.size, self.block_size):
+            end = min(start + self.block_size, self.size)
+            approximate[:, start:end] = self.quantizer.scores(queries=queries, codes=self.codes[start:end])
+        k = min(self.rerank_candidates, self.size)
+        for query, row in zip(queries, approximate):
+            rows = np.sort(np.argpartition(-row, k - 1)[:k]) if k < self.size else np.arange(self.size)
+            yield rows, np.asarray(self.matrix[rows], dtype=np.float32) @ query
+
+    def to_sibling(self, idx: int, score: float) -> dict:
+        """
+        Builds a sibling entry for a row of the window in the format used by the vector search.
+
+        Parameters:
+        ----------
+        idx : int
+            The row of the window.
+        score : float
+            The cosine similarity, projected to MongoDB's vector search score range.
+
+        Returns:
+        -------
+        dict
+            The sibling entry.
+        """
+        sibling = {key: self.metadata[key][idx] for key in self.metadata}
+        sibling["score"] = float(score)
+        return sibling
+
+    def match_block(self, queries: np.ndarray, post_ids: List[str]) -> List[list]:
+        """
+        Matches a block of query embeddings against the window.
+
+        Parameters:
+        ----------
+        queries : np.ndarray
+            A normalized float32 matrix of query embeddings.
+        post_ids : List[str]
+            The post_id of each query, used to exclude the post itself.
+
+        Returns:
+        -------
+        List[list]
+            The siblings of each query.
+        """
+        results = list()
+        for (rows, scores), post_id in zip(self.candidates(queries=queries), post_ids):
+            above = np.flatnonzero(scores >= self.cosine_cutoff)
+            above = above[np.argsort(-scores[above], kind="stable")]
+            siblings = [self.to_sibling(idx=rows[i], score=(1 + scores[i]) / 2) for i in above if self.metadata["post_id"][rows[i]] != post_id]
+            siblings = siblings[:self.limit]
+            if self.sort_by_date:
+                siblings = sorted(siblings, key=lambda x: datetime.strptime(x['Publishing_datetime'], DATETIME_FORMAT), reverse=True)
+            results.append(siblings)
+        return results
+
+    def match_claims(self, store: WorkingStore) -> None:
+        """
+        Matches the posts of a working store against the window and against each other and adds the results as the
+        "Siblings" column of the store. Embeddings older than `window_days` are evicted first, then the document
+        embeddings of the store are appended to the window, so posts of the store always see each other.
+
+        Parameters:
+        ----------
+        store : WorkingStore
+            The working store holding the posts to match.
+        """
+        posts = store.load_posts(columns=["_id", "channel", "datetime", "link"])
+        document_embeddings = store.load_embeddings(task="document-embedding")
+        query_embeddings = store.load_embeddings(task="query-embedding")
+        rows = [idx for idx in range(len(store)) if store.get_embedding(embeddings=query_embeddings, idx=idx) is not None]
+        self.evict()
+        if len(rows) > 0:
+            self.add(
+                embeddings=document_embeddings[rows],
+                metadata=[{"post_id": posts["_id"][idx], "Link": posts["link"][idx], "Channel_Name": posts["channel"][idx], "Publishing_datetime": posts["datetime"][idx]} for idx in rows]
+            )
+        siblings = [[] for _ in range(len(store))]
+        for start in tqdm(range(0, len(rows), QUERY_BLOCK_SIZE), desc="Claim matching", leave=False):
+            block_rows = rows[start:start + QUERY_BLOCK_SIZE]
+            queries = self.normalize(query_embeddings[block_rows])
+            block_results = self.match_block(queries=queries, post_ids=[posts["_id"][idx] for idx in block_rows])
+            for idx, result in zip(block_rows, block_results):
+                siblings[idx] = result
+        store.add_column(key="Siblings", values=siblings)
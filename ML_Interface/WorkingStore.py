@@ -0,0 +1,282 @@
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import TYPE_CHECKING, List, Union
+from Utils import get_local_database_path, get_timestamp, make_folder
+from RunLedger import RunLedger
+if TYPE_CHECKING:
+    import pandas as pd # Imported by pyarrow when a table is converted.
+
+
+class WorkingStore():
+    """
+    A batch working store for one run of the annotation pipeline.
+
+    Post metadata and labels are kept in a single Parquet file (one row per post, one column per field),
+    embeddings are kept in memory-mapped float32 arrays (one `.npy` file per embedding task, one row per post).
+    Rows are addressed by their position in the Parquet file. Embedding rows of posts without text are NaN.
+    A RunLedger in the same folder records which stages are done for which posts, so an interrupted run can be resumed.
+
+    Attributes:
+    ----------
+    folder : str
+        The folder holding the files of the store.
+    posts_path : str
+        The path to the Parquet file with post metadata and labels.
+    """
+
+    POSTS_FILE = "posts.parquet"
+
+    def __init__(self, folder: str) -> None:
+        """
+        Initializes the WorkingStore for an existing or new folder.
+
+        Parameters:
+        ----------
+        folder : str
+            The folder holding the files of the store. It is created if it does not exist.
+        """
+        self.folder = folder
+        make_folder(self.folder)
+        self.posts_path = os.path.join(self.folder, self.POSTS_FILE)
+        self._table = None
+        self._ledger = None
+
+    @classmethod
+    def create(cls) -> "WorkingStore":
+        """
+        Creates a new store in the local database folder, named with the current timestamp.
+        A suffix is added if a store with the same timestamp exists, so the files of a finished store are never reused.
+
+        Returns:
+        -------
+        WorkingStore
+            The newly created store.
+        """
+        folder = os.path.join(get_local_database_path(), get_timestamp())
+        suffix = 0
+        while os.path.exists(folder if suffix == 0 else f"{folder}_{suffix}"):
+            suffix += 1
+        return cls(folder=folder if suffix == 0 else f"{folder}_{suffix}")
+
+    @classmethod
+    def most_recent(cls) -> "WorkingStore":
+        """
+        Opens the most recent store in the local database folder.
+
+        Returns:
+        -------
+        WorkingStore
+            The store in the most recent timestamp folder.
+        """
+        folder_path = get_local_database_path()
+        subfolders = [f for f in os.listdir(folder_path) if os.path.isdir(os.path.join(folder_path, f))]
+        subfolders.sort(reverse=True)
+        return cls(folder=os.path.join(folder_path, subfolders[0]))
+
+    @classmethod
+    def unfinished(cls) -> List["WorkingStore"]:
+        """
+        Finds the stores in the local database folder (including the chunk stores of a run) whose posts were
+        downloaded, but whose run was not completed.
+
+        Returns:
+        -------
+        List[WorkingStore]
+            The unfinished stores, oldest first.
+        """
+        folder_path = get_local_database_path()
+        if not os.path.exists(folder_path):
+            return []
+        stores = list()
+        for root, dirs, files in os.walk(folder_path):
+            dirs.sort()
+            if cls.POSTS_FILE not in files:
+                continue
+            store = cls(folder=root)
+            post_ids = store.post_ids
+            if store.ledger.is_done(stage="downloaded", post_ids=post_ids) and not store.ledger.is_done(stage=RunLedger.COMPLETED, post_ids=post_ids):
+                stores.append(store)
+        return stores
+
+    @property
+    def table(self) -> pa.Table:
+        """
+        The Arrow table with post metadata and labels. Loaded lazily from disk and cached.
+        """
+        if self._table is None:
+            if os.path.exists(self.posts_path):
+                self._table = pq.read_table(self.posts_path)
+            else:
+                self._table = pa.table({})
+        return self._table
+
+    @property
+    def ledger(self) -> RunLedger:
+        """
+        The ledger of the store. Loaded lazily from disk and cached.
+        """
+        if self._ledger is None:
+            self._ledger = RunLedger(folder=self.folder)
+        return self._ledger
+
+    @property
+    def post_ids(self) -> List[str]:
+        """
+        The post_id of every row of the store.
+        """
+        if "_id" not in self.table.column_names:
+            return []
+        return self.table.column("_id").to_pylist()
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def write_posts(self, posts: List[dict]) -> None:
+        """
+        Writes the downloaded posts as the rows of the store, replacing any existing rows.
+
+        Parameters:
+        ----------
+        posts : List[dict]
+            A list of parsed posts, all with the same keys.
+        """
+        self._table = pa.Table.from_pylist(posts)
+        pq.write_table(self._table, self.posts_path)
+
+    def add_column(self, key: str, values: list) -> None:
+        """
+        Adds a column (e.g. a label) to the store, replacing an existing column with the same name.
+
+        Parameters:
+        ----------
+        key : str
+            The name of the column.
+        values : list
+            One value per row of the store.
+        """
+        table = self.table
+        if key in table.column_names:
+            table = table.drop_columns([key])
+        self._table = table.append_column(key, pa.array(values))
+        pq.write_table(self._table, self.posts_path)
+
+    def load_posts(self, columns: Union[List[str], None] = None) -> "pd.DataFrame":
+        """
+        Loads the rows of the store as a DataFrame.
+
+        Parameters:
+        ----------
+        columns : List[str], optional
+            The columns to load (default is all columns).
+
+        Returns:
+        -------
+        pd.DataFrame
+            A DataFrame with one row per post.
+        """
+        table = self.table if columns is None else self.table.select(columns)
+        return table.to_pandas()
+
+    def iter_posts(self, columns: Union[List[str], None] = None):
+        """
+        Iterates over the rows of the store as dictionaries.
+
+        Parameters:
+        ----------
+        columns : List[str], optional
+            The columns to include (default is all columns).
+
+        Yields:
+        ------
+        tuple
+            A tuple with the row number and the row as a dictionary.
+        """
+        table = self.table if columns is None else self.table.select(columns)
+        for idx, row in enumerate(table.to_pylist()):
+            yield idx, row
+
+    def embedding_path(self, task: str) -> str:
+        """
+        Returns the path of the `.npy` file holding the embeddings of a task.
+
+        Parameters:
+        ----------
+        task : str
+            The embedding task, e.g. "document-embedding".
+
+        Returns:
+        -------
+        str
+            The path of the `.npy` file.
+        """
+        return os.path.join(self.folder, f"{task}.npy")
+
+    def save_embeddings(self, task: str, embeddings, rows: List[int]) -> None:
+        """
+        Saves embeddings into a memory-mapped float32 array with one row per post of the store.
+        If the array already exists with the same dimension, only the given rows are written, so embeddings can be
+        saved in several parts. Rows without an embedding are filled with NaN.
+
+        Parameters:
+        ----------
+        task : str
+            The embedding task, e.g. "document-embedding".
+        embeddings : array-like
+            A matrix of embeddings, one row per entry in `rows`.
+        rows : List[int]
+            The row numbers of the store the embeddings belong to.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        dimension = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        path = self.embedding_path(task=task)
+        matrix = np.load(path, mmap_mode="r+") if os.path.exists(path) else None
+        if matrix is None or matrix.shape != (len(self), dimension):
+            if len(rows) == 0 and matrix is not None:
+                return
+            matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(len(self), dimension))
+            matrix[:] = np.nan
+        if len(rows) > 0:
+            matrix[np.asarray(rows)] = embeddings
+        matrix.flush()
+        del matrix
+
+    def load_embeddings(self, task: str) -> np.ndarray:
+        """
+        Opens the embeddings of a task as a read-only memory-mapped array.
+
+        Parameters:
+        ----------
+        task : str
+            The embedding task, e.g. "document-embedding".
+
+        Returns:
+        -------
+        np.ndarray
+            A memory-mapped float32 matrix with one row per post of the store.
+        """
+        return np.load(self.embedding_path(task=task), mmap_mode="r")
+
+    def get_embedding(self, embeddings: np.ndarray, idx: int) -> Union[np.ndarray, None]:
+        """
+        Returns the embedding of a single row, or None if the post has no embedding.
+
+        Parameters:
+        ----------
+        embeddings : np.ndarray
+            The matrix returned by `load_embeddings`.
+        idx : int
+            The row number of the post.
+
+        Returns:
+        -------
+        np.ndarray or None
+            The embedding vector of the post or None.
+        """
+        if embeddings.shape[1] == 0:
+            return None
+        vector = embeddings[idx]
+        if np.isnan(vector[0]):
+            return None
+        return vector
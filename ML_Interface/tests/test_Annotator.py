@@ -0,0 +1,46 @@
+import tempfile
+import unittest
+from unittest import mock
+from Annotator import DataAnnotator
+from WorkingStore import WorkingStore
+
+TAG_TASKS = ['topic-classification', 'narrative-classification', 'factuality-classification', 'polarization-classification', 'sensationalism-classification']
+
+
+class DataAnnotatorTest(unittest.TestCase):
+    """
+    Checks the columns a run of the annotator leaves in the store, with the models replaced by a fixed label.
+    """
+
+    def make_annotator(self, texts: list) -> DataAnnotator:
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        store = WorkingStore(folder=folder.name)
+        store.write_posts([{"_id": str(idx), "text": text} for idx, text in enumerate(texts)])
+        annotator = DataAnnotator(store=store)
+        annotator.inference = mock.Mock(side_effect=lambda local, task, inputs: [f"{task} label"] * len(inputs))
+        return annotator
+
+    def test_all_short_posts(self) -> None:
+        annotator = self.make_annotator(texts=["too short", None, ""])
+        annotator.annotate(local=True)
+        annotator.inference.assert_not_called()
+        for task in TAG_TASKS:
+            key = annotator.config["key_titles"][task]
+            with self.subTest(task=task):
+                self.assertEqual(annotator.store.table.column(key).to_pylist(), [None, None, None])
+        for task in ["document-embedding", "query-embedding"]:
+            self.assertEqual(annotator.store.load_embeddings(task=task).shape[0], 3)
+
+    def test_short_and_long_posts(self) -> None:
+        long_text = "one two three four five six seven"
+        annotator = self.make_annotator(texts=["too short", long_text, None])
+        annotator.tag_all(local=False)
+        for task in TAG_TASKS:
+            key = annotator.config["key_titles"][task]
+            with self.subTest(task=task):
+                self.assertEqual(annotator.store.table.column(key).to_pylist(), [None, f"{task} label", None])
+                self.assertTrue(annotator.store.ledger.is_done(stage=task, post_ids=["1"]))
+
+if __name__ == "__main__":
+    unittest.main()
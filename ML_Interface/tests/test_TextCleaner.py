@@ -0,0 +1,48 @@
+import unittest
+from Benchmark.TextCleanerBenchmark import reference_clean
+from MongoDownloader import TextCleaner
+
+# (text, caption) pairs for the edge cases of the cleaning passes and of their order.
+POSTS = [
+    (None, None),
+    ("", ""),
+    ("", None),
+    (None, "caption only"),
+    ("text", "caption"),
+    ("   ", "\t\n"),
+    ("Impfung 😀 und Krieg 🇩🇪🔥", None),
+    ("a😀b", "✅❗👉"),
+    ("™ⓜ⚡ no emoji range", None),
+    ("Siehe https://t.me/channel/123 und http://x.y/z?a=b#c", None),
+    ("www.example.org/a?b=c#d www. http:// https://", None),
+    ("#Wahrheit @channel # @ ## @@", None),
+    ("#foo😀bar @a😀b ht😀tps://x.y www😀.x.org", None),
+    ("#中文 #Straße @Россия", None),
+    ("#foowww.x #http://x.y @https://z #wwwx #htt", None),
+    ("@user#tag #tag@user word#tag", None),
+    ("email@example.org and C# or F#", None),
+    ("tabs\t\tand\nnewlines\r\n\x0b\x0cand unicode spaces　end", None),
+    ("\n\nleading and trailing\t", "\tcaption\n"),
+    ("https://a.b\n#tag\tword", "@mention"),
+]
+
+
+class TextCleanerTest(unittest.TestCase):
+    """
+    Checks that the cleaner gives the same result as the original chain of cleaning functions (`reference_clean`).
+    """
+
+    def test_same_as_reference(self) -> None:
+        cleaner = TextCleaner()
+        for text, caption in POSTS:
+            with self.subTest(text=text, caption=caption):
+                self.assertEqual(cleaner.clean(text=text, caption=caption), reference_clean(text, caption))
+
+    def test_expected_values(self) -> None:
+        cleaner = TextCleaner()
+        self.assertIsNone(cleaner.clean(text=None, caption=None))
+        self.assertEqual(cleaner.clean(text="Siehe https://t.me/c/1 #tag @user 😀", caption="Text"), "Siehe <URL> Text")
+        self.assertEqual(cleaner.clean(text="#foo😀bar baz", caption=None), "baz")
+
+if __name__ == "__main__":
+    unittest.main()
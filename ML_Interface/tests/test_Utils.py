@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from Utils import encode_vector, decode_vector
+
+
+class EncodeVectorTest(unittest.TestCase):
+    """
+    Checks that embeddings keep their cosine similarities when stored as int8 binary vectors.
+    """
+
+    def setUp(self) -> None:
+        # Normalized vectors of the size of the e5 embeddings, whose coordinates are small compared to their norm.
+        embeddings = np.random.default_rng(0).standard_normal((200, 1024)).astype(np.float32)
+        self.embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def test_int8_uses_full_range(self) -> None:
+        for embedding in self.embeddings:
+            self.assertEqual(np.max(np.abs(decode_vector(encode_vector(embedding=embedding, dtype="int8")))), 127)
+
+    def test_int8_round_trip(self) -> None:
+        decoded = np.stack([decode_vector(encode_vector(embedding=embedding, dtype="int8")) for embedding in self.embeddings])
+        cosine = np.sum(decoded * self.embeddings, axis=1) / np.linalg.norm(decoded, axis=1)
+        self.assertLess(np.max(1 - cosine), 1e-3)
+
+    def test_int8_similarities(self) -> None:
+        # Pairs of posts at the sibling cutoff keep their similarity up to a small fraction of the cutoff margin.
+        noise = np.random.default_rng(1).standard_normal(self.embeddings.shape).astype(np.float32)
+        noise -= np.sum(noise * self.embeddings, axis=1, keepdims=True) * self.embeddings
+        noise /= np.linalg.norm(noise, axis=1, keepdims=True)
+        siblings = .91 * self.embeddings + np.sqrt(1 - .91 ** 2) * noise
+        decoded = [np.stack([decode_vector(encode_vector(embedding=embedding, dtype="int8")) for embedding in embeddings]) for embeddings in [self.embeddings, siblings]]
+        cosine = np.sum(decoded[0] * decoded[1], axis=1) / np.linalg.norm(decoded[0], axis=1) / np.linalg.norm(decoded[1], axis=1)
+        self.assertLess(np.max(np.abs(cosine - .91)), 1e-3)
+
+    def test_int8_zero_vector(self) -> None:
+        self.assertTrue(np.array_equal(decode_vector(encode_vector(embedding=np.zeros(8), dtype="int8")), np.zeros(8)))
+
+    def test_float32_round_trip(self) -> None:
+        self.assertTrue(np.array_equal(decode_vector(encode_vector(embedding=self.embeddings[0], dtype="float32")), self.embeddings[0]))
+
+if __name__ == "__main__":
+    unittest.main()